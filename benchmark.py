@@ -0,0 +1,537 @@
+"""Benchmarks for the engines, the pattern parsers and the simulation server."""
+
+import argparse
+import asyncio
+from contextlib import redirect_stdout
+import json
+import multiprocessing
+import os
+from pathlib import Path
+import platform
+import sys
+import tempfile
+from time import perf_counter
+import tracemalloc
+
+import numpy as np
+
+from engine import create_engine
+from history import live_cells
+from parser import parse, write_rle
+from server import Server, Subscriber
+from config import *
+
+
+# Engines and dense engine settings, the per-cell loops show what OPTIMIZE and USE_QUEUE do
+VARIANTS = {
+    "dense": ("dense", {"vectorize": True}),
+    "dense-loop": ("dense", {"vectorize": False, "optimize": False, "use_queue": False}),
+    "dense-proximal": ("dense", {"vectorize": False, "optimize": True, "use_queue": False}),
+    "dense-queue": ("dense", {"vectorize": False, "optimize": True, "use_queue": True}),
+}
+VARIANTS.update({name: (name, {}) for name in ENGINES if name != "dense"})
+# Per-cell loops take minutes per generation on larger boards
+LOOP_LIMIT = 128
+PATTERNS = ("gosper.cells", "pre-pulsar.lif", "glider.lif")
+# Seconds slow subscribers wait after every message
+SLOW_DELAY = 0.05
+# Parsed patterns by file name
+loaded = {}
+
+def soup(size, density, seed):
+    """
+    Generate a random square board.
+
+    args:
+        size [int]: board side in cells
+        density [float]: chance of a cell being alive
+        seed [int]: random seed
+
+    returns:
+        board [np.array]: random board
+    """
+    return (np.random.default_rng(seed).random((size, size)) < density).astype(np.uint8)
+
+def write_life(f, board):
+    """
+    Write board as a Life 1.06 pattern.
+
+    args:
+        f [file]: file to write to
+        board [np.array]: board to write
+    """
+    f.write("#Life 1.06\n")
+    ys, xs = np.nonzero(board)
+    np.savetxt(f, np.stack((xs, ys), axis=1), fmt="%d")
+
+def bench_parser(size=2048, density=0.5, seed=0):
+    """
+    Measure the parser throughput on a random soup in every streamed format.
+
+    args:
+        size [int]: board side in cells
+        density [float]: chance of a cell being alive
+        seed [int]: random seed
+
+    returns:
+        results [list]: timings per format
+    """
+    board = soup(size, density, seed)
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        for ext, write in (("rle", write_rle), ("lif", write_life)):
+            path = os.path.join(directory, "soup." + ext)
+            with open(path, "w") as f:
+                write(f, board)
+            with redirect_stdout(sys.stderr):
+                start = perf_counter()
+                _, pattern, _ = parse(path)
+                seconds = perf_counter() - start
+            # Life 1.06 crops the pattern to its bounding box
+            ys, xs = np.nonzero(board)
+            expected = board[ys.min():ys.max() + 1, xs.min():xs.max() + 1] if ext == "lif" else board
+            if not np.array_equal(pattern, expected):
+                raise AssertionError(f"Parsed {ext} pattern differs from the original")
+            size_bytes = os.path.getsize(path)
+            results.append({
+                "format": ext,
+                "bytes": size_bytes,
+                "cells": board.size,
+                "seconds": round(seconds, 4),
+                "mb_per_s": round(size_bytes / seconds / 1e6, 2),
+                "cells_per_s": round(board.size / seconds),
+            })
+    return results
+
+def serve_soup(engine, size, density, seed, ports):
+    """
+    Serve a random soup, run in a separate process.
+
+    args:
+        engine [str]: stepping engine
+        size [int]: board side in cells
+        density [float]: chance of a cell being alive
+        seed [int]: random seed
+        ports [multiprocessing.Queue]: receives the port listened on
+    """
+    async def run():
+        life = create_engine(engine, size, size, True)
+        life.place(soup(size, density, seed), 0, 0)
+        listener = await Server(life, rate=float("inf")).listen(port=0)
+        ports.put(listener.sockets[0].getsockname()[1])
+        async with listener:
+            await listener.serve_forever()
+    asyncio.run(run())
+
+async def watch_server(port, clients, slow, seconds):
+    """
+    Start a server and watch it with subscribers for a while.
+
+    args:
+        port [int]: server port
+        clients [int]: number of subscribers besides the one in control
+        slow [int]: subscribers reading one message per SLOW_DELAY
+        seconds [float]: time to run
+
+    returns:
+        generations [int]: generations stepped
+        elapsed [float]: seconds stepped
+        subscribers [list]: every subscriber, caught up with the server, the one in control last
+    """
+    subscribers = [Subscriber() for _ in range(clients + 1)]
+    control = subscribers[-1]
+    for subscriber in subscribers:
+        await subscriber.connect(port=port)
+    tasks = [asyncio.create_task(subscriber.listen(SLOW_DELAY if i < slow else 0))
+             for i, subscriber in enumerate(subscribers)]
+
+    while control.state is None:
+        await asyncio.sleep(0.01)
+    first = control.state["gen"]
+    start = perf_counter()
+    await control.send("start")
+    await asyncio.sleep(seconds)
+    await control.send("pause")
+    elapsed = perf_counter() - start
+    while control.state["running"]:
+        await asyncio.sleep(0.01)
+    # Every subscriber gets the last generation in one frame once it catches up
+    last = control.state["gen"]
+    deadline = perf_counter() + 10 + slow * SLOW_DELAY
+    while any(subscriber.gen != last for subscriber in subscribers) and perf_counter() < deadline:
+        await asyncio.sleep(0.01)
+
+    for subscriber in subscribers:
+        await subscriber.close()
+    for task in tasks:
+        task.cancel()
+    return last - first, elapsed, subscribers
+
+def bench_server(clients=100, slow=10, seconds=3.0, size=256, density=0.3, engine=ENGINE, seed=0):
+    """
+    Measure the server throughput with many subscribers, some of them slow.
+
+    The server runs in its own process, stepping as fast as it can, and is
+    measured alone first, watched by a single subscriber.
+
+    args:
+        clients [int]: number of subscribers
+        slow [int]: subscribers reading one message per SLOW_DELAY
+        seconds [float]: time to run with and without subscribers
+        size [int]: board side in cells
+        density [float]: chance of a cell being alive
+        engine [str]: stepping engine
+        seed [int]: random seed
+
+    returns:
+        result [dict]: generation rates, frames and bytes received, and whether every
+            subscriber ended with the board of the server
+    """
+    runs = []
+    for count in (0, clients):
+        ports = multiprocessing.Queue()
+        process = multiprocessing.Process(target=serve_soup,
+                                          args=(engine, size, density, seed, ports))
+        process.start()
+        try:
+            runs.append(asyncio.run(watch_server(ports.get(timeout=60), count, min(slow, count),
+                                                 seconds)))
+        finally:
+            process.terminate()
+            process.join()
+
+    generations, elapsed, subscribers = runs[1]
+    # Replay the soup to check the boards the subscribers put together
+    life = create_engine(engine, size, size, True)
+    life.place(soup(size, density, seed), 0, 0)
+    life.step(subscribers[-1].gen)
+    expected = live_cells(life)
+    watchers = subscribers[:-1]
+    fast, slow_ones = watchers[slow:], watchers[:slow]
+    return {
+        "engine": engine,
+        "size": size,
+        "clients": clients,
+        "slow": len(slow_ones),
+        "solo_gens_per_s": round(runs[0][0] / runs[0][1], 1),
+        "gens_per_s": round(generations / elapsed, 1),
+        "fast_frames_per_s": round(float(np.mean([s.frames for s in fast])) / elapsed, 1)
+        if fast else None,
+        "slow_frames_per_s": round(float(np.mean([s.frames for s in slow_ones])) / elapsed, 1)
+        if slow_ones else None,
+        "mb_received": round(sum(s.received for s in watchers) / 1e6, 2),
+        "consistent": all(s.gen == life.gen and np.array_equal(s.keys, expected)
+                          for s in subscribers),
+    }
+
+def cases(engines, sizes, densities, patterns, pattern_size, seed):
+    """
+    List the benchmark cases, every engine on every board and topology.
+
+    args:
+        engines [list]: names from VARIANTS
+        sizes [list]: board sides of the random soups
+        densities [list]: live cell ratios of the random soups
+        patterns [list]: bundled pattern files
+        pattern_size [int]: board side for the patterns
+        seed [int]: random seed of the soups
+
+    returns:
+        cases [list]: case descriptions
+    """
+    boards = [{"size": size, "density": density, "seed": seed}
+              for size in sizes for density in densities]
+    boards += [{"size": pattern_size, "pattern": pattern} for pattern in patterns]
+    return [dict(board, engine=engine, toroid=toroid)
+            for engine in engines for board in boards for toroid in (False, True)]
+
+def key(case):
+    """
+    Identify a case across runs.
+
+    args:
+        case [dict]: case description or result
+
+    returns:
+        key [tuple]: engine, board and topology
+    """
+    return (case["engine"], case["size"], case.get("density"), case.get("pattern"),
+            case["toroid"])
+
+def build(case):
+    """
+    Create the engine of a case with its starting board.
+
+    args:
+        case [dict]: case description
+
+    returns:
+        engine [Life]: ready engine
+    """
+    name, settings = VARIANTS[case["engine"]]
+    size = case["size"]
+    engine = create_engine(name, size, size, case["toroid"])
+    for setting, value in settings.items():
+        setattr(engine, setting, value)
+    if "pattern" in case:
+        if case["pattern"] not in loaded:
+            with redirect_stdout(sys.stderr):
+                path = Path(__file__).parent / "patterns" / case["pattern"]
+                loaded[case["pattern"]] = parse(str(path))[1:]
+        pattern, rule = loaded[case["pattern"]]
+        if rule is not None:
+            engine.rule = rule
+        engine.place(pattern, (size - pattern.shape[0]) // 2, (size - pattern.shape[1]) // 2)
+    else:
+        engine.place(soup(size, case["density"], case["seed"]), 0, 0)
+    return engine
+
+def close(engine):
+    """
+    Stop the workers of an engine, if any.
+
+    args:
+        engine [Life]: engine to close
+    """
+    if hasattr(engine, "close"):
+        engine.close()
+
+def bench_case(case, generations=100, seconds=1.0, repeats=5, memory_generations=3):
+    """
+    Time generation by generation stepping like the GUI runner does, then measure peak memory.
+
+    args:
+        case [dict]: case description
+        generations [int]: generations timed per repeat
+        seconds [float]: time budget per repeat, stops early once spent
+        repeats [int]: timed runs, the fastest one counts
+        memory_generations [int]: generations stepped while tracing memory
+
+    returns:
+        result [dict]: case with generations per second, peak memory and memory allocated
+            while stepping, or why it was skipped
+    """
+    if case["engine"].startswith("dense-") and case["size"] > LOOP_LIMIT:
+        return dict(case, skipped=f"per-cell loops are limited to {LOOP_LIMIT} cells")
+    if case["engine"] == "hashlife" and case["toroid"]:
+        return dict(case, skipped="HashLife does not support toroidal boards")
+
+    engine = build(case)
+    try:
+        # Let engines set up their caches first
+        engine.evolve()
+        rate = 0.0
+        total = elapsed = 0
+        for _ in range(repeats):
+            done = 0
+            start = perf_counter()
+            while done < generations and (done == 0 or perf_counter() - start < seconds):
+                engine.evolve()
+                done += 1
+            spent = perf_counter() - start
+            rate = max(rate, done / spent)
+            total += done
+            elapsed += spent
+        population = engine.population
+    finally:
+        close(engine)
+
+    # Tracing slows stepping down, so memory gets its own run
+    tracemalloc.start()
+    try:
+        engine = build(case)
+        for _ in range(memory_generations):
+            engine.evolve()
+        peak = tracemalloc.get_traced_memory()[1]
+        # Memory taken by stepping alone, once the engine is set up
+        tracemalloc.reset_peak()
+        base = tracemalloc.get_traced_memory()[0]
+        for _ in range(memory_generations):
+            engine.evolve()
+        step_peak = tracemalloc.get_traced_memory()[1] - base
+    finally:
+        tracemalloc.stop()
+        close(engine)
+
+    return dict(
+        case,
+        generations=total,
+        seconds=round(elapsed, 4),
+        gens_per_s=round(rate, 2),
+        cells_per_s=round(rate * case["size"] ** 2),
+        peak_bytes=peak,
+        step_bytes=step_peak,
+        population=population,
+    )
+
+def compare(results, baseline, tolerance):
+    """
+    Find cases that got slower or bigger than the baseline.
+
+    args:
+        results [list]: current results
+        baseline [list]: stored results
+        tolerance [float]: allowed relative change
+
+    returns:
+        regressions [list]: description of every regression
+    """
+    stored = {key(result): result for result in baseline}
+    regressions = []
+    for result in results:
+        old = stored.get(key(result))
+        if old is None or "skipped" in result or "skipped" in old:
+            continue
+        name = ", ".join(f"{k}={v}" for k, v in zip(
+            ("engine", "size", "density", "pattern", "toroid"), key(result)) if v is not None)
+        if result["gens_per_s"] < old["gens_per_s"] * (1 - tolerance):
+            regressions.append(f"{name}: {result['gens_per_s']} gen/s, "
+                               f"baseline {old['gens_per_s']} gen/s")
+        if result["peak_bytes"] > old["peak_bytes"] * (1 + tolerance):
+            regressions.append(f"{name}: {result['peak_bytes']} B peak, "
+                               f"baseline {old['peak_bytes']} B")
+    return regressions
+
+def engines_command(args):
+    """
+    Run the engine benchmarks.
+
+    args:
+        args [argparse.Namespace]: parsed arguments
+
+    returns:
+        status [int]: 1 if anything regressed, 0 otherwise
+    """
+    results = []
+    for case in cases(args.engines, args.sizes, args.densities, args.patterns,
+                      args.pattern_size, args.seed):
+        result = bench_case(case, args.generations, args.seconds, args.repeats,
+                            args.memory_generations)
+        results.append(result)
+        board = result.get("pattern") or f"density {result.get('density')}"
+        topology = "toroidal" if result["toroid"] else "bounded"
+        if "skipped" in result:
+            print(f"{result['engine']:>14} {result['size']:>5} {board:>15} {topology:>8}: "
+                  f"skipped, {result['skipped']}", file=sys.stderr)
+        else:
+            print(f"{result['engine']:>14} {result['size']:>5} {board:>15} {topology:>8}: "
+                  f"{result['gens_per_s']:>10.1f} gen/s {result['peak_bytes'] / 2**20:>8.1f} MiB",
+                  file=sys.stderr)
+
+    report = {
+        "meta": {
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+        },
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=1)
+    else:
+        json.dump(report, sys.stdout, indent=1)
+        print()
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f)["results"], args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION: {regression}", file=sys.stderr)
+        if regressions:
+            return 1
+    return 0
+
+def parser_command(args):
+    """
+    Run the parser benchmarks.
+
+    args:
+        args [argparse.Namespace]: parsed arguments
+
+    returns:
+        status [int]: always 0
+    """
+    for result in bench_parser(args.size, args.density, args.seed):
+        print(json.dumps(result))
+    return 0
+
+def server_command(args):
+    """
+    Run the server benchmark.
+
+    args:
+        args [argparse.Namespace]: parsed arguments
+
+    returns:
+        status [int]: 1 if a subscriber ended with a different board, 0 otherwise
+    """
+    result = bench_server(args.clients, args.slow, args.seconds, args.size, args.density,
+                          args.engine, args.seed)
+    print(json.dumps(result))
+    return 0 if result["consistent"] else 1
+
+def main(argv=None):
+    """
+    Run the benchmarks selected on the command line.
+
+    args:
+        argv [list]: arguments, defaults to sys.argv
+
+    returns:
+        status [int]: exit status
+    """
+    parser = argparse.ArgumentParser(description=__doc__)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    engines = commands.add_parser("engines", help="time stepping and peak memory of every engine")
+    engines.add_argument("--engines", nargs="+", choices=VARIANTS, default=list(VARIANTS),
+                         help="engines to compare, dense-* are the per-cell loops")
+    engines.add_argument("--sizes", nargs="+", type=int, default=[64, 256, 1024],
+                         help="board sides of the random soups")
+    engines.add_argument("--densities", nargs="+", type=float, default=[0.1, 0.5],
+                         help="live cell ratios of the random soups")
+    engines.add_argument("--patterns", nargs="*", default=list(PATTERNS),
+                         help="bundled patterns to run")
+    engines.add_argument("--pattern-size", type=int, default=256,
+                         help="board side for the patterns")
+    engines.add_argument("--generations", type=int, default=100,
+                         help="generations timed per repeat")
+    engines.add_argument("--seconds", type=float, default=1.0,
+                         help="time budget per repeat, fewer generations are run if spent")
+    engines.add_argument("--repeats", type=int, default=5,
+                         help="timed runs per case, the fastest one counts")
+    engines.add_argument("--memory-generations", type=int, default=3,
+                         help="generations stepped while tracing memory")
+    engines.add_argument("--seed", type=int, default=0, help="random seed")
+    engines.add_argument("-o", "--output", help="write the JSON results to this file")
+    engines.add_argument("--baseline", help="JSON results to compare against")
+    engines.add_argument("--tolerance", type=float, default=0.25,
+                         help="relative slowdown or memory growth allowed before failing")
+    engines.set_defaults(run=engines_command)
+
+    patterns = commands.add_parser("parser", help="measure the parser throughput")
+    patterns.add_argument("--size", type=int, default=2048, help="board side in cells")
+    patterns.add_argument("--density", type=float, default=0.5, help="initial live cell ratio")
+    patterns.add_argument("--seed", type=int, default=0, help="random seed")
+    patterns.set_defaults(run=parser_command)
+
+    server = commands.add_parser("server", help="stream a simulation to many local subscribers")
+    server.add_argument("--clients", type=int, default=100, help="number of subscribers")
+    server.add_argument("--slow", type=int, default=10,
+                        help=f"subscribers reading one message per {SLOW_DELAY}s")
+    server.add_argument("--seconds", type=float, default=3.0,
+                        help="time to run with and without subscribers")
+    server.add_argument("--size", type=int, default=256, help="board side in cells")
+    server.add_argument("--density", type=float, default=0.3, help="initial live cell ratio")
+    server.add_argument("--engine", choices=ENGINES, default=ENGINE, help="stepping engine")
+    server.add_argument("--seed", type=int, default=0, help="random seed")
+    server.set_defaults(run=server_command)
+
+    args = parser.parse_args(argv)
+    return args.run(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
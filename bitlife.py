@@ -0,0 +1,279 @@
+"""Bit-packed Game of Life engine."""
+
+import numpy as np
+
+from engine import Life, placements
+
+
+# Bit helpers
+ONE = np.uint64(1)
+LAST_BIT = np.uint64(63)
+WORD = 64
+
+def pack(board, width):
+    """
+    Pack a board into 64-bit words, one bit per cell.
+
+    args:
+        board [np.array]: board to pack
+        width [int]: board width
+
+    returns:
+        words [np.array]: packed board, bit x % 64 of word x // 64 holds cell x
+    """
+    bits = np.zeros((board.shape[0], -(-width // WORD) * WORD), dtype=np.uint8)
+    bits[:, :width] = board == 1
+    return np.packbits(bits, axis=1, bitorder="little").view("<u8")
+
+def unpack(words, width):
+    """
+    Unpack 64-bit words into a board.
+
+    args:
+        words [np.array]: packed board
+        width [int]: board width
+
+    returns:
+        board [np.array]: unpacked board
+    """
+    return np.unpackbits(words.view(np.uint8), axis=1, bitorder="little")[:, :width]
+
+def word_box(words):
+    """
+    Find the edges of the live cells of a packed board.
+
+    args:
+        words [np.array]: packed board
+
+    returns:
+        box [tuple]: top, left, bottom and right edge, bottom and right exclusive, all 0 if empty
+    """
+    rows = np.flatnonzero(words.any(axis=1))
+    if not len(rows):
+        return 0, 0, 0, 0
+    top, bottom = int(rows[0]), int(rows[-1]) + 1
+    # Every column of words at once, the lowest and highest bit give the edges
+    columns = np.bitwise_or.reduce(words[top:bottom], axis=0)
+    used = np.flatnonzero(columns)
+    first, last = int(columns[used[0]]), int(columns[used[-1]])
+    left = int(used[0]) * WORD + (first & -first).bit_length() - 1
+    return top, left, bottom, int(used[-1]) * WORD + last.bit_length()
+
+
+class BitLife(Life):
+    """Life engine storing one cell per bit and stepping with bitwise adders."""
+
+    # Name used by create_engine
+    name = "bitpacked"
+
+    def __init__(self, *args, **kwargs):
+        """Create an empty board, see Life for arguments."""
+        self.words = self.old_words = None
+        super().__init__(*args, **kwargs)
+        # Bits past the board width inside the last word of each row
+        self.mask = pack(np.ones((1, self.width)), self.width)
+
+    def check_rule(self, rule):
+        """
+        Check that the engine can run a rule.
+
+        args:
+            rule [Rule]: rule to check
+
+        raises:
+            ValueError
+        """
+        if not rule.totalistic:
+            raise ValueError("The bit-packed engine only supports totalistic rules")
+
+    @property
+    def board(self):
+        """Current generation, unpacked."""
+        return unpack(self.words, self.width)
+
+    @board.setter
+    def board(self, board):
+        self.words = pack(board, self.width)
+
+    @property
+    def old_board(self):
+        """Previous generation, unpacked."""
+        return unpack(self.old_words, self.width)
+
+    @old_board.setter
+    def old_board(self, board):
+        self.old_words = pack(board, self.width)
+
+    def window(self, top, left, bottom, right, old=False):
+        """
+        Unpack part of the board, see Life.window().
+
+        Only the words covering the area are unpacked.
+
+        args:
+            top, left, bottom, right [int]: area edges on the board, bottom and right exclusive
+            old [bool]: read the previous generation instead
+
+        returns:
+            board [np.array]: cells of the area
+        """
+        words = (self.old_words if old else self.words)[top:bottom, left // WORD:-(-right // WORD)]
+        start = left // WORD * WORD
+        return unpack(words, right - start)[:, left - start:]
+
+    @property
+    def population(self):
+        """Number of live cells."""
+        return int(np.bitwise_count(self.words).sum())
+
+    def set_cell(self, state, y, x):
+        """
+        Set cell state - alive or dead.
+
+        args:
+            state [int]: cell state
+            y [int]: y position
+            x [int]: x position
+
+        returns:
+            changed [bool]: whether the position is on the board
+        """
+        if 0 <= y < self.height and 0 <= x < self.width:
+            word, bit = divmod(x, WORD)
+            mask = ONE << np.uint64(bit)
+            if state == 1:
+                self.words[y, word] |= mask
+            else:
+                self.words[y, word] &= ~mask
+            return True
+        return False
+
+    def place(self, array, y, x):
+        """
+        Place pattern on the board, clipping it at the edges or wrapping it on a toroid.
+
+        args:
+            array [np.array]: pattern array
+            y [int]: y position of the top-left corner
+            x [int]: x position of the top-left corner
+        """
+        slices = placements(array.shape, y, x, self.height, self.width, self.toroid)
+        if slices:
+            board = self.board
+            for rows, pattern in slices:
+                board[rows] = array[pattern]
+            self.board = board
+
+    def west(self, words):
+        """
+        Shift every row so that each cell holds its western neighbor.
+
+        args:
+            words [np.array]: packed board
+        """
+        shifted = words << ONE
+        shifted[:, 1:] |= words[:, :-1] >> LAST_BIT
+        if self.toroid:
+            last = np.uint64((self.width - 1) % WORD)
+            shifted[:, 0] |= (words[:, -1] >> last) & ONE
+        return shifted
+
+    def east(self, words):
+        """
+        Shift every row so that each cell holds its eastern neighbor.
+
+        args:
+            words [np.array]: packed board
+        """
+        shifted = words >> ONE
+        shifted[:, :-1] |= words[:, 1:] << LAST_BIT
+        if self.toroid:
+            last = np.uint64((self.width - 1) % WORD)
+            shifted[:, -1] |= (words[:, 0] & ONE) << last
+        return shifted
+
+    def evolve(self):
+        """Calculate the next generation."""
+        words = self.words
+        self.old_words = words
+        self.gen += 1
+
+        # Rows above and below
+        if self.toroid:
+            up = np.roll(words, 1, axis=0)
+            down = np.roll(words, -1, axis=0)
+        else:
+            up = np.zeros_like(words)
+            up[1:] = words[:-1]
+            down = np.zeros_like(words)
+            down[:-1] = words[1:]
+
+        # Count the neighbors of every cell at once as a 4-bit number
+        counter = [np.zeros_like(words) for _ in range(4)]
+        for plane in (self.west(up), up, self.east(up),
+                      self.west(words), self.east(words),
+                      self.west(down), down, self.east(down)):
+            for bit in counter[:3]:
+                carry = bit & plane
+                bit ^= plane
+                plane = carry
+            counter[3] |= plane
+
+        # Apply the rules to every cell
+        def matches(counts):
+            result = np.zeros_like(words)
+            for count in counts:
+                match = ~np.zeros_like(words)
+                for i, bit in enumerate(counter):
+                    match &= bit if count >> i & 1 else ~bit
+                result |= match
+            return result
+
+        self.words = ((words & matches(self.survive))
+                      | (~words & matches(self.reproduce))) & self.mask
+        if self.counting:
+            self.counts = self.count()
+
+    def count_changes(self):
+        """
+        Count the cells that differ between the board and the previous one.
+
+        returns:
+            changed [int]: cells born or died
+        """
+        return int(np.bitwise_count(self.words ^ self.old_words).sum())
+
+    def count(self):
+        """
+        Measure the generation just stepped to, see Life.count().
+
+        Births and deaths are counted on the packed words, so the population
+        follows from the last counted generation.
+
+        returns:
+            counts [tuple]: generation, population, births, deaths and bounding box
+        """
+        births = int(np.bitwise_count(self.words & ~self.old_words).sum())
+        deaths = int(np.bitwise_count(self.old_words & ~self.words).sum())
+        last = self.previous_counts()
+        population = self.population if last is None else last[1] + births - deaths
+        return self.gen, population, births, deaths, word_box(self.words)
+
+    def changes(self):
+        """
+        Find the cells that differ between the board and the previous one.
+
+        Only the words holding a change are unpacked.
+
+        returns:
+            born [tuple]: y and x positions of the cells born
+            died [tuple]: y and x positions of the cells died
+        """
+        changes = []
+        for bits in (self.words & ~self.old_words, self.old_words & ~self.words):
+            # Flat indices are much cheaper to find than nonzero() of 2D arrays
+            words = np.flatnonzero(bits)
+            k, bit = np.divmod(np.flatnonzero(unpack(bits.ravel()[words][:, None], WORD)), WORD)
+            ys, word_x = np.divmod(words[k], bits.shape[1])
+            changes.append((ys, word_x * WORD + bit))
+        return tuple(changes)
@@ -0,0 +1,154 @@
+"""Engine checkpoints, bit-packed and compressed in chunks of rows."""
+
+import json
+import mmap
+import os
+import zlib
+
+import numpy as np
+
+from bitlife import pack, unpack
+from engine import create_engine
+from rules import Rule
+from config import *
+
+
+# File layout: magic, header offset and length, rows from DATA on, JSON header at the end
+MAGIC = b"LIFECKPT"
+PREFIX = len(MAGIC) + 16
+DATA = 64
+VERSION = 1
+
+def save(path, engine, level=CHECKPOINT_COMPRESSION):
+    """
+    Save the full engine state.
+
+    Rows are packed like the bit-packed engine stores them, 64 cells per
+    little-endian word. Unbounded engines save the bounding box of their
+    live cells and its position.
+
+    args:
+        path [str]: checkpoint file
+        engine [Life]: engine to save
+        level [int]: zlib compression level, 0 stores raw rows that can be memory-mapped
+    """
+    packed = None
+    if engine.name == "bitpacked":
+        # Already in the stored layout
+        packed, origin = engine.words, (0, 0)
+        rows, width = engine.height, engine.width
+    else:
+        if hasattr(engine, "to_array") and not engine.toroid:
+            board, origin = engine.to_array()
+        else:
+            board, origin = engine.board, (0, 0)
+        rows, width = board.shape
+    row_bytes = -(-width // 64) * 8
+    chunk = max(1, CHECKPOINT_CHUNK // max(row_bytes, 1))
+    rule = engine.rule
+    header = {
+        "version": VERSION,
+        "engine": engine.name,
+        "height": engine.height,
+        "width": engine.width,
+        "toroid": engine.toroid,
+        "gen": engine.gen,
+        "rule": {
+            "reproduce": rule.reproduce,
+            "survive": rule.survive,
+            "neighborhood": None if rule.totalistic else rule.neighborhood.tolist(),
+            "name": rule.name,
+        },
+        "shape": [rows, width],
+        "origin": list(origin),
+        "level": level,
+        "chunks": [],
+    }
+
+    # Write next to the target and swap, a crash never leaves a broken checkpoint
+    temp = f"{path}.tmp"
+    with open(temp, "wb") as f:
+        f.write(bytes(DATA))
+        for top in range(0, rows, chunk):
+            if packed is None:
+                data = pack(board[top:top + chunk], width).tobytes()
+            else:
+                data = np.ascontiguousarray(packed[top:top + chunk], dtype="<u8").tobytes()
+            if level:
+                data = zlib.compress(data, level)
+            header["chunks"].append([f.tell(), len(data)])
+            f.write(data)
+        offset = f.tell()
+        data = json.dumps(header).encode()
+        f.write(data)
+        f.seek(0)
+        f.write(MAGIC + np.array([offset, len(data)], dtype="<u8").tobytes())
+    os.replace(temp, path)
+
+def read_header(f):
+    """
+    Read the header of a checkpoint.
+
+    args:
+        f [file]: checkpoint file opened in binary mode
+
+    returns:
+        header [dict]: checkpoint header
+
+    raises:
+        ValueError
+    """
+    prefix = f.read(PREFIX)
+    if len(prefix) < PREFIX or prefix[:len(MAGIC)] != MAGIC:
+        raise ValueError("Not a checkpoint file")
+    offset, length = np.frombuffer(prefix[len(MAGIC):], dtype="<u8").tolist()
+    f.seek(offset)
+    header = json.loads(f.read(length))
+    if header.get("version") != VERSION:
+        raise ValueError(f"Unsupported checkpoint version: {header.get('version')}")
+    return header
+
+def load(path, name=None, **kwargs):
+    """
+    Restore an engine from a checkpoint.
+
+    Raw checkpoints are memory-mapped, the bit-packed engine uses the
+    mapping copy-on-write without reading the file up front.
+
+    args:
+        path [str]: checkpoint file
+        name [str]: engine to restore into, defaults to the saved one
+        **kwargs: other engine arguments
+
+    returns:
+        engine [Life]: restored engine
+
+    raises:
+        ValueError
+    """
+    with open(path, "rb") as f:
+        header = read_header(f)
+    rule = header["rule"]
+    rule = Rule(rule["reproduce"], rule["survive"], rule["neighborhood"], rule["name"])
+    engine = create_engine(name or header["engine"], header["height"], header["width"],
+                           header["toroid"], rule, **kwargs)
+    rows, width = header["shape"]
+    words = -(-width // 64)
+
+    if (not header["level"] and engine.name == "bitpacked" and header["origin"] == [0, 0]
+            and header["shape"] == [engine.height, engine.width] and rows):
+        engine.words = np.memmap(path, dtype="<u8", mode="c", offset=DATA, shape=(rows, words))
+    elif rows:
+        board = np.zeros((rows, width), dtype=np.uint8)
+        with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            top = 0
+            for offset, length in header["chunks"]:
+                chunk = data[offset:offset + length]
+                if header["level"]:
+                    chunk = zlib.decompress(chunk)
+                chunk = np.frombuffer(chunk, dtype="<u8").reshape(-1, words)
+                board[top:top + len(chunk)] = unpack(chunk, width)
+                top += len(chunk)
+        engine.place(board, *header["origin"])
+    engine.gen = header["gen"]
+    return engine
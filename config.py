@@ -3,12 +3,62 @@
 # Board size
 HEIGHT = 150
 WIDTH = 150
-CELL = 5  # size in px
+CELL = 5  # size in px, the starting zoom level
+
+# Viewport
+VIEW_HEIGHT = 750  # largest canvas size in px, bigger boards are panned
+VIEW_WIDTH = 750
+ITEM_ZOOM = 4  # px per cell from which cells are canvas items, an image below that
+GRID_ZOOM = 4  # px per cell from which grid lines are drawn
+MAX_ZOOM = 64  # px per cell
+MIN_ZOOM = 1 / 64  # below 1, every pixel shows the density of a block of cells
 
 # Rules
 SURVIVE = [2, 3]
 REPRODUCE = [3]
-# TODO: Add gamerule toggles
+# Changeable in the GUI, RLE patterns switch to their own rule when placed
+
+# Speed
+FPS = 30  # GUI frames per second
+MAX_RATE = 1000  # top of the speed slider in generations per second
+
+# Patterns
+PATTERN_INDEX = ".index.json"  # index file name inside the patterns folder
+PATTERN_CACHE = 64  # parsed patterns kept in memory
+PATTERN_WORKERS = 4  # threads indexing pattern files while the GUI starts
+
+# Checkpoints
+# zlib level of saved boards, 0 stores raw rows that are memory-mapped on load
+CHECKPOINT_COMPRESSION = 6
+CHECKPOINT_CHUNK = 1 << 20  # uncompressed bytes per compressed chunk
+
+# Cycle detection
+HASH_HISTORY = 4096  # generations remembered, 0 disables detection
+AUTO_STOP = True  # pause once the board dies out, settles or starts repeating
+
+# History
+HISTORY_BUDGET = 64 << 20  # compressed bytes of past generations kept, 0 disables stepping back
+HISTORY_KEYFRAME = 64  # generations between full copies of the board
+
+# Statistics
+STATS_FILE = None  # append the statistics of every GUI generation to this file
+STATS_CAPACITY = 1 << 20  # records preallocated in a new file, doubled when full
+
+# Profiling
+PROFILE = False  # record timings from the start, also toggleable in the GUI
+PROFILE_FILE = None  # stream records to this CSV (or .jsonl) file
+PROFILE_WINDOW = 60  # records per rolling average
+
+# Soup search
+SOUP_SIZE = 64  # board side of every random soup
+SOUP_BATCH = 256  # soups stepped together in one array
+SOUP_HISTORY = 64  # generations remembered per soup, the longest period found
+SOUP_GENERATIONS = 10000  # soups still changing by then count as unsettled
+
+# Server
+SERVER_HOST = "127.0.0.1"  # only local clients by default
+SERVER_PORT = 8765
+SERVER_LINE_LIMIT = 1 << 26  # longest message in bytes, new clients get the whole board at once
 
 # Themes
 # Available: "Light", "Dark", "Orchid", "Explosive", "Aquatic", "Meadow"
@@ -16,6 +66,23 @@ DEFAULT_THEME = "Dark"
 
 # Optimization
 
+# Stepping engine
+# Available: "dense", "bitpacked", "sparse" (unbounded unless toroidal),
+# "hashlife" (unbounded, jumps many generations per step),
+# "tiled" (skips settled areas), "parallel" (process pool, for huge boards)
+ENGINE = "dense"
+ENGINES = ("dense", "bitpacked", "sparse", "hashlife", "tiled", "parallel")
+# Cached HashLife nodes before unused ones are collected (~200 B each)
+HASHLIFE_MAX_NODES = 2_000_000
+# Tile size of the tiled engine in cells
+TILE = 32
+# Worker processes of the parallel engine, 0 for one per CPU
+WORKERS = 0
+
+# Use whole-board array operations instead of per-cell loops
+# Fastest option, OPTIMIZE and USE_QUEUE are ignored when enabled
+VECTORIZE = True
+
 # Use proximal neighbor calculation
 # Greatly improves speed on large boards
 OPTIMIZE = True
@@ -1,9 +1,22 @@
 """Conway's Game of Life GUI and logic."""
 
-import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+import queue
 import tkinter as tk
-
-from parser import generate_pattern_list
+from tkinter import filedialog
+from time import perf_counter
+
+import checkpoint
+from cycles import Census, Detector, fast_forward
+from engine import create_engine
+from history import History
+from library import Library
+from parser import write_rle
+from profiler import Profiler
+from render import Renderer, display_states, PRIMARY, SECONDARY, EMPTY
+from rules import Rule
+from runner import Runner
+from stats import Stats
 from config import *
 
 
@@ -13,30 +26,57 @@ class Conway:
         self.root.title("Conway's Game of Life")
 
         # Engine variables
-        self.board = np.zeros((HEIGHT, WIDTH))
-        self.gen = 0
-        self.time = tk.DoubleVar()
-        self.time.set(100)
+        self.engine = create_engine(ENGINE, HEIGHT, WIDTH)
+        # Population and changes measured once per generation for the detector and the statistics
+        self.census = Census()
+        self.detector = Detector(census=self.census) if HASH_HISTORY else None
+        self.profiler = Profiler()
+        self.history = History() if HISTORY_BUDGET else None
+        self.stats = Stats(STATS_FILE, census=self.census) if STATS_FILE else None
+        self.runner = Runner(self.engine, detector=self.detector, profiler=self.profiler,
+                             history=self.history, stats=self.stats)
+        self.runner.start()
+        self.rate = tk.DoubleVar()
+        self.rate.set(MAX_RATE)
         self.paused = False
-        self.cells = set()
-        self.lines = set()
+        self.shown = (0, perf_counter())
+        self.sim_rate = 0.0
+        self.render_rate = 0.0
 
         # Patterns
         self.pattern = tk.StringVar()
         self.pattern.set("None")
-        self.patterns = generate_pattern_list()
-        # TODO: Implement pattern rotation
+        # The saved index is shown at once, files are indexed in the background
+        self.patterns = Library(refresh=False)
+        self.loader = ThreadPoolExecutor(PATTERN_WORKERS)
+        self.loaded = queue.Queue()
+        self.loading = 0
+        # Index into Library.orientations(), kept between placements
+        self.orientation = 0
+        self.root.bind("<KeyPress-r>", self.rotate_pattern)
+        self.root.bind("<KeyPress-f>", self.flip_pattern)
+        self.root.bind("<KeyPress-b>", lambda event: self.typing(event) or self.step_back())
+        for key in ("Up", "Down", "Left", "Right", "plus", "equal", "minus", "KP_Add",
+                    "KP_Subtract"):
+            self.root.bind(f"<KeyPress-{key}>", self.view_key)
 
         # Board properties
         self.toroid = tk.BooleanVar()
         self.trails = tk.BooleanVar()
+        self.profiling = tk.BooleanVar()
+        self.profiling.set(PROFILE)
 
         ### Main window
 
         # Menu bar
         self.menubar = tk.Menu(self.root)
         self.root.config(menu=self.menubar)
-        # TODO: Populate menu with options
+        self.file_menu = tk.Menu(self.menubar, tearoff=0)
+        self.file_menu.add_command(label="Save checkpoint...", command=self.save_checkpoint)
+        self.file_menu.add_command(label="Load checkpoint...", command=self.load_checkpoint)
+        self.file_menu.add_separator()
+        self.file_menu.add_command(label="Export RLE...", command=self.export_rle)
+        self.menubar.add_cascade(label="File", menu=self.file_menu)
 
         # Board
         self.makeboard()
@@ -45,7 +85,7 @@ class Conway:
         self.pattern_menu = tk.OptionMenu(
             self.root,
             self.pattern,
-            *self.patterns,
+            *(self.patterns.names() or ["None"]),
             command=self.use_pattern
         )
         self.pattern_menu.config()
@@ -56,7 +96,7 @@ class Conway:
         self.randomize.grid(row=1, column=1)
 
         # Generation label
-        self.generation = tk.Label(self.root, text=f"Generation {self.gen}")
+        self.generation = tk.Label(self.root, text=f"Generation {self.engine.gen}")
         self.generation.grid(row=1, column=2)
 
         # Width
@@ -66,7 +106,7 @@ class Conway:
         self.pre_width.set(WIDTH)
         self.width_control = tk.Spinbox(
             self.width_frame,
-            from_=10, to=200, width=5,
+            from_=10, to=20000, width=5,
             textvariable=self.pre_width
         )
         self.width_control.pack()
@@ -78,7 +118,7 @@ class Conway:
         self.pre_height.set(HEIGHT)
         self.height_control = tk.Spinbox(
             self.height_frame,
-            from_=10, to=200, width=5,
+            from_=10, to=20000, width=5,
             textvariable=self.pre_height
         )
         self.height_control.pack()
@@ -95,14 +135,28 @@ class Conway:
         )
         self.cell_control.pack()
 
+        # Step back
+        self.back_button = tk.Button(self.root, text="Back", command=self.step_back)
+        self.back_button.grid(row=2, column=0)
+        if self.history is None:
+            self.back_button.config(state=tk.DISABLED)
+
         # Toroidal board
-        self.toroid_toggle = tk.Checkbutton(self.root, text="Toroidal", variable=self.toroid)
+        self.toroid_toggle = tk.Checkbutton(
+            self.root, text="Toroidal", variable=self.toroid, command=self.set_toroid
+        )
         self.toroid_toggle.grid(row=2, column=2)
 
         # Trails
         self.trail_toggle = tk.Checkbutton(self.root, text="Trails", variable=self.trails)
         self.trail_toggle.grid(row=2, column=3)
 
+        # Profiler overlay
+        self.profile_toggle = tk.Checkbutton(
+            self.root, text="Profile", variable=self.profiling, command=self.set_profiling
+        )
+        self.profile_toggle.grid(row=2, column=1)
+
         # Themes
         self.themes = ("Light", "Dark", "Orchid", "Explosive", "Aquatic", "Meadow")
         self.theme = tk.StringVar()
@@ -121,13 +175,12 @@ class Conway:
         self.apply.grid(row=2, column=5)
 
         # Speed
-        self.maxspeed = 100
-        self.speed_frame = tk.LabelFrame(self.root, text="Speed")
+        self.speed_frame = tk.LabelFrame(self.root, text="Speed (gen/s)")
         self.speed_frame.grid(row=2, column=6, columnspan=4, rowspan=2)
-        self.sleep_var = tk.DoubleVar()
         self.speed_control = tk.Scale(
-            self.speed_frame, from_=1, to=self.maxspeed,
-            resolution=0.1, orient=tk.HORIZONTAL, variable=self.time
+            self.speed_frame, from_=1, to=MAX_RATE,
+            resolution=1, orient=tk.HORIZONTAL, variable=self.rate,
+            command=self.set_rate
         )
         self.speed_control.pack()
 
@@ -137,10 +190,82 @@ class Conway:
         self.reset_button = tk.Button(self.root, text="Reset", command=self.reset)
         self.reset_button.grid(row=3, column=1)
 
+        # Rule
+        self.rule_frame = tk.LabelFrame(self.root, text="Rule")
+        self.rule_frame.grid(row=3, column=2, columnspan=2)
+        self.rule = tk.StringVar()
+        self.rule.set(str(self.engine.rule))
+        self.rule_control = tk.Entry(self.rule_frame, width=12, textvariable=self.rule)
+        self.rule_control.bind("<Return>", lambda event: self.set_rule(self.rule.get()))
+        self.rule_control.pack()
+
+        # Fast-forward
+        self.goto_frame = tk.LabelFrame(self.root, text="Go to generation")
+        self.goto_frame.grid(row=3, column=4, columnspan=2)
+        self.target = tk.StringVar()
+        self.goto_control = tk.Entry(self.goto_frame, width=12, textvariable=self.target)
+        self.goto_control.bind("<Return>", lambda event: self.go_to(self.target.get()))
+        self.goto_control.pack()
+
         # Apply theme
         self.change_theme(DEFAULT_THEME)
 
+        self.load_patterns()
         tk.mainloop()
+        self.loader.shutdown(wait=False, cancel_futures=True)
+        self.profiler.close()
+        if self.stats is not None:
+            self.stats.close()
+
+    def load_patterns(self):
+        """Find and index the pattern files in the background."""
+        self.loading += 1
+        future = self.loader.submit(self.patterns.scan)
+        future.add_done_callback(lambda future: self.loaded.put((None, None, future)))
+        self.root.after(1000 // FPS, self.poll_patterns)
+
+    def poll_patterns(self):
+        """Take in the files indexed so far and fill the pattern menu with them."""
+        changed = False
+        while True:
+            try:
+                path, stat, future = self.loaded.get_nowait()
+            except queue.Empty:
+                break
+            self.loading -= 1
+            changed = True
+            try:
+                result = future.result()
+            except Exception as error:
+                if path is None:
+                    print(f"WARNING: Could not scan the patterns: {error}")
+                else:
+                    self.patterns.fail(path, error)
+                continue
+            if path is None:
+                # Scanned, parse what changed since the index was saved
+                for path, stat in self.patterns.changes(result):
+                    self.loading += 1
+                    future = self.loader.submit(self.patterns.parse, path)
+                    future.add_done_callback(
+                        lambda future, path=path, stat=stat: self.loaded.put((path, stat, future))
+                    )
+            else:
+                self.patterns.add(path, stat, result)
+        if changed:
+            self.patterns.update_names()
+            self.fill_pattern_menu()
+        if self.loading:
+            self.root.after(1000 // FPS, self.poll_patterns)
+        elif self.patterns.dirty:
+            self.patterns.save()
+
+    def fill_pattern_menu(self):
+        """List the indexed patterns in the pattern menu."""
+        menu = self.pattern_menu["menu"]
+        menu.delete(0, "end")
+        for name in self.patterns.names():
+            menu.add_command(label=name, command=tk._setit(self.pattern, name, self.use_pattern))
 
     def use_pattern(self, pattern):
         """
@@ -149,12 +274,53 @@ class Conway:
         args:
             pattern [str]: name of pattern
         """
-        print("Select position...")
+        try:
+            arrays, rule = self.patterns.orientations(pattern)
+        except (OSError, ValueError, KeyError) as error:
+            print(f"WARNING: Could not load {pattern}: {error}")
+            self.pattern.set("None")
+            return
+        print("Select position... (R to rotate, F to flip)")
         self.canvas.bind("<Button-1>", lambda event: self.place_pattern(
-            event.y // CELL, event.x // CELL, self.patterns[pattern]
+            *self.renderer.cell_at(event.y, event.x), arrays[self.orientation], rule
         ))
 
-    def place_pattern(self, y, x, array):
+    def rotate_pattern(self, event):
+        """
+        Turn the pattern being placed clockwise.
+
+        args:
+            event [tk.Event]: key press
+        """
+        if not self.typing(event):
+            flipped, turns = divmod(self.orientation, 4)
+            self.orientation = flipped * 4 + (turns + 1) % 4
+
+    def flip_pattern(self, event):
+        """
+        Mirror the pattern being placed left to right.
+
+        args:
+            event [tk.Event]: key press
+        """
+        if not self.typing(event):
+            # Mirroring a turned pattern equals turning the mirror image back
+            flipped, turns = divmod(self.orientation, 4)
+            self.orientation = (1 - flipped) * 4 + -turns % 4
+
+    def typing(self, event):
+        """
+        Tell key presses meant for a text field from shortcuts.
+
+        args:
+            event [tk.Event]: key press
+
+        returns:
+            typing [bool]: whether a text field has the focus
+        """
+        return isinstance(event.widget, (tk.Entry, tk.Spinbox))
+
+    def place_pattern(self, y, x, array, rule=None):
         """
         Place pattern on the board and unbind mouse click.
 
@@ -162,15 +328,22 @@ class Conway:
             y [int]: y position
             x [int]: x position
             array [np.array]: pattern array
+            rule [Rule]: rule the pattern is meant for, switched to if given
         """
         self.canvas.bind("<Button-1>",
-            lambda event: self.set_cell_state(1, event.y // CELL, event.x // CELL))
-        for row in array:
-            for c in row:
-                self.set_cell_state(c, y, x)
-                x += 1
-            y += 1
-            x -= array.shape[1]
+            lambda event: self.set_cell_state(1, *self.renderer.cell_at(event.y, event.x)))
+        if rule is not None:
+            self.set_rule(rule)
+        with self.runner.lock:
+            self.engine.place(array, y, x)
+            self.forget_cycles()
+            alive = self.engine.window(*self.renderer.edges()) == 1
+        # Redraw once, leaving the look of untouched cells as it was
+        states = self.renderer.shown.copy()
+        shown = (states == PRIMARY) | (states == SECONDARY)
+        states[alive & ~shown] = PRIMARY
+        states[~alive & shown] = EMPTY
+        self.renderer.draw(states)
         self.pattern.set("None")
 
     def set_cell_state(self, state, y, x):
@@ -179,197 +352,429 @@ class Conway:
 
         args:
             state [int]: cell state
-            y [int]: y position
-            x [int]: x position
+            y [int]: y position on the board
+            x [int]: x position on the board
         """
-        if 0 <= y <= HEIGHT-1 and 0 <= x <= WIDTH-1:
-            if state == 1:
-                self.board[y, x] = 1
-                self.color_cell(x, y, "primary")
-            else:
-                self.board[y, x] = 0
-                self.color_cell(x, y, "bg")
-
-    def calculate_neighbors(self, y, x):
+        height, width = self.engine.height, self.engine.width
+        if not self.renderer.bounded or (0 <= y < height and 0 <= x < width):
+            with self.runner.lock:
+                changed = self.engine.set_cell(state, y, x)
+                self.forget_cycles()
+            if changed:
+                self.renderer.draw_cell(y, x, PRIMARY if state == 1 else EMPTY)
+
+    def set_rule(self, rule):
         """
-        Calculate the number of live neighbors for a given cell.
+        Switch the rule, keeping the current one if the new one is invalid.
 
         args:
-            y [int]: y position
-            x [int]: x position
+            rule [str|Rule]: rule or its B/S notation
         """
-        if USE_QUEUE:
-            if (x, y) in self.queue:
-                return
-            self.queue.add((x, y))
-
-        if self.toroid.get():
-            neighbors = sum(self.old_board[(y-h) % HEIGHT, (x-w) % WIDTH] \
-                            for h in range(-1, 2) \
-                            for w in range(-1, 2) \
-                            if h != 0 or w != 0)
-        else:
-            if y in (0, HEIGHT-1) or x in (0, WIDTH-1):
-                neighbors = 0
-                for h in range(-1, 2):
-                    for w in range(-1, 2):
-                        if h == 0 and w == 0:
-                            continue
-                        if 0 <= y+h < HEIGHT and 0 <= x+w < WIDTH:
-                            neighbors += self.old_board[(y+h), (x+w)]
-            else:
-                neighbors = sum(self.old_board[y+h, x+w] \
-                                for h in range(-1, 2) \
-                                for w in range(-1, 2) \
-                                if h != 0 or w != 0)
-        # Apply the rules to the current cell
-        if (self.old_board[y, x] == 0 and neighbors in REPRODUCE) \
-        or (self.old_board[y, x] == 1 and neighbors in SURVIVE):
-            self.board[y, x] = 1
+        try:
+            if isinstance(rule, str):
+                rule = Rule.from_string(rule)
+            with self.runner.lock:
+                self.engine.rule = rule
+                self.forget_cycles()
+        except ValueError as error:
+            print(f"WARNING: {error}")
+        self.rule.set(str(self.engine.rule))
+
+    def set_rate(self, rate):
+        """
+        Set the target simulation speed.
 
-    def proximal_calculation(self, y, x):
+        args:
+            rate [str]: generations per second
         """
-        Calculate the number of live neighbors for cells around a live cell.
+        self.runner.rate = float(rate)
+
+    def set_toroid(self):
+        """Apply the toroidal board toggle to the engine, unticking it if the engine has no edges."""
+        try:
+            with self.runner.lock:
+                self.engine.toroid = self.toroid.get()
+                self.forget_cycles()
+        except ValueError as error:
+            print(f"WARNING: {error}")
+        self.toroid.set(self.engine.toroid)
+
+    def forget_cycles(self):
+        """Restart cycle detection and history after an edit, call with the runner lock held."""
+        self.census.clear()
+        if self.detector is not None:
+            self.detector.clear()
+        if self.history is not None:
+            self.history.forget(self.engine.gen)
+
+    def rewind(self, gen):
+        """
+        Restore a generation from the history, call with the runner lock held.
 
         args:
-            y [int]: y position
-            x [int]: x position
+            gen [int]: stored generation
         """
-        ranges = ((h, w) for h in range(-1, 2) for w in range(-1, 2))
-        if self.toroid.get():
-            for h, w in ranges:
-                self.calculate_neighbors((y+h) % HEIGHT, (x+w) % WIDTH)
-        else:
-            for h, w in ranges:
-                if 0 <= y+h < HEIGHT and 0 <= x+w < WIDTH:
-                    self.calculate_neighbors(y+h, x+w)
-
-    # Ruleset
-    def evolve(self):
-        """Calculate the next generation."""
-        self.old_board = self.board
-        self.board = np.zeros((HEIGHT, WIDTH))
-        self.queue = set()
-        # Count the number of live neighbors
-        for y in range(HEIGHT):
-            for x in range(WIDTH):
-                if OPTIMIZE:
-                    if self.old_board[y, x] == 1:
-                        self.proximal_calculation(y, x)
-                else:
-                    self.calculate_neighbors(y, x)
+        self.history.restore(self.engine, gen)
+        # Stepping on from here repeats stored generations, not an edit
+        self.census.clear()
+        if self.detector is not None:
+            self.detector.clear()
+
+    def step_back(self):
+        """Go back to the previous stored generation."""
+        if self.history is None:
+            return
+        if self.runner.running.is_set():
+            self.pause()
+        with self.runner.lock:
+            # Keep the board as it is now, in case it was edited since the last step
+            self.history.record(self.engine)
+            gen = self.history.previous(self.engine.gen)
+            if gen is not None:
+                self.rewind(gen)
+        if gen is None:
+            print("WARNING: No earlier generation in the history")
+            return
+        self.redraw(plain=True)
+        self.shown = (gen, perf_counter())
+        self.generation.config(text=f"Generation: {gen}")
+
+    def go_to(self, target):
+        """
+        Go to a generation stored in the history, or fast-forward to it using
+        the detected cycle.
 
-    def paint_board(self, y, x):
+        args:
+            target [str]: generation to jump to
+        """
+        try:
+            target = int(target)
+        except ValueError:
+            print(f"WARNING: Invalid generation: {target}")
+            return
+        if self.history is not None:
+            with self.runner.lock:
+                self.history.record(self.engine)
+                stored = target in self.history
+                if stored:
+                    self.rewind(target)
+            if stored:
+                self.redraw(plain=True)
+                self.shown = (target, perf_counter())
+                self.generation.config(text=f"Generation: {target}")
+                return
+        edges = self.renderer.edges()
+        with self.runner.lock:
+            cycle = self.detector.cycle if self.detector else None
+            if cycle is None:
+                print("WARNING: No cycle detected yet, let the board run first")
+                return
+            try:
+                fast_forward(self.engine, cycle, target)
+            except ValueError as error:
+                print(f"WARNING: {error}")
+                return
+            self.detector.skip(self.engine)
+            board = self.engine.window(*edges)
+            old_board = self.engine.window(*edges, old=True)
+        self.paint_board(board, old_board)
+        self.shown = (target, perf_counter())
+        self.generation.config(text=f"Generation: {target}\n{cycle}")
+
+    def paint_board(self, board, old_board):
         """
-        Paint the cell.
+        Paint the cells whose look changed since the last frame.
 
         args:
-            y [int]: y position
-            x [int]: x position
+            board [np.array]: current generation
+            old_board [np.array]: previous generation
         """
-        if self.board[y, x] == 1:
-            if self.board[y, x] == self.old_board[y, x]:
-                self.color_cell(x, y, "primary")
-            else:
-                self.color_cell(x, y, "secondary")
-        elif self.trails.get() is True and self.old_board[y, x] == 1:
-            self.color_cell(x, y, "trail")
+        self.renderer.draw(display_states(board, old_board, self.trails.get()))
 
     def start(self):
         """Start the simulation."""
         self.paused = False
         self.play_button.config(text="Pause", command=self.pause)
+        self.shown = (self.engine.gen, perf_counter())
+        if self.history is not None:
+            with self.runner.lock:
+                # The board may have been edited since the last step
+                self.history.record(self.engine)
+        self.runner.resume()
         self.play()
 
     def play(self):
-        """Play the simulation."""
+        """Show the latest generation computed by the runner, once per frame."""
         if self.paused is False:
-            self.gen += 1
-            print(f"Generation {self.gen}", end='\r')
-            self.flush_cells()
-            self.evolve()
-            for y in range(HEIGHT):
-                for x in range(WIDTH):
-                    self.paint_board(y, x)
-            delay = int(self.maxspeed/self.time.get())*10
-            self.generation.config(text=f"Generation: {self.gen}")
+            if self.runner.error is not None:
+                print(f"ERROR: {self.runner.error}")
+                self.pause()
+                return
+            start = perf_counter()
+            edges = self.renderer.edges()
+            with self.runner.lock:
+                gen = self.engine.gen
+                if gen != self.shown[0]:
+                    board = self.engine.window(*edges)
+                    old_board = self.engine.window(*edges, old=True)
+                cycle, self.runner.cycle = self.runner.cycle, None
+                stopped = not self.runner.running.is_set()
+            copied = painted = perf_counter()
+            if gen != self.shown[0]:
+                self.paint_board(board, old_board)
+                painted = perf_counter()
+                print(f"Generation {gen}", end='\r')
+
+            # Smoothed simulation and render rates
+            elapsed = start - self.shown[1]
+            if elapsed > 0:
+                self.sim_rate += 0.1 * ((gen - self.shown[0]) / elapsed - self.sim_rate)
+                self.render_rate += 0.1 * (1 / elapsed - self.render_rate)
+            self.shown = (gen, start)
+            self.generation.config(
+                text=f"Generation: {gen}\n{self.sim_rate:.0f} gen/s, {self.render_rate:.0f} fps"
+            )
+            if cycle is not None:
+                print(f"\n{cycle}")
+                if stopped:
+                    # Auto-stopped, nothing left to watch
+                    self.pause()
+                    self.generation.config(text=f"Generation: {gen}\n{cycle}")
+                    return
+            if self.profiler.enabled:
+                self.show_profile()
             self.canvas.update()
-            self.canvas.after(delay, self.play)
+            if self.profiler.enabled:
+                self.profiler.record(
+                    "frame", gen=gen, copy=copied - start, paint=painted - copied,
+                    update=perf_counter() - painted, items=self.renderer.item_count
+                )
+            delay = int(1000 / FPS - (perf_counter() - start) * 1000)
+            self.canvas.after(max(delay, 1), self.play)
+
+    def set_profiling(self):
+        """Start or stop profiling along with its overlay."""
+        self.profiler.enabled = self.profiling.get()
+        if not self.profiler.enabled and self.overlay is not None:
+            self.canvas.delete(self.overlay)
+            self.overlay = None
+
+    def show_profile(self):
+        """Show the rolling averages of the profiler over the board."""
+        if self.overlay is None:
+            self.overlay = self.canvas.create_text(
+                4, 4, anchor="nw", font=("Courier", 9), fill=self.renderer.colors["primary"]
+            )
+        self.canvas.itemconfig(self.overlay, text=self.profiler.summary())
+        self.canvas.tag_raise(self.overlay)
 
     def pause(self):
         """Pause the simulation."""
         self.paused = True
+        self.runner.pause()
         self.play_button.config(text="Resume", command=self.start)
 
     def reset(self):
         """Reset the simulation."""
         self.paused = True
-        self.flush_cells()
-        self.board = np.zeros((HEIGHT, WIDTH))
-        self.cells = set()
+        self.runner.pause()
+        self.renderer.clear()
+        with self.runner.lock:
+            self.engine.clear()
+            self.forget_cycles()
+        self.shown = (0, perf_counter())
         self.play_button.config(text="Start", command=self.start)
-        self.gen = 0
 
     def makeboard(self):
         """Create the game board."""
-        self.canvas = tk.Canvas(self.root, width=CELL*WIDTH-1, height=CELL*HEIGHT-1)
+        view_height = min(CELL*HEIGHT, VIEW_HEIGHT)
+        view_width = min(CELL*WIDTH, VIEW_WIDTH)
+        self.canvas = tk.Canvas(self.root, width=view_width-1, height=view_height-1)
         self.canvas.grid(row=0, column=0, columnspan=10)
-        self.makelines()
+        self.overlay = None
+        self.drag = None
+        # Unbounded universes can be panned and edited past the board
+        bounded = self.engine.toroid or not hasattr(self.engine, "to_array")
+        self.renderer = Renderer(self.canvas, HEIGHT, WIDTH, view_height, view_width, CELL,
+                                 bounded)
         self.canvas.bind("<Button-1>",
-            lambda event: self.set_cell_state(1, event.y // CELL, event.x // CELL))
+            lambda event: self.set_cell_state(1, *self.renderer.cell_at(event.y, event.x)))
         self.canvas.bind("<B1-Motion>",
-            lambda event: self.set_cell_state(1, event.y // CELL, event.x // CELL))
+            lambda event: self.set_cell_state(1, *self.renderer.cell_at(event.y, event.x)))
         self.canvas.bind("<Button-3>",
-            lambda event: self.set_cell_state(0, event.y // CELL, event.x // CELL))
+            lambda event: self.set_cell_state(0, *self.renderer.cell_at(event.y, event.x)))
         self.canvas.bind("<B3-Motion>",
-            lambda event: self.set_cell_state(0, event.y // CELL, event.x // CELL))
+            lambda event: self.set_cell_state(0, *self.renderer.cell_at(event.y, event.x)))
+        # Middle button drags the view, the wheel zooms
+        self.canvas.bind("<Button-2>", lambda event: setattr(self, "drag", (event.y, event.x)))
+        self.canvas.bind("<B2-Motion>", self.drag_view)
+        self.canvas.bind("<MouseWheel>",
+            lambda event: self.zoom_view(event.y, event.x, 2 if event.delta > 0 else 0.5))
+        self.canvas.bind("<Button-4>", lambda event: self.zoom_view(event.y, event.x, 2))
+        self.canvas.bind("<Button-5>", lambda event: self.zoom_view(event.y, event.x, 0.5))
+
+    def pan_view(self, dy, dx):
+        """
+        Move the view.
 
-    def makelines(self):
-        """Draw the grid lines."""
-        for y in range(HEIGHT):
-            self.lines.add(self.canvas.create_line(0, y*CELL, CELL*WIDTH, y*CELL))
-        for x in range(WIDTH):
-            self.lines.add(self.canvas.create_line(x*CELL, 0, x*CELL, CELL*HEIGHT))
+        args:
+            dy [int]: rows to move down by
+            dx [int]: columns to move right by
+        """
+        self.renderer.move(self.renderer.top + dy, self.renderer.left + dx)
+        self.redraw()
 
-    def color_cell(self, x, y, color):
+    def drag_view(self, event):
         """
-        Color a cell.
+        Move the view along with the mouse.
 
         args:
-            x [int]: x position
-            y [int]: y position
-            color [str]: cell color
+            event [tk.Event]: mouse motion
         """
-        self.cells.add((self.canvas.create_rectangle(
-            x*CELL, y*CELL, (x+1)*CELL, (y+1)*CELL,
-            fill=globals()[color], outline=grid), color
-        ))
+        if self.drag is None:
+            return
+        zoom = self.renderer.zoom
+        dy = int((self.drag[0] - event.y) / zoom)
+        dx = int((self.drag[1] - event.x) / zoom)
+        if dy or dx:
+            self.drag = (self.drag[0] - dy * zoom, self.drag[1] - dx * zoom)
+            self.pan_view(dy, dx)
+
+    def zoom_view(self, py, px, factor):
+        """
+        Zoom in or out around a point.
+
+        args:
+            py [int]: y position in px
+            px [int]: x position in px
+            factor [float]: zoom multiplier
+        """
+        self.renderer.zoom_at(py, px, factor)
+        self.redraw()
 
-    def flush_cells(self):
-        """Clear the cells from the board."""
-        for cell in self.cells:
-            self.canvas.delete(cell[0])
-        self.cells = set()
+    def view_key(self, event):
+        """
+        Pan with the arrow keys and zoom with + and -.
+
+        args:
+            event [tk.Event]: key press
+        """
+        if self.typing(event):
+            return
+        rows, cols = self.renderer.view()
+        step_y = max(1, (rows.stop - rows.start) // 4)
+        step_x = max(1, (cols.stop - cols.start) // 4)
+        center = (self.renderer.view_height // 2, self.renderer.view_width // 2)
+        if event.keysym == "Up":
+            self.pan_view(-step_y, 0)
+        elif event.keysym == "Down":
+            self.pan_view(step_y, 0)
+        elif event.keysym == "Left":
+            self.pan_view(0, -step_x)
+        elif event.keysym == "Right":
+            self.pan_view(0, step_x)
+        elif event.keysym in ("plus", "equal", "KP_Add"):
+            self.zoom_view(*center, 2)
+        elif event.keysym in ("minus", "KP_Subtract"):
+            self.zoom_view(*center, 0.5)
+
+    def redraw(self, plain=False):
+        """
+        Draw the part of the board in view from scratch.
+
+        args:
+            plain [bool]: show every live cell in the primary color, otherwise
+                as the running simulation would
+        """
+        edges = self.renderer.edges()
+        with self.runner.lock:
+            board = self.engine.window(*edges)
+            old_board = self.engine.window(*edges, old=True)
+        self.renderer.clear()
+        if plain:
+            self.renderer.draw((board == 1) * PRIMARY)
+        else:
+            self.renderer.draw(display_states(board, old_board, self.trails.get()))
+
+    def refresh_grid(self, engine=None):
+        """
+        Remake the grid on property change.
 
-    def refresh_grid(self):
-        """Remake the grid on property change."""
+        args:
+            engine [Life]: engine to show, a new empty one if not given
+        """
         global HEIGHT, WIDTH, CELL
         HEIGHT = self.pre_height.get()
         WIDTH = self.pre_width.get()
         CELL = self.pre_cell.get()
+        self.reset()
         self.canvas.destroy()
+        with self.runner.lock:
+            # Stop the workers of a parallel engine before replacing it
+            if hasattr(self.engine, "close") and self.engine is not engine:
+                self.engine.close()
+            if engine is None:
+                engine = create_engine(ENGINE, HEIGHT, WIDTH, self.toroid.get(), self.engine.rule)
+            self.engine = engine
+            self.runner.engine = engine
         self.makeboard()
         self.change_theme(self.theme.get())
-        self.reset()
+        self.redraw(plain=True)
+        self.shown = (engine.gen, perf_counter())
+        self.generation.config(text=f"Generation: {engine.gen}")
+
+    def save_checkpoint(self):
+        """Save the engine state to a checkpoint file."""
+        path = filedialog.asksaveasfilename(
+            defaultextension=".ckpt", filetypes=[("Checkpoint", "*.ckpt")]
+        )
+        if not path:
+            return
+        try:
+            with self.runner.lock:
+                checkpoint.save(path, self.engine)
+        except OSError as error:
+            print(f"WARNING: Could not save checkpoint: {error}")
+
+    def load_checkpoint(self):
+        """Resume from a checkpoint file, resizing the board to match it."""
+        path = filedialog.askopenfilename(filetypes=[("Checkpoint", "*.ckpt")])
+        if not path:
+            return
+        try:
+            engine = checkpoint.load(path, ENGINE)
+        except (OSError, ValueError) as error:
+            print(f"WARNING: Could not load checkpoint: {error}")
+            return
+        self.pre_height.set(engine.height)
+        self.pre_width.set(engine.width)
+        self.toroid.set(engine.toroid)
+        self.rule.set(str(engine.rule))
+        self.refresh_grid(engine)
+
+    def export_rle(self):
+        """Export the board as an RLE pattern."""
+        path = filedialog.asksaveasfilename(
+            defaultextension=".rle", filetypes=[("RLE pattern", "*.rle")]
+        )
+        if not path:
+            return
+        with self.runner.lock:
+            board = self.engine.board.copy()
+            rule = self.engine.rule
+            gen = self.engine.gen
+        try:
+            with open(path, "w") as f:
+                write_rle(f, board, f"Generation {gen}", rule)
+        except OSError as error:
+            print(f"WARNING: Could not export pattern: {error}")
 
     def randomize_board(self):
         """Randomize the game board."""
         self.reset()
-        self.board = np.random.randint(2, size=(HEIGHT, WIDTH))
-        for y in range(HEIGHT):
-            for x in range(WIDTH):
-                if self.board[y, x] == 1:
-                    self.color_cell(x, y, "primary")
+        with self.runner.lock:
+            self.engine.randomize()
+        self.redraw(plain=True)
 
     def change_theme(self, theme):
         """
@@ -434,16 +839,23 @@ class Conway:
         self.speed_control.config(**style_slider)
         self.toroid_toggle.config(**style_button)
         self.trail_toggle.config(**style_button)
+        self.profile_toggle.config(**style_button)
         self.theme_menu.config(**style_button)
         self.apply.config(**style_button)
         self.play_button.config(**style_button)
         self.reset_button.config(**style_button)
-
-        for cell in self.cells:
-            self.canvas.itemconfig(cell[0], fill=globals()[cell[1]])
-
-        for line in self.lines:
-            self.canvas.itemconfig(line, fill=grid)
+        self.rule_frame.config(**style_frame)
+        self.rule_control.config(**style_frame)
+        self.goto_frame.config(**style_frame)
+        self.goto_control.config(**style_frame)
+
+        self.renderer.colors = {
+            "primary": primary, "secondary": secondary, "trail": trail, "grid": grid,
+            "background": bg
+        }
+        self.renderer.recolor()
+        if self.overlay is not None:
+            self.canvas.itemconfig(self.overlay, fill=primary)
 
     def update_style(self):
         """Update style variables."""
@@ -474,4 +886,5 @@ class Conway:
         }
         style_slider.update(style)
 
-Conway()
+if __name__ == "__main__":
+    Conway()
@@ -0,0 +1,309 @@
+"""Cycle detection through a rolling board hash."""
+
+from collections import OrderedDict
+
+import numpy as np
+
+from history import live_cells, unbounded
+from sparse import decode
+from config import *
+
+
+# Two polynomial hashes modulo a Mersenne prime, products of residues fit in int64
+PRIME = (1 << 31) - 1
+BASES = ((1_000_003, 998_244_353), (750_000_013, 455_649_001))
+
+def powers(base, count):
+    """
+    Calculate consecutive powers of a base modulo PRIME.
+
+    args:
+        base [int]: base
+        count [int]: number of powers
+
+    returns:
+        powers [np.array]: base^0 to base^(count - 1)
+    """
+    result = np.ones(count, dtype=np.int64)
+    for i in range(1, count):
+        result[i] = result[i - 1] * base % PRIME
+    return result
+
+
+class Cycle:
+    """Periodic behavior found by a Detector."""
+
+    def __init__(self, kind, start, period, offset=(0, 0)):
+        """
+        Describe a cycle.
+
+        args:
+            kind [str]: "extinct", "still", "oscillator" or "spaceship"
+            start [int]: generation known to be in the cycle
+            period [int]: generations per cycle
+            offset [tuple]: y and x translation per period
+        """
+        self.kind = kind
+        self.start = start
+        self.period = period
+        self.offset = offset
+
+    def __str__(self):
+        if self.kind == "extinct":
+            return f"Extinct since generation {self.start}"
+        if self.kind == "still":
+            return f"Still life since generation {self.start}"
+        if self.kind == "oscillator":
+            return f"Oscillator with period {self.period} since generation {self.start}"
+        return (f"Spaceship with period {self.period} moving by {self.offset} "
+                f"since generation {self.start}")
+
+
+class Census:
+    """
+    Population, births, deaths and bounding box of the generations of an engine.
+
+    The numbers are taken from the engine, whose steps keep them once
+    counting is switched on, see Life.count(). The changed cells and the
+    live cell keys are only found when asked for. Everything measuring the
+    same engine can share one census, each generation is then measured
+    once.
+    """
+
+    def __init__(self):
+        """Create an empty census."""
+        self.engine = None
+        self.clear()
+
+    def clear(self):
+        """Forget the last generation, call after editing the board."""
+        if self.engine is not None:
+            # The counts kept by the engine describe the board before the edit
+            self.engine.counts = None
+        self.engine = None
+        self.gen = None
+        self.population = self.births = self.deaths = 0
+        # Top, left, bottom and right edge, bottom and right exclusive, all 0 when empty
+        self.box = (0, 0, 0, 0)
+        # Positions of the cells born and died and live cell keys, found on first use
+        self.changes = None
+        self.cells = None
+
+    @property
+    def born(self):
+        """Y and x positions of the cells born in the last generation."""
+        if self.changes is None:
+            self.changes = self.engine.changes()
+        return self.changes[0]
+
+    @property
+    def died(self):
+        """Y and x positions of the cells died in the last generation."""
+        if self.changes is None:
+            self.changes = self.engine.changes()
+        return self.changes[1]
+
+    @property
+    def keys(self):
+        """Live cell keys of the last generation, see history.live_cells()."""
+        if self.cells is None:
+            self.cells = live_cells(self.engine)
+        return self.cells
+
+    def update(self, engine):
+        """
+        Measure the current generation, does nothing if it is already measured.
+
+        args:
+            engine [Life]: engine after a step
+        """
+        if engine is self.engine and engine.gen == self.gen:
+            return
+        self.engine, self.gen = engine, engine.gen
+        self.changes = self.cells = None
+        engine.counting = True
+        counts = engine.counts
+        if counts is None or counts[0] != engine.gen:
+            # Counting was off for the last step or the board was edited
+            counts = engine.counts = engine.count()
+        _, self.population, self.births, self.deaths, self.box = counts
+
+
+class Detector:
+    """
+    Detect extinction, still lifes, oscillators and spaceships.
+
+    Every generation is hashed as a polynomial of its live cells, sum of
+    a^y * b^x. Bounded engines update the hash from the cells changed by
+    the step; unbounded ones rehash their live cells. Dividing by
+    a^top * b^left moves the hash to the corner of the bounding box, so a
+    translated board hashes the same. The hashes of the last generations
+    are kept in a bounded table along with the population and bounding box,
+    both taken from a Census.
+    """
+
+    def __init__(self, history=HASH_HISTORY, census=None):
+        """
+        Create an empty detector.
+
+        args:
+            history [int]: generations remembered
+            census [Census]: census to share with other measurements, a new one if not given
+        """
+        self.size = history
+        self.history = OrderedDict()
+        self.tables = [[np.ones(1, dtype=np.int64) for _ in base] for base in BASES]
+        self.census = census if census is not None else Census()
+        self.clear()
+
+    def clear(self):
+        """Forget every generation, call after editing the board."""
+        self.history.clear()
+        self.gen = None
+        self.hashes = None
+        self.cycle = None
+        self.census.clear()
+
+    def table(self, i, axis, count):
+        """
+        Get the powers of a base, growing the cached table as needed.
+
+        args:
+            i [int]: hash index
+            axis [int]: 0 for rows, 1 for columns
+            count [int]: minimum number of powers
+
+        returns:
+            powers [np.array]: cached powers
+        """
+        if len(self.tables[i][axis]) < count:
+            self.tables[i][axis] = powers(BASES[i][axis],
+                                          max(count, 2 * len(self.tables[i][axis])))
+        return self.tables[i][axis]
+
+    def terms(self, ys, xs):
+        """
+        Sum the hash terms of some cells.
+
+        args:
+            ys [np.array]: y positions
+            xs [np.array]: x positions
+
+        returns:
+            sums [list]: sum of the terms of every hash
+        """
+        if len(ys) == 0:
+            return [0] * len(BASES)
+        rows, cols = int(ys.max()) + 1, int(xs.max()) + 1
+        return [int((self.table(i, 0, rows)[ys] * self.table(i, 1, cols)[xs] % PRIME).sum()
+                    % PRIME) for i in range(len(BASES))]
+
+    def update(self, engine):
+        """
+        Hash the current generation and look it up in the history.
+
+        args:
+            engine [Life]: engine after a step
+
+        returns:
+            cycle [Cycle]: newly found cycle, None if none or already reported
+        """
+        fresh = self.gen is None or engine.gen != self.gen + 1
+        if fresh:
+            # First generation or the board was replaced
+            self.clear()
+        self.gen = engine.gen
+        self.census.update(engine)
+        population = self.census.population
+        top, left, bottom, right = self.census.box
+
+        if unbounded(engine):
+            # Unbounded universe, hash the live cells relative to their bounding box
+            ys, xs = decode(self.census.keys)
+            hashes = self.terms(ys - top, xs - left)
+        else:
+            if fresh:
+                self.hashes = self.terms(*np.nonzero(engine.board == 1))
+            else:
+                # Only births and deaths change the hash
+                births, deaths = self.terms(*self.census.born), self.terms(*self.census.died)
+                self.hashes = [(h + b - d) % PRIME
+                               for h, b, d in zip(self.hashes, births, deaths)]
+            # Move the hash to the corner of the bounding box
+            hashes = [h * pow(rows_base, -top, PRIME) * pow(cols_base, -left, PRIME)
+                      % PRIME for h, (rows_base, cols_base) in zip(self.hashes, BASES)]
+
+        if population == 0:
+            return self.report(Cycle("extinct", engine.gen, 1))
+        key = (*hashes, population, bottom - top, right - left)
+        seen = self.history.get(key)
+        self.history[key] = (engine.gen, top, left)
+        self.history.move_to_end(key)
+        while len(self.history) > self.size:
+            self.history.popitem(last=False)
+        if seen is None:
+            return None
+
+        gen, old_top, old_left = seen
+        period = engine.gen - gen
+        offset = (top - old_top, left - old_left)
+        if offset != (0, 0):
+            kind = "spaceship"
+        elif period == 1:
+            kind = "still"
+        else:
+            kind = "oscillator"
+        return self.report(Cycle(kind, gen, period, offset))
+
+    def skip(self, engine):
+        """
+        Start over after the engine jumped ahead, keeping the reported cycle.
+
+        args:
+            engine [Life]: engine after the jump
+        """
+        cycle = self.cycle
+        self.clear()
+        self.update(engine)
+        self.cycle = cycle
+
+    def report(self, cycle):
+        """
+        Remember a cycle, reporting only the first one found.
+
+        args:
+            cycle [Cycle]: cycle found
+
+        returns:
+            cycle [Cycle]: the cycle if it is the first one, otherwise None
+        """
+        if self.cycle is not None:
+            return None
+        self.cycle = cycle
+        return cycle
+
+
+def fast_forward(engine, cycle, target):
+    """
+    Jump to a generation using a detected cycle.
+
+    args:
+        engine [Life]: engine inside the cycle
+        cycle [Cycle]: cycle found by a Detector
+        target [int]: generation to jump to
+
+    raises:
+        ValueError
+    """
+    if target < engine.gen:
+        raise ValueError("Cannot fast-forward to a past generation")
+    if cycle.offset != (0, 0) and (not hasattr(engine, "to_array") or engine.toroid):
+        raise ValueError("Spaceships can only be fast-forwarded in unbounded universes")
+    remaining = target - engine.gen
+    laps = remaining // cycle.period
+    engine.step(remaining % cycle.period)
+    if laps and cycle.offset != (0, 0):
+        board, (top, left) = engine.to_array()
+        engine.clear()
+        engine.place(board, top + laps * cycle.offset[0], left + laps * cycle.offset[1])
+    engine.gen = target
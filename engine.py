@@ -0,0 +1,523 @@
+"""Game of Life engine, independent of the GUI."""
+
+import numpy as np
+
+from rules import Rule, add_neighbors, neighborhood_index
+from config import *
+
+
+# Empty rows and columns probed one by one before a bounding box is rescanned
+TRACK_PROBES = 8
+
+def placement(shape, y, x, height, width):
+    """
+    Calculate where a pattern lands on the board, clipping it at the edges.
+
+    args:
+        shape [tuple]: pattern shape
+        y [int]: y position of the top-left corner
+        x [int]: x position of the top-left corner
+        height [int]: board height
+        width [int]: board width
+
+    returns:
+        slices [tuple]: board and pattern slices, None if nothing is visible
+    """
+    top, left = max(y, 0), max(x, 0)
+    bottom = min(y + shape[0], height)
+    right = min(x + shape[1], width)
+    if top >= bottom or left >= right:
+        return None
+    return (np.s_[top:bottom, left:right],
+            np.s_[top-y:bottom-y, left-x:right-x])
+
+def wrap_span(start, length, size):
+    """
+    Split a span wrapping around a board edge into its parts.
+
+    args:
+        start [int]: first position
+        length [int]: span length, cut to the board size
+        size [int]: board size along the axis
+
+    returns:
+        spans [list]: board and pattern slices of every part
+    """
+    length = min(length, size)
+    start %= size
+    first = min(length, size - start)
+    spans = [(slice(start, start + first), slice(0, first))]
+    if first < length:
+        spans.append((slice(0, length - first), slice(first, length)))
+    return spans
+
+def placements(shape, y, x, height, width, toroid=False):
+    """
+    Calculate where a pattern lands on the board, wrapping it around the
+    edges of toroidal boards and clipping it otherwise.
+
+    args:
+        shape [tuple]: pattern shape
+        y [int]: y position of the top-left corner
+        x [int]: x position of the top-left corner
+        height [int]: board height
+        width [int]: board width
+        toroid [bool]: wrap instead of clipping
+
+    returns:
+        slices [list]: board and pattern slices of every visible part
+    """
+    if not toroid:
+        slices = placement(shape, y, x, height, width)
+        return [slices] if slices else []
+    return [(np.s_[rows, cols], np.s_[pattern_rows, pattern_cols])
+            for rows, pattern_rows in wrap_span(y, shape[0], height)
+            for cols, pattern_cols in wrap_span(x, shape[1], width)]
+
+def bounding_box(board):
+    """
+    Find the edges of the live cells of a board.
+
+    args:
+        board [np.array]: board
+
+    returns:
+        box [tuple]: top, left, bottom and right edge, bottom and right exclusive, all 0 if empty
+    """
+    rows = np.flatnonzero(board.any(axis=1))
+    if not len(rows):
+        return 0, 0, 0, 0
+    top, bottom = int(rows[0]), int(rows[-1]) + 1
+    cols = np.flatnonzero(board[top:bottom].any(axis=0))
+    return top, int(cols[0]), bottom, int(cols[-1]) + 1
+
+def grow(box, height, width, toroid=False):
+    """
+    Grow a bounding box by the one cell its live cells can spread in a generation.
+
+    args:
+        box [tuple]: top, left, bottom and right edge, bottom and right exclusive
+        height [int]: board height
+        width [int]: board width
+        toroid [bool]: whether cells can wrap around the board edges
+
+    returns:
+        box [tuple]: grown box, within the board
+    """
+    top, left, bottom, right = box
+    # Cells at an edge of a toroid can step across to the opposite one
+    if toroid and (top == 0 or bottom == height):
+        top, bottom = 0, height
+    if toroid and (left == 0 or right == width):
+        left, right = 0, width
+    return max(top - 1, 0), max(left - 1, 0), min(bottom + 1, height), min(right + 1, width)
+
+def track(board, box, toroid=False):
+    """
+    Find the edges of the live cells of a board from those one generation earlier.
+
+    The earlier box grown by one cell holds every live cell, its edges are
+    moved inwards until they touch one. Edges usually move by a cell or
+    two; after TRACK_PROBES empty rows and columns the rest of the grown
+    box is scanned instead.
+
+    args:
+        board [np.array]: board with at least one live cell
+        box [tuple]: edges one generation earlier, see bounding_box()
+        toroid [bool]: whether cells can wrap around the board edges
+
+    returns:
+        box [tuple]: top, left, bottom and right edge, bottom and right exclusive
+    """
+    if box[0] == box[2]:
+        return bounding_box(board)
+    top, left, bottom, right = grow(box, *board.shape, toroid)
+    # count_nonzero() is a plain C call, several times cheaper than any() on short slices
+    probes = TRACK_PROBES
+    while probes and not np.count_nonzero(board[top, left:right]):
+        top += 1
+        probes -= 1
+    while probes and not np.count_nonzero(board[bottom - 1, left:right]):
+        bottom -= 1
+        probes -= 1
+    while probes and not np.count_nonzero(board[top:bottom, left]):
+        left += 1
+        probes -= 1
+    while probes and not np.count_nonzero(board[top:bottom, right - 1]):
+        right -= 1
+        probes -= 1
+    if probes:
+        return top, left, bottom, right
+    inner = bounding_box(board[top:bottom, left:right])
+    return top + inner[0], left + inner[1], top + inner[2], left + inner[3]
+
+def create_engine(name=ENGINE, *args, **kwargs):
+    """
+    Create an engine by name.
+
+    args:
+        name [str]: engine name, one of ENGINES
+        *args, **kwargs: engine arguments
+
+    returns:
+        engine [Life]: new engine
+
+    raises:
+        ValueError
+    """
+    if name == "dense":
+        return Life(*args, **kwargs)
+    if name == "bitpacked":
+        from bitlife import BitLife
+        return BitLife(*args, **kwargs)
+    if name == "sparse":
+        from sparse import SparseLife
+        return SparseLife(*args, **kwargs)
+    if name == "hashlife":
+        from hashlife import HashLife
+        return HashLife(*args, **kwargs)
+    if name == "tiled":
+        from tiled import TiledLife
+        return TiledLife(*args, **kwargs)
+    if name == "parallel":
+        from parallel import ParallelLife
+        return ParallelLife(*args, **kwargs)
+    raise ValueError(f"Unknown engine: {name}")
+
+
+class Life:
+    # Name used by create_engine
+    name = "dense"
+
+    def __init__(self, height=HEIGHT, width=WIDTH, toroid=False, rule=None):
+        """
+        Create an empty board.
+
+        args:
+            height [int]: board height
+            width [int]: board width
+            toroid [bool]: wrap the board edges
+            rule [Rule]: rule to run, defaults to SURVIVE and REPRODUCE
+        """
+        # Board properties
+        self.height = height
+        self.width = width
+        self.toroid = toroid
+
+        # Rules
+        self._rule = None
+        self.rule = rule if rule is not None else Rule()
+
+        # Optimization
+        self.vectorize = VECTORIZE
+        self.optimize = OPTIMIZE
+        self.use_queue = USE_QUEUE
+
+        # Engine variables, two boards swapped every generation
+        self.board = np.zeros((height, width), dtype=np.uint8)
+        self.old_board = np.zeros((height, width), dtype=np.uint8)
+        self.queue = set()
+        self.gen = 0
+        # Scratch arrays of the vectorized step and of changes(), allocated on first use
+        self.rows = self.sums = self.index = self.cell_index = None
+        self.diff = None
+        # Statistics of the last step, kept by every step while counting is on, see count()
+        self.counting = False
+        self.counts = None
+
+    @property
+    def population(self):
+        """Number of live cells."""
+        return int(np.count_nonzero(self.board))
+
+    @property
+    def evaluated(self):
+        """Number of cells computed in the last generation."""
+        if self.vectorize or not self.rule.totalistic or not self.use_queue:
+            return self.height * self.width
+        return len(self.queue)
+
+    @property
+    def rule(self):
+        """Rule applied on every step, can be switched at any time."""
+        return self._rule
+
+    @rule.setter
+    def rule(self, rule):
+        self.check_rule(rule)
+        self._rule = rule
+
+    @property
+    def survive(self):
+        """Neighbor counts keeping a live cell alive."""
+        return self._rule.survive
+
+    @property
+    def reproduce(self):
+        """Neighbor counts bringing a dead cell to life."""
+        return self._rule.reproduce
+
+    def check_rule(self, rule):
+        """
+        Check that the engine can run a rule.
+
+        args:
+            rule [Rule]: rule to check
+
+        raises:
+            ValueError
+        """
+
+    def window(self, top, left, bottom, right, old=False):
+        """
+        Copy part of the board.
+
+        args:
+            top, left, bottom, right [int]: area edges on the board, bottom and right exclusive
+            old [bool]: read the previous generation instead
+
+        returns:
+            board [np.array]: cells of the area
+        """
+        board = self.old_board if old else self.board
+        return board[top:bottom, left:right].copy()
+
+    def set_cell(self, state, y, x):
+        """
+        Set cell state - alive or dead.
+
+        args:
+            state [int]: cell state
+            y [int]: y position
+            x [int]: x position
+
+        returns:
+            changed [bool]: whether the position is on the board
+        """
+        if 0 <= y < self.height and 0 <= x < self.width:
+            self.board[y, x] = 1 if state == 1 else 0
+            return True
+        return False
+
+    def place(self, array, y, x):
+        """
+        Place pattern on the board, clipping it at the edges or wrapping it on a toroid.
+
+        args:
+            array [np.array]: pattern array
+            y [int]: y position of the top-left corner
+            x [int]: x position of the top-left corner
+        """
+        for board, pattern in placements(array.shape, y, x, self.height, self.width, self.toroid):
+            self.board[board] = array[pattern]
+
+    def clear(self):
+        """Kill every cell and restart the generation counter."""
+        self.board = np.zeros((self.height, self.width), dtype=np.uint8)
+        self.old_board = np.zeros((self.height, self.width), dtype=np.uint8)
+        self.gen = 0
+        self.counts = None
+
+    def randomize(self):
+        """Fill the board with random cells."""
+        self.clear()
+        self.board = np.random.randint(2, size=(self.height, self.width), dtype=np.uint8)
+
+    def calculate_neighbors(self, y, x):
+        """
+        Calculate the number of live neighbors for a given cell.
+
+        args:
+            y [int]: y position
+            x [int]: x position
+        """
+        if self.use_queue:
+            if (x, y) in self.queue:
+                return
+            self.queue.add((x, y))
+
+        if self.toroid:
+            neighbors = sum(self.old_board[(y-h) % self.height, (x-w) % self.width] \
+                            for h in range(-1, 2) \
+                            for w in range(-1, 2) \
+                            if h != 0 or w != 0)
+        else:
+            if y in (0, self.height-1) or x in (0, self.width-1):
+                neighbors = 0
+                for h in range(-1, 2):
+                    for w in range(-1, 2):
+                        if h == 0 and w == 0:
+                            continue
+                        if 0 <= y+h < self.height and 0 <= x+w < self.width:
+                            neighbors += self.old_board[(y+h), (x+w)]
+            else:
+                neighbors = sum(self.old_board[y+h, x+w] \
+                                for h in range(-1, 2) \
+                                for w in range(-1, 2) \
+                                if h != 0 or w != 0)
+        # Apply the rules to the current cell
+        if (self.old_board[y, x] == 0 and neighbors in self.reproduce) \
+        or (self.old_board[y, x] == 1 and neighbors in self.survive):
+            self.board[y, x] = 1
+
+    def proximal_calculation(self, y, x):
+        """
+        Calculate the number of live neighbors for cells around a live cell.
+
+        args:
+            y [int]: y position
+            x [int]: x position
+        """
+        ranges = ((h, w) for h in range(-1, 2) for w in range(-1, 2))
+        if self.toroid:
+            for h, w in ranges:
+                self.calculate_neighbors((y+h) % self.height, (x+w) % self.width)
+        else:
+            for h, w in ranges:
+                if 0 <= y+h < self.height and 0 <= x+w < self.width:
+                    self.calculate_neighbors(y+h, x+w)
+
+    def vectorized_evolve(self):
+        """Calculate the next generation for the whole board at once, in place."""
+        if self.index is None:
+            self.rows = np.empty((self.height, self.width), dtype=np.uint8)
+            self.sums = np.empty((self.height, self.width), dtype=np.uint8)
+            self.index = np.empty((self.height, self.width), dtype=np.intp)
+        old_board, rows, sums, index = self.old_board, self.rows, self.sums, self.index
+        # In-place arithmetic between different types allocates, so each step keeps to one type
+        if not self.rule.totalistic:
+            if self.cell_index is None:
+                self.cell_index = np.empty((self.height, self.width), dtype=np.intp)
+            self.cell_index[...] = old_board
+            neighborhood_index(self.cell_index, self.toroid, out=index)
+            np.take(self.rule.neighborhood, index, out=self.board, mode="clip")
+            return
+        # Sum each 3x3 block, rows first, then columns
+        rows[...] = old_board
+        add_neighbors(rows, old_board, -1, 0, self.toroid)
+        add_neighbors(rows, old_board, 1, 0, self.toroid)
+        sums[...] = rows
+        add_neighbors(sums, rows, 0, -1, self.toroid)
+        add_neighbors(sums, rows, 0, 1, self.toroid)
+        sums <<= 1
+        sums += old_board
+        # Look up the next state of every cell
+        index[...] = sums
+        self.rule.apply_blocks(index, self.board)
+
+    # Ruleset
+    def evolve(self):
+        """Calculate the next generation into the older board."""
+        self.old_board, self.board = self.board, self.old_board
+        self.gen += 1
+        if self.vectorize or not self.rule.totalistic:
+            self.vectorized_evolve()
+        else:
+            self.board[...] = 0
+            self.queue.clear()
+            # Count the number of live neighbors
+            for y in range(self.height):
+                for x in range(self.width):
+                    if self.optimize:
+                        if self.old_board[y, x] == 1:
+                            self.proximal_calculation(y, x)
+                    else:
+                        self.calculate_neighbors(y, x)
+        if self.counting:
+            self.counts = self.count()
+
+    def step(self, n=1):
+        """
+        Advance the board by several generations.
+
+        args:
+            n [int]: number of generations
+
+        returns:
+            board [np.array]: resulting board
+        """
+        for _ in range(n):
+            self.evolve()
+        return self.board
+
+    def previous_counts(self):
+        """
+        Get the statistics of the generation before the current one.
+
+        returns:
+            counts [tuple]: see count(), None if they were not kept
+        """
+        counts = self.counts
+        if counts is None or counts[0] != self.gen - 1:
+            return None
+        return counts
+
+    def count(self):
+        """
+        Measure the generation just stepped to.
+
+        Live cells spread by at most one cell per generation, so after a
+        counted step only the bounding box of the previous generation grown
+        by one cell is read. Otherwise, and under rules with birth on 0
+        neighbors, the whole board is.
+
+        returns:
+            counts [tuple]: generation, population, births, deaths and bounding box
+                (top, left, bottom and right edge, bottom and right exclusive, all 0 if empty)
+        """
+        board, old_board = self.board, self.old_board
+        last = self.previous_counts()
+        if last is None or self.rule.spontaneous:
+            changed = self.count_changes()
+            previous = int(np.count_nonzero(old_board))
+            population = int(np.count_nonzero(board))
+            box = bounding_box(board)
+        else:
+            _, previous, _, _, box = last
+            if box[0] == box[2]:
+                return self.gen, 0, 0, 0, box
+            top, left, bottom, right = grow(box, self.height, self.width, self.toroid)
+            region = np.s_[top:bottom, left:right]
+            if self.diff is None or self.diff.shape != board.shape:
+                self.diff = np.empty(board.shape, dtype=bool)
+            # Contiguous part of the scratch array shaped like the region
+            diff = self.diff.reshape(-1)[:(bottom - top) * (right - left)]
+            diff = diff.reshape(bottom - top, right - left)
+            changed = int(np.count_nonzero(np.not_equal(board[region], old_board[region],
+                                                         out=diff)))
+            population = int(np.count_nonzero(board[region]))
+            if not population:
+                box = (0, 0, 0, 0)
+            elif changed:
+                box = track(board, box, self.toroid)
+        # Every change is a birth or a death, the population change tells them apart
+        births = (changed + population - previous) // 2
+        return self.gen, population, births, changed - births, box
+
+    def count_changes(self):
+        """
+        Count the cells that differ between the board and the previous one.
+
+        returns:
+            changed [int]: cells born or died
+        """
+        board = self.board
+        if self.diff is None or self.diff.shape != board.shape:
+            self.diff = np.empty(board.shape, dtype=bool)
+        return int(np.count_nonzero(np.not_equal(board, self.old_board, out=self.diff)))
+
+    def changes(self):
+        """
+        Find the cells that differ between the board and the previous one.
+
+        returns:
+            born [tuple]: y and x positions of the cells born
+            died [tuple]: y and x positions of the cells died
+        """
+        board = self.board
+        if self.diff is None or self.diff.shape != board.shape:
+            self.diff = np.empty(board.shape, dtype=bool)
+        # Two sparse scans are cheaper than one scan and a split
+        born = np.flatnonzero(np.greater(board, self.old_board, out=self.diff))
+        died = np.flatnonzero(np.less(board, self.old_board, out=self.diff))
+        return np.divmod(born, self.width), np.divmod(died, self.width)
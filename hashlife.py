@@ -0,0 +1,663 @@
+"""HashLife engine for jumping far ahead in time."""
+
+import numpy as np
+
+from engine import Life
+from sparse import decode, encode
+from config import *
+
+
+class Node:
+    """Quadtree node, equal subtrees share a single canonical node."""
+
+    __slots__ = ("k", "a", "b", "c", "d", "n")
+
+    def __init__(self, k, a, b, c, d, n):
+        """
+        Create a node, use HashLife.join instead to keep nodes canonical.
+
+        args:
+            k [int]: level, the node covers 2^k x 2^k cells
+            a, b, c, d [Node]: north-west, north-east, south-west and south-east quadrants
+            n [int]: population
+        """
+        self.k = k
+        self.a = a
+        self.b = b
+        self.c = c
+        self.d = d
+        self.n = n
+
+
+class HashLife(Life):
+    """
+    Life engine on a memoized quadtree, stepping 2^j generations at once.
+
+    The universe is unbounded - height and width only define the window
+    returned by board. Toroidal boards are not supported.
+
+    The previous generation is the one before the last step, so after
+    step(n) old_board, changes() and count_changes() compare against n
+    generations back. Births and deaths are only counted for single
+    generation steps, jumps count them as 0.
+    """
+
+    # Name used by create_engine
+    name = "hashlife"
+
+    def __init__(self, *args, max_nodes=HASHLIFE_MAX_NODES, **kwargs):
+        """
+        Create an empty universe, see Life for other arguments.
+
+        args:
+            max_nodes [int]: node count that triggers garbage collection
+        """
+        self.max_nodes = max_nodes
+        # Cache size that triggers the next collection, raised if much stays reachable
+        self.limit = max_nodes
+        self.nodes = {}
+        self.memo = {}
+        self.hits = 0
+        self.misses = 0
+        self.computed = 0
+        self.collections = 0
+        self.peak_nodes = 0
+        # Nodes and results of the successor calls in progress
+        self.pinned = []
+        # Bounding boxes of nodes relative to their corner, dropped on collection
+        self.extents = {}
+        self.off = Node(0, None, None, None, None, 0)
+        self.on = Node(0, None, None, None, None, 1)
+        self.zeros = [self.off]
+        # Roots and the position of their top-left corners
+        self.root = self.old_root = self.zero(3)
+        self.origin = self.old_origin = (0, 0)
+        # Generation of the old root
+        self.old_gen = 0
+        super().__init__(*args, **kwargs)
+
+    def check_rule(self, rule):
+        """
+        Check that the engine can run a rule.
+
+        args:
+            rule [Rule]: rule to check
+
+        raises:
+            ValueError
+        """
+        if not rule.totalistic:
+            raise ValueError("HashLife only supports totalistic rules")
+        if 0 in rule.reproduce:
+            raise ValueError("Rules with birth on 0 neighbors are not supported by HashLife")
+
+    @Life.rule.setter
+    def rule(self, rule):
+        Life.rule.fset(self, rule)
+        # Cached results belong to the old rule
+        self.memo.clear()
+
+    @property
+    def toroid(self):
+        """Always False, the universe has no edges to wrap."""
+        return False
+
+    @toroid.setter
+    def toroid(self, toroid):
+        if toroid:
+            raise ValueError("HashLife does not support toroidal boards")
+
+    # Statistics
+    @property
+    def node_count(self):
+        """Number of canonical nodes in the cache."""
+        return len(self.nodes)
+
+    @property
+    def hit_rate(self):
+        """Share of successor lookups answered from the cache."""
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    @property
+    def evaluated(self):
+        """Number of nodes computed in the last step, cache hits are free."""
+        return self.computed
+
+    @property
+    def population(self):
+        """Number of live cells."""
+        return self.root.n
+
+    # Quadtree construction
+    def join(self, a, b, c, d):
+        """
+        Get the canonical node with the given quadrants.
+
+        args:
+            a, b, c, d [Node]: north-west, north-east, south-west and south-east quadrants
+
+        returns:
+            node [Node]: canonical node
+        """
+        key = (a, b, c, d)
+        node = self.nodes.get(key)
+        if node is None:
+            node = Node(a.k + 1, a, b, c, d, a.n + b.n + c.n + d.n)
+            self.nodes[key] = node
+        return node
+
+    def zero(self, k):
+        """
+        Get the empty node of a level.
+
+        args:
+            k [int]: level
+
+        returns:
+            node [Node]: empty node
+        """
+        while len(self.zeros) <= k:
+            z = self.zeros[-1]
+            self.zeros.append(self.join(z, z, z, z))
+        return self.zeros[k]
+
+    def centre(self, m):
+        """
+        Surround a node with empty space, one level up.
+
+        args:
+            m [Node]: node to pad
+
+        returns:
+            node [Node]: node of level m.k + 1 with m in its center
+        """
+        z = self.zero(m.k - 1)
+        return self.join(
+            self.join(z, z, z, m.a), self.join(z, z, m.b, z),
+            self.join(z, m.c, z, z), self.join(m.d, z, z, z)
+        )
+
+    def inner(self, m):
+        """
+        Get the center of a node, one level down.
+
+        args:
+            m [Node]: node of level 2 or higher
+        """
+        return self.join(m.a.d, m.b.c, m.c.b, m.d.a)
+
+    def build(self, ys, xs, k):
+        """
+        Build a node from live cell coordinates.
+
+        args:
+            ys [np.array]: y positions relative to the node corner
+            xs [np.array]: x positions relative to the node corner
+            k [int]: level
+
+        returns:
+            node [Node]: canonical node
+        """
+        if len(ys) == 0:
+            return self.zero(k)
+        if k == 0:
+            return self.on
+        half = 1 << (k - 1)
+        south = ys >= half
+        east = xs >= half
+        quadrants = []
+        for mask, dy, dx in ((~south & ~east, 0, 0), (~south & east, 0, half),
+                             (south & ~east, half, 0), (south & east, half, half)):
+            quadrants.append(self.build(ys[mask] - dy, xs[mask] - dx, k - 1))
+        return self.join(*quadrants)
+
+    def from_cells(self, ys, xs):
+        """
+        Build a root node from live cell coordinates.
+
+        args:
+            ys [np.array]: y positions
+            xs [np.array]: x positions
+
+        returns:
+            node [Node]: root node
+            origin [tuple]: y and x position of the top-left corner
+        """
+        if len(ys) == 0:
+            return self.zero(3), (0, 0)
+        ys = np.asarray(ys, dtype=np.int64)
+        xs = np.asarray(xs, dtype=np.int64)
+        top, left = int(ys.min()), int(xs.min())
+        size = max(int(ys.max()) - top, int(xs.max()) - left) + 1
+        k = max(3, (size - 1).bit_length())
+        return self.build(ys - top, xs - left, k), (top, left)
+
+    def cells(self, node=None, origin=None, window=None):
+        """
+        List the live cells of a node.
+
+        args:
+            node [Node]: node to read, defaults to the root
+            origin [tuple]: y and x position of the node corner
+            window [tuple]: only read cells within top, left, bottom and right edge
+
+        returns:
+            ys [np.array]: y positions
+            xs [np.array]: x positions
+        """
+        if node is None:
+            node, origin = self.root, self.origin
+        ys, xs = [], []
+        stack = [(node, origin[0], origin[1])]
+        while stack:
+            m, y, x = stack.pop()
+            if m.n == 0:
+                continue
+            size = 1 << m.k
+            if window and (y >= window[2] or x >= window[3]
+                           or y + size <= window[0] or x + size <= window[1]):
+                continue
+            if m.k == 0:
+                ys.append(y)
+                xs.append(x)
+                continue
+            half = size >> 1
+            stack.extend(((m.a, y, x), (m.b, y, x + half),
+                          (m.c, y + half, x), (m.d, y + half, x + half)))
+        return np.array(ys, dtype=np.int64), np.array(xs, dtype=np.int64)
+
+    def window(self, top, left, bottom, right, old=False):
+        """
+        Render the live cells of an area, see Life.window().
+
+        Only the nodes overlapping the area are visited.
+
+        args:
+            top, left, bottom, right [int]: area edges, bottom and right exclusive
+            old [bool]: read the generation before the last step instead
+
+        returns:
+            board [np.array]: cells of the area
+        """
+        board = np.zeros((max(bottom - top, 0), max(right - left, 0)), dtype=np.uint8)
+        node, origin = (self.old_root, self.old_origin) if old else (self.root, self.origin)
+        ys, xs = self.cells(node, origin, (top, left, bottom, right))
+        board[ys - top, xs - left] = 1
+        return board
+
+    @property
+    def board(self):
+        """Current generation inside the window."""
+        return self.window(0, 0, self.height, self.width)
+
+    @board.setter
+    def board(self, board):
+        self.root, self.origin = self.from_cells(*np.nonzero(board == 1))
+
+    @property
+    def old_board(self):
+        """Generation before the last step inside the window."""
+        return self.window(0, 0, self.height, self.width, old=True)
+
+    @old_board.setter
+    def old_board(self, board):
+        self.old_root, self.old_origin = self.from_cells(*np.nonzero(board == 1))
+
+    def bounds(self):
+        """
+        Calculate the bounding box of the live cells.
+
+        returns:
+            bounds [tuple]: top, left, bottom and right edge (exclusive), None if empty
+        """
+        if self.root.n == 0:
+            return None
+        top, left, bottom, right = self.extent(self.root)
+        y, x = self.origin
+        return top + y, left + x, bottom + y, right + x
+
+    def extent(self, m):
+        """
+        Find the edges of the live cells of a node, cached for every node visited.
+
+        args:
+            m [Node]: node with live cells
+
+        returns:
+            box [tuple]: top, left, bottom and right edge relative to the node corner,
+                bottom and right exclusive
+        """
+        if m.k == 0:
+            return 0, 0, 1, 1
+        box = self.extents.get(m)
+        if box is None:
+            half = 1 << (m.k - 1)
+            boxes = []
+            for q, y, x in ((m.a, 0, 0), (m.b, 0, half), (m.c, half, 0), (m.d, half, half)):
+                if q.n:
+                    top, left, bottom, right = self.extent(q)
+                    boxes.append((top + y, left + x, bottom + y, right + x))
+            box = (min(b[0] for b in boxes), min(b[1] for b in boxes),
+                   max(b[2] for b in boxes), max(b[3] for b in boxes))
+            self.extents[m] = box
+        return box
+
+    def difference(self, a, b, memo):
+        """
+        Count the cells that differ between two nodes of the same level.
+
+        Equal subtrees are the same canonical node, so only changed areas are visited.
+
+        args:
+            a, b [Node]: nodes to compare
+            memo [dict]: counts of the pairs compared so far
+
+        returns:
+            changed [int]: cells alive in only one of the nodes
+        """
+        if a is b:
+            return 0
+        if a.n == 0 or b.n == 0:
+            return a.n + b.n
+        key = (a, b)
+        if key not in memo:
+            memo[key] = (self.difference(a.a, b.a, memo) + self.difference(a.b, b.b, memo)
+                         + self.difference(a.c, b.c, memo) + self.difference(a.d, b.d, memo))
+        return memo[key]
+
+    def to_array(self):
+        """
+        Render every live cell.
+
+        returns:
+            board [np.array]: bounding box contents
+            origin [tuple]: y and x position of the top-left corner
+        """
+        ys, xs = self.cells()
+        if len(ys) == 0:
+            return np.zeros((0, 0), dtype=np.uint8), (0, 0)
+        top, left = int(ys.min()), int(xs.min())
+        board = np.zeros((int(ys.max()) - top + 1, int(xs.max()) - left + 1), dtype=np.uint8)
+        board[ys - top, xs - left] = 1
+        return board, (top, left)
+
+    def set_cell(self, state, y, x):
+        """
+        Set cell state - alive or dead.
+
+        args:
+            state [int]: cell state
+            y [int]: y position
+            x [int]: x position
+
+        returns:
+            changed [bool]: always True, every position is on the board
+        """
+        self.place(np.array([[1 if state == 1 else 0]]), y, x)
+        return True
+
+    def place(self, array, y, x):
+        """
+        Place pattern in the universe, replacing the cells below it.
+
+        args:
+            array [np.array]: pattern array
+            y [int]: y position of the top-left corner
+            x [int]: x position of the top-left corner
+        """
+        ys, xs = self.cells()
+        kept = (ys < y) | (ys >= y + array.shape[0]) | (xs < x) | (xs >= x + array.shape[1])
+        new_ys, new_xs = np.nonzero(array == 1)
+        self.root, self.origin = self.from_cells(
+            np.concatenate((ys[kept], new_ys + y)), np.concatenate((xs[kept], new_xs + x))
+        )
+
+    # Evolution
+    def life_4x4(self, m):
+        """
+        Calculate the center 2x2 cells of a 4x4 node one generation ahead.
+
+        args:
+            m [Node]: level 2 node
+
+        returns:
+            node [Node]: level 1 node
+        """
+        grid = [[m.a.a, m.a.b, m.b.a, m.b.b],
+                [m.a.c, m.a.d, m.b.c, m.b.d],
+                [m.c.a, m.c.b, m.d.a, m.d.b],
+                [m.c.c, m.c.d, m.d.c, m.d.d]]
+        result = []
+        for y in (1, 2):
+            for x in (1, 2):
+                neighbors = sum(grid[y+h][x+w].n
+                                for h in range(-1, 2)
+                                for w in range(-1, 2)
+                                if h != 0 or w != 0)
+                alive = grid[y][x].n
+                result.append(self.on if self.rule.table[alive, neighbors] else self.off)
+        return self.join(*result)
+
+    def successor(self, m, j):
+        """
+        Calculate the center of a node 2^j generations ahead.
+
+        args:
+            m [Node]: node of level 2 or higher
+            j [int]: log2 of the generation count, capped at m.k - 2
+
+        returns:
+            node [Node]: center of m, one level down
+        """
+        if m.n == 0:
+            return m.a
+        j = min(j, m.k - 2)
+        key = (m, j)
+        result = self.memo.get(key)
+        if result is not None:
+            self.hits += 1
+            return result
+        self.misses += 1
+
+        if len(self.nodes) > self.limit or len(self.memo) > self.limit:
+            self.collect()
+
+        if m.k == 2:
+            result = self.life_4x4(m)
+        else:
+            # Nine overlapping sub-nodes, each advanced by up to 2^j generations.
+            # They and their results are pinned as roots while the cache is collected.
+            join, successor = self.join, self.successor
+            frame = [m.a, join(m.a.b, m.b.a, m.a.d, m.b.c), m.b,
+                     join(m.a.c, m.a.d, m.c.a, m.c.b), join(m.a.d, m.b.c, m.c.b, m.d.a),
+                     join(m.b.c, m.b.d, m.d.a, m.d.b), m.c,
+                     join(m.c.b, m.d.a, m.c.d, m.d.c), m.d]
+            self.pinned.append(frame)
+            for i in range(9):
+                frame.append(successor(frame[i], j))
+            c1, c2, c3, c4, c5, c6, c7, c8, c9 = frame[9:]
+            if j < m.k - 2:
+                # Already far enough, only crop to the center
+                result = join(join(c1.d, c2.c, c4.b, c5.a), join(c2.d, c3.c, c5.b, c6.a),
+                              join(c4.d, c5.c, c7.b, c8.a), join(c5.d, c6.c, c8.b, c9.a))
+            else:
+                # Advance the four overlapping quadrants once more
+                frame += (join(c1, c2, c4, c5), join(c2, c3, c5, c6),
+                          join(c4, c5, c7, c8), join(c5, c6, c8, c9))
+                for i in range(18, 22):
+                    frame.append(successor(frame[i], j))
+                result = join(*frame[22:])
+            self.pinned.pop()
+        self.memo[key] = result
+        return result
+
+    def padded(self, m):
+        """
+        Check whether all live cells of a node are in its center half.
+
+        args:
+            m [Node]: node of level 2 or higher
+        """
+        return self.inner(m).n == m.n
+
+    def advance(self, n):
+        """
+        Advance the universe by any number of generations.
+
+        args:
+            n [int]: number of generations
+
+        returns:
+            changed [int]: cells changed by a single generation while counting, otherwise None
+        """
+        self.old_root, self.old_origin = self.root, self.origin
+        node, (top, left) = self.root, self.origin
+        changed = None
+        single = n == 1
+        j = 0
+        while n:
+            if n & 1:
+                # Pad so nothing can escape the center returned by successor
+                while node.k < j + 2 or not self.padded(node):
+                    half = 1 << (node.k - 1)
+                    node, top, left = self.centre(node), top - half, left - half
+                previous = node
+                node, top, left = self.centre(node), top - (1 << (node.k - 1)), left - (1 << (node.k - 1))
+                quarter = 1 << (node.k - 2)
+                self.pinned = [[node]]
+                node, top, left = self.successor(node, j), top + quarter, left + quarter
+                self.pinned = []
+                if single and self.counting:
+                    # The result covers exactly the padded previous generation
+                    changed = self.difference(previous, node, {})
+                self.root, self.origin = node, (top, left)
+                self.collect()
+            n >>= 1
+            j += 1
+        # Drop empty margins
+        while node.k > 3 and self.padded(node):
+            quarter = 1 << (node.k - 2)
+            node, top, left = self.inner(node), top + quarter, left + quarter
+        self.root, self.origin = node, (top, left)
+
+    def mark(self, stack, nodes):
+        """
+        Add the nodes reachable from some nodes to a node table.
+
+        args:
+            stack [list]: nodes to start from, emptied
+            nodes [dict]: node table to add to
+        """
+        while stack:
+            m = stack.pop()
+            if m.k == 0:
+                continue
+            key = (m.a, m.b, m.c, m.d)
+            if key not in nodes:
+                nodes[key] = m
+                stack.extend(key)
+
+    def collect(self):
+        """
+        Drop cached nodes unreachable from the roots and the pinned nodes when over the limit.
+
+        Also called during a step, so the cache stays near max_nodes however far it goes.
+        """
+        self.peak_nodes = max(self.peak_nodes, len(self.nodes), len(self.memo))
+        if len(self.nodes) <= self.limit and len(self.memo) <= self.limit:
+            return
+        self.collections += 1
+        nodes = {}
+        stack = [self.root, self.old_root, self.zeros[-1]]
+        for frame in self.pinned:
+            stack.extend(frame)
+        self.mark(stack, nodes)
+        # Results of reachable nodes stay cached while they fit in half the cap
+        memo = {}
+        for (m, j), result in self.memo.items():
+            if len(nodes) >= self.max_nodes // 2:
+                break
+            if nodes.get((m.a, m.b, m.c, m.d)) is m:
+                memo[m, j] = result
+                self.mark([result], nodes)
+        self.memo = memo
+        self.nodes = nodes
+        self.extents = {}
+        # Room for at least half the cap until the next collection, so it cannot thrash
+        self.limit = max(self.max_nodes, len(nodes) + self.max_nodes // 2)
+
+    def evolve(self):
+        """Calculate the next generation."""
+        self.step(1)
+
+    def step(self, n=1):
+        """
+        Advance the universe by several generations at once.
+
+        The generation before the step becomes the previous one.
+
+        args:
+            n [int]: number of generations
+
+        returns:
+            board [np.array]: window contents of the resulting generation
+        """
+        misses = self.misses
+        self.old_gen = self.gen
+        changed = self.advance(n)
+        self.computed = self.misses - misses
+        self.gen += n
+        if self.counting:
+            if changed is None:
+                self.counts = self.count()
+            else:
+                births = (changed + self.root.n - self.old_root.n) // 2
+                self.counts = (self.gen, self.root.n, births, changed - births, self.box())
+        return self.board
+
+    def box(self):
+        """
+        Find the edges of the live cells.
+
+        returns:
+            box [tuple]: top, left, bottom and right edge, bottom and right exclusive, all 0 if empty
+        """
+        return self.bounds() or (0, 0, 0, 0)
+
+    def count(self):
+        """
+        Measure the current generation against the one before the last step, see Life.count().
+
+        Births and deaths are 0 unless the current generation directly
+        follows the old one, jumps are not counted.
+
+        returns:
+            counts [tuple]: generation, population, births, deaths and bounding box
+        """
+        if self.gen - self.old_gen != 1:
+            return self.gen, self.root.n, 0, 0, self.box()
+        born, died = self.changes()
+        return self.gen, self.root.n, len(born[0]), len(died[0]), self.box()
+
+    def count_changes(self):
+        """
+        Count the cells that differ between the live cells and the previous ones.
+
+        returns:
+            changed [int]: cells born or died
+        """
+        born, died = self.changes()
+        return len(born[0]) + len(died[0])
+
+    def changes(self):
+        """
+        Find the cells that differ between the live cells and the previous ones.
+
+        returns:
+            born [tuple]: y and x positions of the cells born
+            died [tuple]: y and x positions of the cells died
+        """
+        keys = encode(*self.cells())
+        old_keys = encode(*self.cells(self.old_root, self.old_origin))
+        return (decode(np.setdiff1d(keys, old_keys)), decode(np.setdiff1d(old_keys, keys)))
@@ -0,0 +1,291 @@
+"""Bounded history of past generations for stepping back."""
+
+from collections import deque
+import zlib
+
+import numpy as np
+
+from sparse import encode, decode
+from config import *
+
+
+def unbounded(engine):
+    """
+    Tell engines whose cells are read as keys from engines read as boards.
+
+    args:
+        engine [Life]: engine
+
+    returns:
+        unbounded [bool]: whether the engine keeps cells outside a board
+    """
+    return engine.name == "sparse" or hasattr(engine, "to_array") and not engine.toroid
+
+def live_cells(engine):
+    """
+    List the live cells of an engine as sorted cell keys.
+
+    args:
+        engine [Life]: engine
+
+    returns:
+        keys [np.array]: cell keys as packed by sparse.encode
+    """
+    if engine.name == "sparse":
+        return engine.cells
+    if unbounded(engine):
+        return np.sort(encode(*engine.cells()))
+    return encode(*np.nonzero(engine.board == 1))
+
+def compress(keys):
+    """
+    Compress sorted cell keys.
+
+    args:
+        keys [np.array]: cell keys
+
+    returns:
+        data [bytes]: gaps between the keys, zlib-compressed
+    """
+    # Byte planes of the gaps are mostly zeros, compressing smaller and faster than the gaps
+    gaps = np.diff(keys, prepend=0)
+    return zlib.compress(gaps.view(np.uint8).reshape(-1, 8).T.tobytes(), 1)
+
+def decompress(data):
+    """
+    Restore compressed cell keys.
+
+    args:
+        data [bytes]: result of compress()
+
+    returns:
+        keys [np.array]: cell keys
+    """
+    planes = np.frombuffer(zlib.decompress(data), dtype=np.uint8).reshape(8, -1)
+    return np.cumsum(np.ascontiguousarray(planes.T).view(np.int64).ravel())
+
+def apply_delta(keys, born, died):
+    """
+    Step sorted cell keys forward by one generation.
+
+    args:
+        keys [np.array]: cell keys
+        born [np.array]: keys of the cells born
+        died [np.array]: keys of the cells died, all in keys
+
+    returns:
+        keys [np.array]: cell keys of the next generation
+    """
+    # Merging sorted arrays by position is much cheaper than set operations
+    keys = np.delete(keys, np.searchsorted(keys, died))
+    return np.insert(keys, np.searchsorted(keys, born), born)
+
+
+class History:
+    """
+    Recent generations of an engine, within a memory budget.
+
+    Every HISTORY_KEYFRAME generations a keyframe stores all live cells,
+    the generations in between store the cells born and died. A keyframe
+    and its deltas form a segment; the oldest segments are dropped once the
+    budget is exceeded. Restoring a generation replays the deltas from the
+    keyframe before it.
+    """
+
+    def __init__(self, budget=HISTORY_BUDGET, interval=HISTORY_KEYFRAME):
+        """
+        Create an empty history.
+
+        args:
+            budget [int]: bytes of compressed generations kept
+            interval [int]: generations per keyframe
+        """
+        self.budget = budget
+        self.interval = interval
+        self.clear()
+
+    def clear(self):
+        """Forget every generation."""
+        # Segments as [first generation, keyframe, deltas]
+        self.segments = deque()
+        self.size = 0
+        # Generation the engine is at and live cells of the newest stored one
+        self.gen = None
+        self.keys = None
+
+    @property
+    def first(self):
+        """Oldest stored generation, None if empty."""
+        return self.segments[0][0] if self.segments else None
+
+    @property
+    def last(self):
+        """Newest stored generation, None if empty."""
+        return self.segments[-1][0] + len(self.segments[-1][2]) if self.segments else None
+
+    def __contains__(self, gen):
+        return self.find(gen) is not None
+
+    def find(self, gen):
+        """
+        Find the segment holding a generation.
+
+        args:
+            gen [int]: generation
+
+        returns:
+            segment [list]: segment, None if the generation is not stored
+        """
+        for segment in reversed(self.segments):
+            if segment[0] <= gen <= segment[0] + len(segment[2]):
+                return segment
+            if segment[0] < gen:
+                return None
+        return None
+
+    def previous(self, gen):
+        """
+        Find the newest stored generation before a given one.
+
+        args:
+            gen [int]: generation
+
+        returns:
+            previous [int]: stored generation, None if there is none
+        """
+        for segment in reversed(self.segments):
+            if segment[0] < gen:
+                return min(gen - 1, segment[0] + len(segment[2]))
+        return None
+
+    def record(self, engine):
+        """
+        Store the current generation, call after every step.
+
+        Recording the generation last recorded or restored, or stepping
+        again through stored generations after going back, stores nothing.
+        Anything else not following the newest stored generation starts a
+        new segment.
+
+        args:
+            engine [Life]: engine after a step
+        """
+        gen = engine.gen
+        if gen == self.gen:
+            return
+        following = self.gen is not None and gen == self.gen + 1
+        if following and self.segments and gen <= self.last:
+            self.gen = gen
+            return
+        keys = None
+        if following and gen == self.last + 1 and gen - self.segments[-1][0] < self.interval:
+            if unbounded(engine):
+                keys = live_cells(engine)
+                born = np.setdiff1d(keys, self.keys, assume_unique=True)
+                died = np.setdiff1d(self.keys, keys, assume_unique=True)
+            else:
+                # Both boards are at hand, so only the changed cells are read
+                board, old_board = engine.board, engine.old_board
+                born = encode(*np.nonzero(board > old_board))
+                died = encode(*np.nonzero(board < old_board))
+            delta = (compress(born), compress(died))
+            self.segments[-1][2].append(delta)
+            self.size += len(delta[0]) + len(delta[1])
+        else:
+            if not following:
+                self.truncate(gen - 1)
+            keys = live_cells(engine)
+            keyframe = compress(keys)
+            self.segments.append([gen, keyframe, []])
+            self.size += len(keyframe)
+        self.gen = gen
+        # Only the key based deltas need the newest cells
+        self.keys = keys if unbounded(engine) else None
+        # Oldest first, always keeping the segment being written
+        while self.size > self.budget and len(self.segments) > 1:
+            self.size -= self.segment_size(self.segments.popleft())
+
+    def forget(self, gen):
+        """
+        Drop the generations from an edit on, the edited board is stored by the next record().
+
+        args:
+            gen [int]: generation that was edited
+        """
+        self.truncate(gen - 1)
+        self.gen = None
+
+    def truncate(self, gen):
+        """
+        Drop the generations after a given one.
+
+        args:
+            gen [int]: newest generation to keep
+        """
+        while self.segments and self.segments[-1][0] > gen:
+            self.size -= self.segment_size(self.segments.pop())
+        if self.segments and self.last > gen:
+            deltas = self.segments[-1][2]
+            for delta in deltas[gen - self.segments[-1][0]:]:
+                self.size -= len(delta[0]) + len(delta[1])
+            del deltas[gen - self.segments[-1][0]:]
+        self.keys = None
+
+    def segment_size(self, segment):
+        """
+        Measure a segment.
+
+        args:
+            segment [list]: segment
+
+        returns:
+            size [int]: compressed bytes
+        """
+        return len(segment[1]) + sum(len(born) + len(died) for born, died in segment[2])
+
+    def frame(self, gen):
+        """
+        Rebuild the live cells of a stored generation.
+
+        args:
+            gen [int]: generation
+
+        returns:
+            keys [np.array]: cell keys
+
+        raises:
+            ValueError
+        """
+        segment = self.find(gen)
+        if segment is None:
+            raise ValueError(f"Generation {gen} is not in the history")
+        keys = decompress(segment[1])
+        for born, died in segment[2][:gen - segment[0]]:
+            keys = apply_delta(keys, decompress(born), decompress(died))
+        return keys
+
+    def restore(self, engine, gen):
+        """
+        Put a stored generation back into an engine.
+
+        args:
+            engine [Life]: engine to rewind
+            gen [int]: generation
+
+        raises:
+            ValueError
+        """
+        keys = self.frame(gen)
+        engine.clear()
+        if engine.name == "sparse":
+            engine.cells = keys
+        elif len(keys):
+            ys, xs = decode(keys)
+            top, left = int(ys.min()), int(xs.min())
+            board = np.zeros((int(ys.max()) - top + 1, int(xs.max()) - left + 1), dtype=np.uint8)
+            board[ys - top, xs - left] = 1
+            engine.place(board, top, left)
+        engine.gen = gen
+        self.gen = gen
+        if gen == self.last and unbounded(engine):
+            self.keys = keys
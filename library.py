@@ -0,0 +1,293 @@
+"""Pattern library indexed on disk and loaded on demand."""
+
+from collections import OrderedDict
+import json
+import os
+from pathlib import Path
+
+import numpy as np
+
+from parser import exts, parse
+from config import *
+
+
+# Bumped whenever the index layout changes
+VERSION = 1
+
+def orientations(pattern):
+    """
+    Calculate every rotation and reflection of a pattern.
+
+    args:
+        pattern [np.array]: pattern array
+
+    returns:
+        orientations [tuple]: pattern turned clockwise 0 to 3 times, then the
+            same for its mirror image
+    """
+    mirrored = np.fliplr(pattern)
+    return tuple(np.ascontiguousarray(np.rot90(array, -turns))
+                 for array in (pattern, mirrored) for turns in range(4))
+
+def bounding_box(pattern):
+    """
+    Find the live cells of a pattern.
+
+    args:
+        pattern [np.array]: pattern array
+
+    returns:
+        box [list]: top, left, bottom and right edge, bottom and right exclusive,
+            None if the pattern is empty
+    """
+    ys, xs = np.nonzero(pattern == 1)
+    if len(ys) == 0:
+        return None
+    return [int(ys.min()), int(xs.min()), int(ys.max()) + 1, int(xs.max()) + 1]
+
+
+class Library:
+    """
+    Index of the pattern files under a directory.
+
+    The index keeps the name, format, size, mtime and bounding box of every
+    file and is saved next to the patterns. On refresh only new or modified
+    files are parsed. Pattern bodies are parsed on first use and kept in a
+    bounded LRU cache.
+    """
+
+    def __init__(self, root=Path(__file__).parent / "patterns", cache_size=PATTERN_CACHE,
+                 refresh=True):
+        """
+        Load the saved index and bring it up to date.
+
+        args:
+            root [str]: pattern directory
+            cache_size [int]: parsed patterns kept in memory
+            refresh [bool]: index new and modified files right away, otherwise
+                the saved index is used until they are
+        """
+        self.root = Path(root)
+        self.path = self.root / PATTERN_INDEX
+        self.cache_size = cache_size
+        self.cache = OrderedDict()
+        # Orientations of the cached patterns, evicted along with them
+        self.oriented = {}
+        self.entries = {}
+        self.by_name = {}
+        # Whether the index changed since it was saved
+        self.dirty = False
+        self.load()
+        if refresh:
+            self.refresh()
+
+    def load(self):
+        """Read the saved index, starting over if it is missing or outdated."""
+        try:
+            with open(self.path) as f:
+                index = json.load(f)
+        except (OSError, ValueError):
+            return
+        if index.get("version") == VERSION:
+            self.entries = index["entries"]
+            self.update_names()
+
+    def save(self):
+        """Write the index, replacing the old one at once."""
+        temp = self.path.with_name(self.path.name + ".tmp")
+        try:
+            with open(temp, "w") as f:
+                json.dump({"version": VERSION, "entries": self.entries}, f, indent=1)
+            os.replace(temp, self.path)
+            self.dirty = False
+        except OSError as error:
+            print(f"WARNING: Could not save the pattern index: {error}")
+
+    def scan(self):
+        """
+        Find every pattern file under the root.
+
+        returns:
+            files [dict]: os.stat_result by path relative to the root
+        """
+        files = {}
+        for directory, _, names in os.walk(self.root):
+            for name in names:
+                if name.rsplit(".", 1)[-1].lower() in exts:
+                    path = os.path.join(directory, name)
+                    files[os.path.relpath(path, self.root)] = os.stat(path)
+        return files
+
+    def changes(self, files):
+        """
+        Drop the entries of deleted files and find the files to parse.
+
+        args:
+            files [dict]: result of scan()
+
+        returns:
+            changed [list]: paths and os.stat_result of new and modified files
+        """
+        for path in set(self.entries) - set(files):
+            del self.entries[path]
+            self.cache.pop(path, None)
+            self.oriented.pop(path, None)
+            self.dirty = True
+        changed = []
+        for path, stat in sorted(files.items()):
+            entry = self.entries.get(path)
+            if entry and entry["mtime"] == stat.st_mtime_ns and entry["size"] == stat.st_size:
+                continue
+            self.cache.pop(path, None)
+            self.oriented.pop(path, None)
+            changed.append((path, stat))
+        self.update_names()
+        return changed
+
+    def parse(self, path):
+        """
+        Parse a pattern file, safe to call from worker threads.
+
+        args:
+            path [str]: path relative to the root
+
+        returns:
+            name [str]: pattern name
+            pattern [np.array]: pattern array
+            rule [Rule]: rule given by the pattern file, None if not given
+        """
+        return parse(str(self.root / path))
+
+    def add(self, path, stat, parsed):
+        """
+        Index a parsed file.
+
+        args:
+            path [str]: path relative to the root
+            stat [os.stat_result]: file status from scan()
+            parsed [tuple]: result of parse()
+        """
+        name, pattern, rule = parsed
+        self.entries[path] = {
+            "name": name,
+            "format": path.rsplit(".", 1)[-1].lower(),
+            "size": stat.st_size,
+            "mtime": stat.st_mtime_ns,
+            "shape": list(pattern.shape),
+            "box": bounding_box(pattern),
+            "rule": None if rule is None else str(rule),
+        }
+        self.store(path, (pattern, rule))
+        self.dirty = True
+
+    def fail(self, path, error):
+        """
+        Drop a file that could not be parsed.
+
+        args:
+            path [str]: path relative to the root
+            error [Exception]: parsing error
+        """
+        print(f"WARNING: Could not index {path}: {error}")
+        if self.entries.pop(path, None) is not None:
+            self.dirty = True
+
+    def update_names(self):
+        """Map the pattern names to their files."""
+        # Later paths win on duplicate names
+        self.by_name = {entry["name"]: path for path, entry in sorted(self.entries.items())}
+
+    def refresh(self):
+        """
+        Index new and modified files and drop deleted ones.
+
+        returns:
+            changed [bool]: whether the index changed
+        """
+        for path, stat in self.changes(self.scan()):
+            try:
+                self.add(path, stat, self.parse(path))
+            except Exception as error:
+                self.fail(path, error)
+        self.update_names()
+        changed = self.dirty
+        if changed:
+            self.save()
+        return changed
+
+    def names(self):
+        """
+        List the pattern names without parsing anything.
+
+        returns:
+            names [list]: sorted pattern names
+        """
+        return sorted(self.by_name)
+
+    def store(self, path, item):
+        """
+        Cache a parsed pattern, evicting the least recently used ones.
+
+        args:
+            path [str]: path relative to the root
+            item [tuple]: pattern array and rule
+        """
+        self.cache[path] = item
+        self.cache.move_to_end(path)
+        while len(self.cache) > self.cache_size:
+            evicted, _ = self.cache.popitem(last=False)
+            self.oriented.pop(evicted, None)
+
+    def get(self, name):
+        """
+        Get a pattern, parsing its file on first use.
+
+        args:
+            name [str]: pattern name
+
+        returns:
+            pattern [np.array]: pattern array
+            rule [Rule]: rule given by the pattern file, None if not given
+
+        raises:
+            KeyError
+        """
+        path = self.by_name[name]
+        if path in self.cache:
+            self.cache.move_to_end(path)
+            return self.cache[path]
+        _, pattern, rule = self.parse(path)
+        self.store(path, (pattern, rule))
+        return pattern, rule
+
+    def orientations(self, name):
+        """
+        Get every rotation and reflection of a pattern, computed once while it is cached.
+
+        args:
+            name [str]: pattern name
+
+        returns:
+            orientations [tuple]: pattern arrays as given by orientations()
+            rule [Rule]: rule given by the pattern file, None if not given
+
+        raises:
+            KeyError
+        """
+        pattern, rule = self.get(name)
+        path = self.by_name[name]
+        if path not in self.oriented:
+            self.oriented[path] = orientations(pattern)
+        return self.oriented[path], rule
+
+    def __getitem__(self, name):
+        return self.get(name)
+
+    def __contains__(self, name):
+        return name in self.by_name
+
+    def __iter__(self):
+        return iter(self.names())
+
+    def __len__(self):
+        return len(self.by_name)
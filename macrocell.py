@@ -0,0 +1,143 @@
+"""Macrocell pattern format, a quadtree storing every distinct subtree once."""
+
+import numpy as np
+
+from hashlife import HashLife
+from rules import Rule
+
+
+# Level of the 8x8 leaves written as cell rows
+LEAF = 3
+HEADER = "[M2] (conway)"
+
+def read_leaf(engine, line):
+    """
+    Build a leaf from its cell rows.
+
+    args:
+        engine [HashLife]: engine owning the nodes
+        line [str]: rows of "." and "*" ending with "$", trailing dead cells omitted
+
+    returns:
+        node [Node]: level 3 node
+
+    raises:
+        ValueError
+    """
+    ys, xs = [], []
+    for y, row in enumerate(line.split("$")):
+        for x, char in enumerate(row):
+            if char == "*":
+                ys.append(y)
+                xs.append(x)
+            elif char != ".":
+                raise ValueError(f"Invalid Macrocell leaf: {line}")
+    if any(y >= 1 << LEAF for y in ys) or any(x >= 1 << LEAF for x in xs):
+        raise ValueError(f"Macrocell leaf larger than 8x8: {line}")
+    return engine.build(np.array(ys, dtype=np.int64), np.array(xs, dtype=np.int64), LEAF)
+
+def read_macrocell(f, engine=None):
+    """
+    Read a Macrocell pattern straight into a HashLife universe.
+
+    Nodes are deduplicated by the engine, so memory grows with the distinct
+    structure of the pattern rather than its area. The root is centered on
+    the origin, like Golly does.
+
+    args:
+        f [file]: Macrocell pattern file
+        engine [HashLife]: engine to load into, a new one if not given
+
+    returns:
+        engine [HashLife]: engine holding the pattern
+        rule [Rule]: rule from the header, None if not given
+
+    raises:
+        ValueError
+    """
+    if engine is None:
+        engine = HashLife()
+    rule = None
+    gen = 0
+    # Node of every line, 0 stands for an empty node
+    nodes = [None]
+    for line in f:
+        line = line.strip()
+        if not line or line.startswith("[M2]"):
+            continue
+        if line.startswith("#"):
+            if line.startswith("#R"):
+                rule = Rule.from_string(line[2:])
+            elif line.startswith("#G"):
+                gen = int(line[2:])
+            continue
+        if line[0] in ".*$":
+            nodes.append(read_leaf(engine, line))
+            continue
+        try:
+            k, *children = map(int, line.split())
+        except ValueError:
+            raise ValueError(f"Invalid Macrocell line: {line}") from None
+        if len(children) != 4 or k <= LEAF:
+            raise ValueError(f"Unsupported Macrocell node: {line}")
+        quadrants = []
+        for child in children:
+            if not 0 <= child < len(nodes):
+                raise ValueError(f"Macrocell node refers to an unknown node: {line}")
+            node = nodes[child] if child else engine.zero(k - 1)
+            if node.k != k - 1:
+                raise ValueError(f"Macrocell node level mismatch: {line}")
+            quadrants.append(node)
+        nodes.append(engine.join(*quadrants))
+
+    if rule is not None:
+        engine.rule = rule
+    if len(nodes) > 1:
+        root = nodes[-1]
+        half = 1 << (root.k - 1)
+        engine.root, engine.origin = root, (-half, -half)
+    else:
+        engine.root, engine.origin = engine.zero(LEAF), (0, 0)
+    engine.old_root, engine.old_origin = engine.root, engine.origin
+    engine.gen = gen
+    return engine, rule
+
+def write_macrocell(f, engine):
+    """
+    Write a HashLife universe as a Macrocell pattern, each distinct node once.
+
+    args:
+        f [file]: file to write to
+        engine [HashLife]: engine holding the pattern
+    """
+    f.write(HEADER + "\n")
+    f.write(f"#R {engine.rule}\n")
+    if engine.gen:
+        f.write(f"#G {engine.gen}\n")
+    root = engine.root
+    while root.k < LEAF:
+        root = engine.centre(root)
+    if root.n == 0:
+        return
+
+    # Children are written before their parents, numbered from 1
+    index = {}
+    stack = [(root, False)]
+    while stack:
+        node, expanded = stack.pop()
+        if node in index or node.n == 0:
+            continue
+        if node.k == LEAF:
+            ys, xs = engine.cells(node, (0, 0))
+            rows = [""] * (1 << LEAF)
+            for y, x in sorted(zip(ys.tolist(), xs.tolist())):
+                rows[y] += "." * (x - len(rows[y])) + "*"
+            f.write("$".join(rows[:max(ys) + 1]) + "$\n")
+        elif expanded:
+            children = (index.get(child, 0) for child in (node.a, node.b, node.c, node.d))
+            f.write(f"{node.k} {' '.join(map(str, children))}\n")
+        else:
+            stack.append((node, True))
+            stack.extend((child, False) for child in (node.d, node.c, node.b, node.a))
+            continue
+        index[node] = len(index) + 1
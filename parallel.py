@@ -0,0 +1,220 @@
+"""Multi-process Game of Life engine on shared memory."""
+
+import os
+import weakref
+from multiprocessing import Pool, shared_memory
+from time import perf_counter
+
+import numpy as np
+
+from engine import Life, bounding_box
+from config import *
+
+
+# Worker process state
+shared = {}
+
+def attach(name, height, width):
+    """
+    Map the shared board buffers in a worker process.
+
+    args:
+        name [str]: shared memory block name
+        height [int]: board height
+        width [int]: board width
+    """
+    shared["memory"] = shared_memory.SharedMemory(name=name)
+    shared["buffers"] = np.ndarray((2, height, width), dtype=np.uint8,
+                                   buffer=shared["memory"].buf)
+
+def step_strip(task):
+    """
+    Calculate the next generation of a strip of rows.
+
+    The strip reads its one-row halo straight from the shared source buffer
+    and writes only its own rows of the target buffer.
+
+    args:
+        task [tuple]: source buffer index, first and past-last row, toroid, rule table,
+            whether to count the strip
+
+    returns:
+        timing [tuple]: worker pid, first and past-last row, seconds spent and
+            population, births, deaths and bounding box of the strip, None if not counted
+    """
+    start = perf_counter()
+    source, top, bottom, toroid, table, counting = task
+    board = shared["buffers"][source]
+    height, width = board.shape
+
+    # Strip with a halo of one cell on every side
+    strip = np.zeros((bottom - top + 2, width + 2), dtype=np.uint8)
+    strip[1:-1, 1:-1] = board[top:bottom]
+    if toroid:
+        strip[0, 1:-1] = board[(top - 1) % height]
+        strip[-1, 1:-1] = board[bottom % height]
+        strip[:, 0] = strip[:, -2]
+        strip[:, -1] = strip[:, 1]
+    else:
+        if top > 0:
+            strip[0, 1:-1] = board[top - 1]
+        if bottom < height:
+            strip[-1, 1:-1] = board[bottom]
+
+    rows = strip[:-2] + strip[1:-1] + strip[2:]
+    neighbors = rows[:, :-2] + rows[:, 1:-1] + rows[:, 2:]
+    cells = strip[1:-1, 1:-1]
+    neighbors -= cells
+    new = table[cells, neighbors]
+    shared["buffers"][1 - source][top:bottom] = new
+    counts = None
+    if counting:
+        changed = new != cells
+        births = int(np.count_nonzero(new[changed]))
+        box = bounding_box(new)
+        counts = (int(np.count_nonzero(new)), births, int(np.count_nonzero(changed)) - births,
+                  (box[0] + top, box[1], box[2] + top, box[3]))
+    return os.getpid(), top, bottom, perf_counter() - start, counts
+
+def release(pool, memory):
+    """
+    Stop the workers and free the shared memory.
+
+    args:
+        pool [Pool]: worker pool, may be None
+        memory [SharedMemory]: shared board buffers
+    """
+    if pool is not None:
+        pool.terminate()
+        pool.join()
+    try:
+        memory.close()
+    except BufferError:
+        pass    # Boards handed out still view the block, it goes away with them
+    memory.unlink()
+
+
+class ParallelLife(Life):
+    """
+    Life engine splitting the board into strips of rows stepped by a process pool.
+
+    Both generations live in shared memory, so workers exchange halos by
+    reading the neighboring rows directly. Call close() (or use the engine
+    as a context manager) to stop the workers.
+    """
+
+    # Name used by create_engine
+    name = "parallel"
+
+    def __init__(self, *args, workers=WORKERS, **kwargs):
+        """
+        Create an empty board, see Life for other arguments.
+
+        args:
+            workers [int]: number of worker processes, 0 for one per CPU
+        """
+        self.workers = workers or os.cpu_count()
+        self.memory = self.buffers = self.pool = None
+        self.source = 0
+        # Timings of the last generation and totals per worker
+        self.timings = []
+        self.worker_times = {}
+        super().__init__(*args, **kwargs)
+
+    def check_rule(self, rule):
+        """
+        Check that the engine can run a rule.
+
+        args:
+            rule [Rule]: rule to check
+
+        raises:
+            ValueError
+        """
+        if not rule.totalistic:
+            raise ValueError("The parallel engine only supports totalistic rules")
+
+    def allocate(self):
+        """Allocate both generations in shared memory."""
+        if self.memory is None:
+            self.memory = shared_memory.SharedMemory(create=True, size=2 * self.height * self.width)
+            self.buffers = np.ndarray((2, self.height, self.width), dtype=np.uint8,
+                                      buffer=self.memory.buf)
+            self.buffers[:] = 0
+            self.finalizer = weakref.finalize(self, release, None, self.memory)
+
+    def start_pool(self):
+        """Start the worker processes if they are not running yet."""
+        if self.pool is None:
+            self.finalizer.detach()
+            self.pool = Pool(self.workers, initializer=attach,
+                             initargs=(self.memory.name, self.height, self.width))
+            self.finalizer = weakref.finalize(self, release, self.pool, self.memory)
+
+    def close(self):
+        """Stop the workers and free the shared memory."""
+        if self.memory is not None:
+            self.buffers = None
+            self.finalizer()
+            self.memory = self.pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    @property
+    def board(self):
+        """Current generation."""
+        return self.buffers[self.source]
+
+    @board.setter
+    def board(self, board):
+        self.allocate()
+        self.buffers[self.source] = board == 1
+
+    @property
+    def old_board(self):
+        """Previous generation."""
+        return self.buffers[1 - self.source]
+
+    @old_board.setter
+    def old_board(self, board):
+        self.allocate()
+        self.buffers[1 - self.source] = board == 1
+
+    def evolve(self):
+        """Calculate the next generation."""
+        self.start_pool()
+        edges = np.linspace(0, self.height, min(self.workers, self.height) + 1).astype(int)
+        tasks = [(self.source, int(top), int(bottom), self.toroid, self.rule.table, self.counting)
+                 for top, bottom in zip(edges[:-1], edges[1:])]
+        self.timings = self.pool.map(step_strip, tasks, chunksize=1)
+        for pid, _, _, seconds, _ in self.timings:
+            self.worker_times[pid] = self.worker_times.get(pid, 0.0) + seconds
+        self.source = 1 - self.source
+        self.gen += 1
+        if self.counting:
+            # Every worker counted its own strip
+            strips = [timing[4] for timing in self.timings]
+            boxes = [box for population, _, _, box in strips if population]
+            box = (min(box[0] for box in boxes), min(box[1] for box in boxes),
+                   max(box[2] for box in boxes), max(box[3] for box in boxes)) \
+                if boxes else (0, 0, 0, 0)
+            self.counts = (self.gen, sum(strip[0] for strip in strips),
+                           sum(strip[1] for strip in strips), sum(strip[2] for strip in strips),
+                           box)
+
+    def imbalance(self):
+        """
+        Compare the slowest strip of the last generation with the average.
+
+        returns:
+            ratio [float]: slowest strip time over mean strip time, 1.0 is balanced
+        """
+        if not self.timings:
+            return 1.0
+        seconds = [timing[3] for timing in self.timings]
+        mean = sum(seconds) / len(seconds)
+        return max(seconds) / mean if mean else 1.0
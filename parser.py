@@ -4,49 +4,75 @@ from glob import glob
 import numpy as np
 from pathlib import Path
 
+from macrocell import read_macrocell
+from rules import Rule
+
 
 # Extensions
-exts = ("txt", "cells", "rle", "l", "lif", "life", "sof", "mcl")
+exts = ("txt", "cells", "rle", "l", "lif", "life", "mc", "sof", "mcl")
+
+# Bytes read at once by the streaming parsers
+CHUNK = 1 << 20
 
-def convert_board(char):
+# RLE tags, anything else but digits is a live cell
+DEAD = (ord("b"), ord("."))
+NEWLINE = ord("$")
+END = ord("!")
+
+def parse_board(lines):
     """
-    Convert character to cell state.
+    Parse pattern board, one row per line.
 
     args:
-        char [str]: character
+        lines [iterable]: pattern board lines
+
+    returns:
+        pattern [np.array]: parsed pattern
     """
-    if char in ("O", "*"):
-        return 1
-    if char != ".":
-        print(f"WARNING: Invalid character: {char} (ignoring)")
-    return 0
+    rows = []
+    for line in lines:
+        line = line.strip()
+        if line[:1] in ("#", "!"):
+            continue
+        row = np.frombuffer(line.encode(), dtype=np.uint8)
+        alive = (row == ord("O")) | (row == ord("*"))
+        for char in set(line) - {"O", "*", "."}:
+            print(f"WARNING: Invalid character: {char} (ignoring)")
+        rows.append(alive)
+    pattern = np.zeros((len(rows), max(map(len, rows), default=0)), dtype=np.uint8)
+    for y, row in enumerate(rows):
+        pattern[y, :len(row)] = row
+    return pattern
 
-def parse_board(pattern):
+def parse_coordinates(f):
     """
-    Parse pattern board.
+    Parse Life 1.06 coordinates in chunks.
 
     args:
-        pattern [list]: pattern board
+        f [file]: file positioned after the header
+
+    returns:
+        coords [np.array]: x and y position of every live cell
     """
-    i = 0
-    while i < len(pattern):
-        if pattern[i][0] in ("#", "!"):
-            pattern.pop(i)
-        else:
-            temp = pattern[i]
-            pattern[i] = []
-            for cell in temp:
-                pattern[i].append(convert_board(cell))
-            i += 1
-    pattern = np.array(pattern)
-    return pattern
+    chunks = []
+    rest = ""
+    while True:
+        data = f.read(CHUNK)
+        if not data:
+            break
+        # Keep the last partial line for the next chunk
+        data, _, tail = (rest + data).rpartition("\n")
+        rest = tail
+        chunks.append(np.array(data.split(), dtype=np.int64))
+    chunks.append(np.array(rest.split(), dtype=np.int64))
+    return np.concatenate(chunks).reshape(-1, 2)
 
-def parse_life(pattern):
+def parse_life(f):
     """
     Parse Life pattern.
 
     args:
-        pattern [list]: Life pattern
+        f [file]: Life pattern file
 
     returns:
         pattern [np.array]: parsed Life pattern
@@ -54,71 +80,127 @@ def parse_life(pattern):
     raises:
         ValueError
     """
-    if "5" in pattern[0] or "2" in pattern[0]:
-        pattern = parse_board(pattern)
-    elif "6" in pattern[0]:
-        coord_x = [int(line.split()[0]) for line in pattern if "#" not in line]
-        coord_y = [int(line.split()[1]) for line in pattern if "#" not in line]
-        size_x = max(coord_x) - min(coord_x) + 1
-        size_y = max(coord_y) - min(coord_y) + 1
-        offset_x = min(coord_x)
-        offset_y = min(coord_y)
-        coord_x = [x - offset_x for x in coord_x]
-        coord_y = [y - offset_y for y in coord_y]
-        pattern = np.zeros((size_y, size_x))
-        for n, _ in enumerate(coord_x):
-            pattern[coord_y[n], coord_x[n]] = 1
+    header = f.readline()
+    if "5" in header or "2" in header:
+        pattern = parse_board(f)
+    elif "6" in header:
+        line = f.readline()
+        while line.startswith("#"):
+            line = f.readline()
+        coords = np.concatenate((np.array(line.split(), dtype=np.int64).reshape(-1, 2),
+                                 parse_coordinates(f)))
+        if len(coords) == 0:
+            return np.zeros((0, 0), dtype=np.uint8)
+        coords -= coords.min(axis=0)
+        pattern = np.zeros(coords.max(axis=0)[::-1] + 1, dtype=np.uint8)
+        pattern[coords[:, 1], coords[:, 0]] = 1
     else:
         raise ValueError("The version of Life format defined in this pattern is not supported")
 
     return pattern
 
-def parse_rle(pattern):
+def rle_runs(data, state):
+    """
+    Decode a chunk of RLE data into runs of live cells.
+
+    args:
+        data [np.array]: RLE bytes without whitespace, ending with a tag
+        state [list]: x and y position before the chunk, updated in place
+
+    returns:
+        ys [np.array]: row of every live run
+        xs [np.array]: first column of every live run
+        lengths [np.array]: length of every live run
     """
-    Parse RLE pattern.
+    digit = (data >= ord("0")) & (data <= ord("9"))
+    tags = np.flatnonzero(~digit)
+    # Every digit belongs to the run count of the next tag
+    owner = np.cumsum(~digit) - ~digit
+    digits = np.flatnonzero(digit)
+    power = 10.0 ** (tags[owner[digits]] - digits - 1)
+    counts = np.bincount(owner[digits], (data[digits] - ord("0")) * power, len(tags))
+    counts = np.where(np.bincount(owner[digits], minlength=len(tags)) > 0,
+                      np.rint(counts), 1).astype(np.int64)
+    tags = data[tags]
+
+    # Row and column where each run starts
+    newline = tags == NEWLINE
+    rows = np.cumsum(np.where(newline, counts, 0))
+    steps = np.where(newline, 0, counts)
+    columns = np.cumsum(steps) - steps
+    # Columns restart after every line break
+    restart = np.maximum.accumulate(np.where(newline, np.arange(len(tags)), -1))
+    base = np.where(restart >= 0, np.cumsum(steps)[np.maximum(restart, 0)], 0)
+    columns = columns - base + np.where(restart >= 0, 0, state[0])
+    ys = state[1] + rows
+    alive = ~newline & ~np.isin(tags, DEAD)
+
+    if len(tags):
+        state[0] = int(columns[-1] + steps[-1]) if not newline[-1] else 0
+        state[1] = int(ys[-1])
+    return ys[alive], columns[alive], counts[alive]
+
+def parse_rle(f):
+    """
+    Parse RLE pattern in chunks, writing runs straight into the board.
 
     args:
-        pattern [list]: RLE pattern
+        f [file]: RLE pattern file
 
     returns:
         pattern [np.array]: parsed RLE pattern
-    
+        rule [Rule]: rule from the header, None if not given
+
     raises:
-        IndexError
+        ValueError
     """
-    pattern = [line for line in pattern if line[0] != "#"]
-    rules = pattern[0].split(",")
+    header = f.readline()
+    while header.startswith("#") or not header.strip():
+        if not header:
+            raise ValueError("Missing RLE header")
+        header = f.readline()
+    rules = header.split(",")
     size_x = int(rules[0].strip("x= "))
     size_y = int(rules[1].strip("y= "))
-    # TODO: implement gamerule parsing
-    temp = pattern[1:]
-    string = ""
-    pattern = np.zeros((size_y, size_x))
-    for line in temp:
-        string += line
-    temp = ""
-    i = 0
-    x = 0
-    y = 0
-    try:
-        while string[i] != "!":
-            if string[i].isdigit():
-                temp += string[i]
-            elif string[i] == "$":
-                y += 1
-                x = 0
-            else:
-                if len(temp) == 0:
-                    temp = 1
-                if string[i] != "b":
-                    pattern[y, [n for n in range(x, x + int(temp))]] = 1
-                x += int(temp)
-                temp = ""
-            i += 1
-    except IndexError:
+    rule = None
+    for field in rules[2:]:
+        key, _, value = field.partition("=")
+        if key.strip() == "rule":
+            rule = Rule.from_string(value)
+
+    pattern = np.zeros((size_y, size_x), dtype=np.uint8)
+    flat = pattern.reshape(-1)
+    state = [0, 0]
+    rest = b""
+    ended = False
+    while not ended:
+        text = f.read(CHUNK)
+        if not text:
+            break
+        data = np.frombuffer(rest + text.encode(), dtype=np.uint8)
+        data = data[data > ord(" ")]
+        end = np.flatnonzero(data == END)
+        if len(end):
+            data = data[:end[0]]
+            ended = True
+        # Digits at the end belong to a tag in the next chunk
+        digit = (data >= ord("0")) & (data <= ord("9"))
+        tags = np.flatnonzero(~digit)
+        cut = tags[-1] + 1 if len(tags) else 0
+        rest = data[cut:].tobytes()
+        ys, xs, lengths = rle_runs(data[:cut], state)
+
+        # Clip runs to the declared size and fill them
+        inside = (ys < size_y) & (xs < size_x)
+        ys, xs = ys[inside], xs[inside]
+        lengths = np.minimum(lengths[inside], size_x - xs)
+        if len(lengths):
+            starts = np.repeat(ys * size_x + xs - np.cumsum(lengths) + lengths, lengths)
+            flat[starts + np.arange(lengths.sum())] = 1
+    if not ended:
         print("Fallback - reached end of file (no exclamation mark at the end of pattern file)")
 
-    return pattern
+    return pattern, rule
 
 def parse(directory):
     """
@@ -126,61 +208,129 @@ def parse(directory):
 
     args:
         directory [str]: path to pattern file
+
+    returns:
+        name [str]: pattern name
+        pattern [np.array]: parsed pattern
+        rule [Rule]: rule given by the pattern file, None if not given
     """
     ext = directory.split(".")[-1].lower()
+    rule = None
     # Check file extension
-    if ext in exts:
-        with open(directory, "r") as f:
-            pattern = [line.strip() for line in f.readlines()]
-    else:
+    if ext not in exts:
         print(f"Unsupported file extension: {ext}")
         return
-    # Parse Plaintext
-    if ext in ("txt", "cells"):
-        if "!Name" in pattern[0]:
-            name = pattern[0].lstrip("!Name: ")
-        else:
-            name = directory.split("/")[-1].rsplit(".", 1)[0].replace("_", " ").capitalize()
+    default_name = directory.split("/")[-1].rsplit(".", 1)[0].replace("_", " ").capitalize()
+    with open(directory, "r") as f:
+        first = f.readline().strip()
+        f.seek(0)
 
-        pattern = parse_board(pattern)
+        # Parse Plaintext
+        if ext in ("txt", "cells"):
+            if "!Name" in first:
+                name = first.lstrip("!Name: ")
+            else:
+                name = default_name
 
-    # Parse Life
-    elif ext in ("lif", "life"):
-        name = directory.split("/")[-1].rsplit(".", 1)[0].replace("_", " ").capitalize()
-        pattern = parse_life(pattern)
+            pattern = parse_board(f)
 
-    # Parse RLE
-    elif ext == "rle" or ext == "l":
-        if "#N" in pattern[0]:
-            name = pattern[0].lstrip("#N ")
-        else:
-            name = directory.split("/")[-1].rsplit(".", 1)[0].replace("_", " ").capitalize()
+        # Parse Life
+        elif ext in ("lif", "life"):
+            name = default_name
+            pattern = parse_life(f)
 
-        pattern = parse_rle(pattern)
+        # Parse RLE
+        elif ext == "rle" or ext == "l":
+            if "#N" in first:
+                name = first.lstrip("#N ")
+            else:
+                name = default_name
 
-    # Parse SOF
-    elif ext == "sof":
-        pass    # TODO: implement SOF parser
+            pattern, rule = parse_rle(f)
 
-    # Parse MCell
-    elif ext == "mcl":
-        pass    # TODO: implement MCell parser
+        # Parse Macrocell
+        elif ext == "mc":
+            name = default_name
+            engine, rule = read_macrocell(f)
+            pattern = engine.to_array()[0]
 
-    # Throw error on other file types
-    else:
-        raise ValueError("Invalid file extension")
+        # Parse SOF
+        elif ext == "sof":
+            pass    # TODO: implement SOF parser
+
+        # Parse MCell
+        elif ext == "mcl":
+            pass    # TODO: implement MCell parser
+
+        # Throw error on other file types
+        else:
+            raise ValueError("Invalid file extension")
     print(f"Loaded pattern: {name}")
-    return name, pattern
+    return name, pattern, rule
+
+def format_plaintext(board, name=None):
+    """
+    Format board as a Plaintext pattern.
+
+    args:
+        board [np.array]: board to format
+        name [str]: pattern name
+
+    returns:
+        pattern [str]: Plaintext pattern
+    """
+    lines = [f"!Name: {name}"] if name else []
+    lines.extend("".join(row) for row in np.where(board == 1, "O", "."))
+    return "\n".join(lines) + "\n"
+
+def write_rle(f, board, name=None, rule=None):
+    """
+    Write board as an RLE pattern, one row at a time.
+
+    args:
+        f [file]: file to write to
+        board [np.array]: board to write
+        name [str]: pattern name
+        rule [Rule]: pattern rule, defaults to SURVIVE and REPRODUCE
+    """
+    if name:
+        f.write(f"#N {name}\n")
+    f.write(f"x = {board.shape[1]}, y = {board.shape[0]}, rule = {rule or Rule()}\n")
+    line = ""
+    last_y = 0
+    for y, row in enumerate(board == 1):
+        alive = np.flatnonzero(row)
+        if len(alive) == 0:
+            continue
+        row = row[:alive[-1] + 1]
+        starts = np.concatenate(([0], np.flatnonzero(row[1:] != row[:-1]) + 1))
+        lengths = np.diff(np.append(starts, len(row)))
+        tokens = [f"{y - last_y if y - last_y > 1 else ''}$"] if y > last_y else []
+        tokens.extend(f"{n if n > 1 else ''}{'o' if row[start] else 'b'}"
+                      for start, n in zip(starts.tolist(), lengths.tolist()))
+        last_y = y
+        # Keep lines at most 70 characters long
+        for token in tokens:
+            if len(line) + len(token) > 70:
+                f.write(line + "\n")
+                line = ""
+            line += token
+    f.write(line + "!\n")
 
 def generate_pattern_list():
-    """Generate list of patterns in the patterns folder."""
+    """
+    Generate list of patterns in the patterns folder.
+
+    returns:
+        templates [dict]: pattern array and rule by pattern name
+    """
     directories = []
     templates = {}
     directory = str(Path(__file__).parent / "patterns/**/*.")
     for ext in exts:
         directories.extend(glob(directory + ext, recursive=True))
     for pattern in directories:
-        name, pattern = parse(pattern)
-        templates[name] = pattern
+        name, pattern, rule = parse(pattern)
+        templates[name] = pattern, rule
     print()
     return templates
@@ -0,0 +1,115 @@
+"""Per-generation and per-frame timings for finding where the time goes."""
+
+from collections import deque
+import csv
+import json
+import threading
+from time import perf_counter
+
+from config import *
+
+
+# Columns of the exported records, generations and frames fill different ones
+FIELDS = ("kind", "gen", "time", "evolve", "detect", "copy", "paint", "update",
+          "evaluated", "population", "items")
+# Fields shown in milliseconds
+TIMINGS = ("evolve", "detect", "copy", "paint", "update")
+
+
+class Profiler:
+    """
+    Collect timings from the runner and the GUI.
+
+    Records are streamed to a CSV file, or JSON lines if the path ends with
+    .jsonl, and the last few of every field are kept for rolling averages.
+    When disabled, record() returns at once and callers skip gathering
+    anything costly.
+    """
+
+    def __init__(self, enabled=PROFILE, path=PROFILE_FILE, window=PROFILE_WINDOW):
+        """
+        Create a profiler.
+
+        args:
+            enabled [bool]: record anything at all
+            path [str]: file to stream records to, None to keep only the averages
+            window [int]: records per rolling average
+        """
+        self.enabled = enabled
+        self.path = path
+        self.window = window
+        self.lock = threading.Lock()
+        self.history = {}
+        self.file = None
+        self.writer = None
+        self.start = perf_counter()
+
+    def record(self, kind, **values):
+        """
+        Add a record.
+
+        args:
+            kind [str]: "generation" from the runner or "frame" from the GUI
+            **values: fields from FIELDS, times in seconds
+        """
+        if not self.enabled:
+            return
+        values = dict(kind=kind, time=round(perf_counter() - self.start, 6), **values)
+        with self.lock:
+            for field, value in values.items():
+                if field in TIMINGS or field in ("evaluated", "population", "items"):
+                    if field not in self.history:
+                        self.history[field] = deque(maxlen=self.window)
+                    self.history[field].append(value)
+            if self.path:
+                self.write(values)
+
+    def write(self, values):
+        """
+        Stream a record to the file, opening it on first use.
+
+        args:
+            values [dict]: record fields
+        """
+        if self.file is None:
+            self.file = open(self.path, "w", newline="")
+            if not self.path.endswith(".jsonl"):
+                self.writer = csv.DictWriter(self.file, FIELDS)
+                self.writer.writeheader()
+        if self.writer is not None:
+            self.writer.writerow(values)
+        else:
+            self.file.write(json.dumps(values) + "\n")
+
+    def averages(self):
+        """
+        Calculate the rolling averages.
+
+        returns:
+            averages [dict]: mean of the last records by field
+        """
+        with self.lock:
+            return {field: sum(values) / len(values)
+                    for field, values in self.history.items() if values}
+
+    def summary(self):
+        """
+        Format the rolling averages for the overlay.
+
+        returns:
+            text [str]: one field per line
+        """
+        lines = []
+        for field, value in self.averages().items():
+            if field in TIMINGS:
+                lines.append(f"{field:<10} {value * 1000:8.2f} ms")
+            else:
+                lines.append(f"{field:<10} {value:8.0f}")
+        return "\n".join(lines)
+
+    def close(self):
+        """Flush and close the file."""
+        with self.lock:
+            if self.file is not None:
+                self.file.close()
+                self.file = self.writer = None
@@ -0,0 +1,285 @@
+"""Canvas rendering of the part of the board in view."""
+
+import tkinter as tk
+
+import numpy as np
+
+from config import *
+
+
+# Displayed cell states and their theme colors
+EMPTY, PRIMARY, SECONDARY, TRAIL = range(4)
+COLORS = (None, "primary", "secondary", "trail")
+
+def display_states(board, old_board, trails=False):
+    """
+    Calculate how every cell should look.
+
+    args:
+        board [np.array]: current generation
+        old_board [np.array]: previous generation
+        trails [bool]: show cells that just died
+
+    returns:
+        states [np.array]: displayed state of every cell
+    """
+    alive = board == 1
+    was_alive = old_board == 1
+    states = np.where(alive, np.where(was_alive, PRIMARY, SECONDARY), EMPTY).astype(np.uint8)
+    if trails:
+        states[~alive & was_alive] = TRAIL
+    return states
+
+
+class Renderer:
+    """
+    Show the part of the board inside a viewport.
+
+    Zoomed in to ITEM_ZOOM px per cell or more, every visible live cell is
+    a canvas rectangle and only the cells whose look changed are touched.
+    Zoomed out, the visible cells are drawn as a single image, scaled up to
+    whole pixels or, below a pixel per cell, averaged over blocks into a
+    density shade.
+    """
+
+    def __init__(self, canvas, height, width, view_height, view_width, zoom=CELL, bounded=True):
+        """
+        Start at the top-left corner of the board.
+
+        args:
+            canvas [tk.Canvas]: canvas to draw on
+            height [int]: board height
+            width [int]: board width
+            view_height [int]: canvas height in px
+            view_width [int]: canvas width in px
+            zoom [float]: px per cell
+            bounded [bool]: keep the view on the board, otherwise it pans anywhere
+        """
+        self.canvas = canvas
+        self.height = height
+        self.width = width
+        self.bounded = bounded
+        self.view_height = view_height
+        self.view_width = view_width
+        self.zoom = zoom
+        self.top = self.left = 0
+        self.colors = {}
+        self.palette = np.zeros((len(COLORS), 3), dtype=np.uint8)
+        self.items = {}
+        self.lines = []
+        self.image = None
+        self.image_item = None
+        self.shown = np.zeros((0, 0), dtype=np.uint8)
+        self.move(0, 0, zoom)
+
+    @property
+    def item_count(self):
+        """Number of items on the canvas."""
+        return len(self.items) + len(self.lines) + (self.image_item is not None)
+
+    @property
+    def use_items(self):
+        """Whether cells are drawn as canvas items."""
+        return self.zoom >= ITEM_ZOOM
+
+    def cells_per_px(self):
+        """
+        Calculate how many cells a pixel covers along each axis.
+
+        returns:
+            cells [int]: 1 unless zoomed out below a pixel per cell
+        """
+        return max(1, round(1 / self.zoom))
+
+    def edges(self):
+        """
+        Find the edges of the visible area.
+
+        returns:
+            edges [tuple]: top, left, bottom and right, bottom and right exclusive
+        """
+        bottom = self.top + int(np.ceil(self.view_height / self.zoom))
+        right = self.left + int(np.ceil(self.view_width / self.zoom))
+        if self.bounded:
+            bottom, right = min(self.height, bottom), min(self.width, right)
+        return self.top, self.left, bottom, right
+
+    def view(self):
+        """
+        Find the visible cells.
+
+        returns:
+            slices [tuple]: rows and columns of the board in view
+        """
+        top, left, bottom, right = self.edges()
+        return np.s_[top:bottom, left:right]
+
+    def cell_at(self, py, px):
+        """
+        Find the cell under a point of the canvas.
+
+        args:
+            py [int]: y position in px
+            px [int]: x position in px
+
+        returns:
+            y [int]: y position on the board
+            x [int]: x position on the board
+        """
+        return self.top + int(py // self.zoom), self.left + int(px // self.zoom)
+
+    def move(self, top, left, zoom=None):
+        """
+        Pan and zoom, forgetting everything drawn.
+
+        The caller draws the new view next.
+
+        args:
+            top [int]: first visible row
+            left [int]: first visible column
+            zoom [float]: px per cell, unchanged if not given
+        """
+        if zoom is not None:
+            self.zoom = min(max(zoom, MIN_ZOOM), MAX_ZOOM)
+        if self.bounded:
+            rows, cols = self.view_height / self.zoom, self.view_width / self.zoom
+            top = min(max(top, 0), max(self.height - rows, 0))
+            left = min(max(left, 0), max(self.width - cols, 0))
+        self.top, self.left = int(np.floor(top)), int(np.floor(left))
+        self.clear()
+        self.draw_lines()
+
+    def zoom_at(self, py, px, factor):
+        """
+        Zoom keeping the cell under a point in place.
+
+        args:
+            py [int]: y position in px
+            px [int]: x position in px
+            factor [float]: zoom multiplier
+        """
+        y, x = self.cell_at(py, px)
+        zoom = self.zoom * factor
+        if zoom >= 1:
+            zoom = round(zoom)
+        if zoom == self.zoom:
+            # Whole pixels per cell, step by at least one
+            zoom += 1 if factor > 1 else -1
+        self.move(y - py / max(zoom, MIN_ZOOM), x - px / max(zoom, MIN_ZOOM), zoom)
+
+    def draw_lines(self):
+        """Draw the grid lines of the view when zoomed in enough to see them."""
+        for line in self.lines:
+            self.canvas.delete(line)
+        self.lines = []
+        if self.zoom < GRID_ZOOM:
+            return
+        rows, cols = self.view()
+        height = (rows.stop - rows.start) * self.zoom
+        width = (cols.stop - cols.start) * self.zoom
+        for y in range(rows.stop - rows.start + 1):
+            self.lines.append(self.canvas.create_line(0, y*self.zoom, width, y*self.zoom,
+                                                      fill=self.colors.get("grid")))
+        for x in range(cols.stop - cols.start + 1):
+            self.lines.append(self.canvas.create_line(x*self.zoom, 0, x*self.zoom, height,
+                                                      fill=self.colors.get("grid")))
+        for line in self.lines:
+            self.canvas.tag_lower(line)
+
+    def draw_cell(self, y, x, state):
+        """
+        Show a single cell in a given state.
+
+        args:
+            y [int]: y position on the board
+            x [int]: x position on the board
+            state [int]: displayed state
+        """
+        y, x = y - self.top, x - self.left
+        if not (0 <= y < self.shown.shape[0] and 0 <= x < self.shown.shape[1]):
+            return
+        if not self.use_items:
+            self.shown[y, x] = state
+            self.paint_image()
+            return
+        item = self.items.get((y, x))
+        if state == EMPTY:
+            if item is not None:
+                self.canvas.delete(item)
+                del self.items[(y, x)]
+        elif item is None:
+            outline = self.colors["grid"] if self.zoom >= GRID_ZOOM else ""
+            self.items[(y, x)] = self.canvas.create_rectangle(
+                x*self.zoom, y*self.zoom, (x+1)*self.zoom, (y+1)*self.zoom,
+                fill=self.colors[COLORS[state]], outline=outline
+            )
+        else:
+            self.canvas.itemconfig(item, fill=self.colors[COLORS[state]])
+        self.shown[y, x] = state
+
+    def draw(self, states):
+        """
+        Update the canvas to new displayed states, touching only changed cells.
+
+        args:
+            states [np.array]: displayed state of every visible cell
+        """
+        if not self.use_items:
+            if not np.array_equal(states, self.shown):
+                self.shown = states.astype(np.uint8)
+                self.paint_image()
+            return
+        for y, x in np.argwhere(states != self.shown).tolist():
+            self.draw_cell(y + self.top, x + self.left, states[y, x])
+
+    def paint_image(self):
+        """Draw the visible cells as one image."""
+        if self.shown.size == 0:
+            return
+        if self.zoom >= 1:
+            scale = int(self.zoom)
+            pixels = self.palette[self.shown].repeat(scale, axis=0).repeat(scale, axis=1)
+        else:
+            # Share of live cells in every block, shaded from the background to primary
+            block = self.cells_per_px()
+            alive = (self.shown == PRIMARY) | (self.shown == SECONDARY)
+            rows, cols = -(-alive.shape[0] // block), -(-alive.shape[1] // block)
+            padded = np.zeros((rows * block, cols * block), dtype=np.float32)
+            padded[:alive.shape[0], :alive.shape[1]] = alive
+            density = padded.reshape(rows, block, cols, block).mean(axis=(1, 3))
+            background, primary = self.palette[EMPTY], self.palette[PRIMARY]
+            pixels = (background + density[..., None] * (primary.astype(np.float32) - background)
+                      ).astype(np.uint8)
+        header = f"P6 {pixels.shape[1]} {pixels.shape[0]} 255 ".encode()
+        self.image = tk.PhotoImage(data=header + pixels.tobytes(), format="PPM")
+        if self.image_item is None:
+            self.image_item = self.canvas.create_image(0, 0, anchor="nw", image=self.image)
+            self.canvas.tag_lower(self.image_item)
+        else:
+            self.canvas.itemconfig(self.image_item, image=self.image)
+
+    def recolor(self):
+        """Apply the current colors to every cell and grid line."""
+        for state, name in enumerate(COLORS):
+            color = self.colors.get(name or "background")
+            if color:
+                self.palette[state] = [value >> 8 for value in self.canvas.winfo_rgb(color)]
+        outline = self.colors["grid"] if self.zoom >= GRID_ZOOM else ""
+        for (y, x), item in self.items.items():
+            self.canvas.itemconfig(item, fill=self.colors[COLORS[self.shown[y, x]]],
+                                   outline=outline)
+        for line in self.lines:
+            self.canvas.itemconfig(line, fill=self.colors["grid"])
+        if self.image_item is not None:
+            self.paint_image()
+
+    def clear(self):
+        """Remove every cell from the canvas."""
+        for item in self.items.values():
+            self.canvas.delete(item)
+        self.items = {}
+        if self.image_item is not None:
+            self.canvas.delete(self.image_item)
+            self.image_item = self.image = None
+        rows, cols = self.view()
+        self.shown = np.zeros((rows.stop - rows.start, cols.stop - cols.start), dtype=np.uint8)
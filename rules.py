@@ -0,0 +1,208 @@
+"""Life-like rules compiled into lookup tables."""
+
+import re
+
+import numpy as np
+
+from config import *
+
+
+# Bit of every cell in a 3x3 neighborhood index, row by row from the top-left
+WEIGHTS = {(h, w): 1 << (3 * (h + 1) + (w + 1)) for h in range(-1, 2) for w in range(-1, 2)}
+
+def offset_slices(size, offset, toroid=False):
+    """
+    Pair up positions along an axis with their neighbor at an offset.
+
+    args:
+        size [int]: board size along the axis
+        offset [int]: -1, 0 or 1
+        toroid [bool]: wrap the board edges
+
+    returns:
+        slices [list]: cell and neighbor slices, neighbors past a bounded edge are left out
+    """
+    if offset == 0:
+        return [(slice(None), slice(None))]
+    if offset > 0:
+        slices = [(slice(0, size - 1), slice(1, size))]
+        wrapped = (slice(size - 1, size), slice(0, 1))
+    else:
+        slices = [(slice(1, size), slice(0, size - 1))]
+        wrapped = (slice(0, 1), slice(size - 1, size))
+    if toroid:
+        slices.append(wrapped)
+    return slices
+
+def add_neighbors(out, board, h, w, toroid=False):
+    """
+    Add the neighbor at an offset to every cell in place.
+
+    args:
+        out [np.array]: sums to add to
+        board [np.array]: board, or a stack of boards along the first axis
+        h [int]: y offset, -1 to 1
+        w [int]: x offset, -1 to 1
+        toroid [bool]: wrap the board edges
+    """
+    for rows, neighbor_rows in offset_slices(board.shape[-2], h, toroid):
+        for cols, neighbor_cols in offset_slices(board.shape[-1], w, toroid):
+            out[..., rows, cols] += board[..., neighbor_rows, neighbor_cols]
+
+def neighborhood_index(board, toroid=False, out=None):
+    """
+    Encode the 3x3 neighborhood of every cell as a 9-bit number.
+
+    args:
+        board [np.array]: board
+        toroid [bool]: wrap the board edges
+        out [np.array]: array to write to instead of allocating, the board
+            must only hold 0 and 1 and have the same type then
+
+    returns:
+        index [np.array]: neighborhood index of every cell
+    """
+    if out is not None:
+        # Shift in one neighbor at a time, from the highest bit down
+        out[...] = 0
+        for h, w in sorted(WEIGHTS, key=WEIGHTS.get, reverse=True):
+            out <<= 1
+            add_neighbors(out, board, h, w, toroid)
+        return out
+    cells = (board == 1).astype(np.uint16)
+    if not toroid:
+        padded = np.pad(cells, 1)
+    index = np.zeros(board.shape, dtype=np.uint16)
+    for (h, w), weight in WEIGHTS.items():
+        if toroid:
+            index += np.roll(cells, (-h, -w), axis=(0, 1)) * weight
+        else:
+            index += padded[1+h:board.shape[0]+1+h, 1+w:board.shape[1]+1+w] * weight
+    return index
+
+
+class Rule:
+    def __init__(self, reproduce=REPRODUCE, survive=SURVIVE, neighborhood=None, name=None):
+        """
+        Compile a rule.
+
+        args:
+            reproduce [list]: neighbor counts bringing a dead cell to life
+            survive [list]: neighbor counts keeping a live cell alive
+            neighborhood [np.array]: next state for each of the 512 3x3 neighborhoods,
+                makes the rule non-totalistic
+            name [str]: rule name, defaults to B/S notation
+        """
+        self.reproduce = sorted(set(int(n) for n in reproduce))
+        self.survive = sorted(set(int(n) for n in survive))
+        if any(not 0 <= n <= 8 for n in self.reproduce + self.survive):
+            raise ValueError("Neighbor counts must be between 0 and 8")
+        # Next state indexed by current state and live neighbor count
+        self.table = np.zeros((2, 9), dtype=np.uint8)
+        self.table[0, self.reproduce] = 1
+        self.table[1, self.survive] = 1
+        # Same table by twice the 3x3 block sum plus the cell, see apply_blocks()
+        self.blocks = np.zeros(20, dtype=np.uint8)
+        self.blocks[np.array(self.reproduce, dtype=np.intp) * 2] = 1
+        self.blocks[np.array(self.survive, dtype=np.intp) * 2 + 3] = 1
+        self.neighborhood = None if neighborhood is None \
+            else np.asarray(neighborhood, dtype=np.uint8).reshape(512)
+        self.name = name
+
+    @classmethod
+    def from_string(cls, text):
+        """
+        Parse a rule in B/S notation ("B3/S23") or S/B notation ("23/3").
+
+        args:
+            text [str]: rule string, as found in RLE headers
+
+        returns:
+            rule [Rule]: parsed rule
+
+        raises:
+            ValueError
+        """
+        # Drop bounded grid suffixes like ":T100,100"
+        rule = text.split(":")[0].strip().upper().replace(" ", "")
+        match = re.fullmatch(r"B(\d*)/?S(\d*)", rule) \
+            or re.fullmatch(r"S(\d*)/?B(\d*)", rule)
+        if match:
+            birth, survival = match.groups() if rule[0] == "B" else match.groups()[::-1]
+        else:
+            match = re.fullmatch(r"(\d*)/(\d*)", rule)
+            if not match:
+                raise ValueError(f"Unsupported rule: {text}")
+            survival, birth = match.groups()
+        return cls([int(n) for n in birth], [int(n) for n in survival])
+
+    @classmethod
+    def from_function(cls, function, name=None):
+        """
+        Build a non-totalistic rule from a function of the 3x3 neighborhood.
+
+        args:
+            function [callable]: takes a 3x3 np.array, returns the next state of the center
+            name [str]: rule name
+
+        returns:
+            rule [Rule]: compiled rule
+        """
+        table = np.zeros(512, dtype=np.uint8)
+        for index in range(512):
+            cells = np.array([(index >> bit) & 1 for bit in range(9)]).reshape(3, 3)
+            table[index] = 1 if function(cells) else 0
+        return cls([], [], table, name)
+
+    @property
+    def totalistic(self):
+        """Whether the rule only depends on the live neighbor count."""
+        return self.neighborhood is None
+
+    @property
+    def spontaneous(self):
+        """Whether dead cells without live neighbors come to life."""
+        return bool(self.table[0, 0] if self.totalistic else self.neighborhood[0])
+
+    def __str__(self):
+        if self.name:
+            return self.name
+        return "B" + "".join(map(str, self.reproduce)) + "/S" + "".join(map(str, self.survive))
+
+    def __eq__(self, other):
+        if not isinstance(other, Rule):
+            return NotImplemented
+        if self.totalistic != other.totalistic:
+            return False
+        if self.totalistic:
+            return (self.reproduce, self.survive) == (other.reproduce, other.survive)
+        return np.array_equal(self.neighborhood, other.neighborhood)
+
+    def __hash__(self):
+        if self.totalistic:
+            return hash((tuple(self.reproduce), tuple(self.survive)))
+        return hash(self.neighborhood.tobytes())
+
+    def apply(self, board, neighbors):
+        """
+        Calculate the next state of every cell of a totalistic rule.
+
+        args:
+            board [np.array]: current states, 0 or 1
+            neighbors [np.array]: live neighbor counts
+
+        returns:
+            board [np.array]: next states
+        """
+        return self.table[board.astype(np.intp), neighbors.astype(np.intp)]
+
+    def apply_blocks(self, index, out):
+        """
+        Calculate the next state of every cell of a totalistic rule without allocating.
+
+        args:
+            index [np.array]: twice the sum of the 3x3 block around every cell,
+                cell included, plus the cell itself
+            out [np.array]: array to write the next states to
+        """
+        np.take(self.blocks, index, out=out, mode="clip")
@@ -0,0 +1,171 @@
+"""Headless command-line runner."""
+
+import argparse
+import sys
+from contextlib import redirect_stdout
+from time import perf_counter
+
+import checkpoint
+from cycles import Census, Detector, fast_forward
+from engine import create_engine
+from macrocell import read_macrocell, write_macrocell
+from parser import parse, format_plaintext, write_rle
+from rules import Rule
+from stats import Stats
+from config import *
+
+
+def parse_args(argv=None):
+    """
+    Parse command-line arguments.
+
+    args:
+        argv [list]: arguments, defaults to sys.argv
+
+    returns:
+        args [argparse.Namespace]: parsed arguments
+    """
+    args = argparse.ArgumentParser(
+        description="Run a Game of Life pattern without the GUI."
+    )
+    args.add_argument("pattern", help="path to pattern file, or a checkpoint (.ckpt) to resume")
+    args.add_argument("-n", "--generations", type=int, default=100,
+                      help="number of generations to run")
+    args.add_argument("-o", "--output",
+                      help="write the result to this file instead of stdout as Plaintext, "
+                           "RLE or Macrocell depending on the extension (.rle, .mc)")
+    args.add_argument("--height", type=int, default=HEIGHT, help="board height")
+    args.add_argument("--width", type=int, default=WIDTH, help="board width")
+    args.add_argument("--toroid", action="store_true", help="wrap the board edges")
+    args.add_argument("--engine", choices=ENGINES,
+                      help="stepping engine, defaults to the checkpoint's engine or config.py")
+    args.add_argument("--rule", type=Rule.from_string,
+                      help="rule like B3/S23, defaults to the pattern's rule or config.py")
+    args.add_argument("--checkpoint", help="save the engine state to this file while running")
+    args.add_argument("--every", type=int, default=0,
+                      help="generations between checkpoints, only at the end if 0")
+    args.add_argument("--detect", action="store_true",
+                      help="report cycles and fast-forward through them")
+    args.add_argument("--stats",
+                      help="append the statistics of every generation to this file")
+    return args.parse_args(argv)
+
+def advance(engine, target, detector=None, stats=None):
+    """
+    Step the engine up to a generation, jumping ahead once it cycles.
+
+    args:
+        engine [Life]: engine to step
+        target [int]: generation to reach
+        detector [Detector]: cycle detector, steps blindly if not given
+        stats [Stats]: statistics file every stepped generation is appended to
+    """
+    if detector is None and stats is None:
+        engine.step(target - engine.gen)
+        return
+    while engine.gen < target:
+        if detector is not None and detector.cycle is not None:
+            try:
+                fast_forward(engine, detector.cycle, target)
+                detector.skip(engine)
+                return
+            except ValueError:
+                # Spaceship on a bounded board, it will crash eventually
+                detector = None
+                continue
+        engine.evolve()
+        if stats is not None:
+            stats.record(engine)
+        if detector is not None:
+            cycle = detector.update(engine)
+            if cycle is not None:
+                print(cycle, file=sys.stderr)
+
+def main(argv=None):
+    """
+    Load a pattern, run it and write the resulting board.
+
+    args:
+        argv [list]: arguments, defaults to sys.argv
+    """
+    args = parse_args(argv)
+    name = args.pattern.split("/")[-1].rsplit(".", 1)[0]
+    try:
+        if args.pattern.lower().endswith(".ckpt"):
+            engine = checkpoint.load(args.pattern, args.engine)
+            if args.rule:
+                engine.rule = args.rule
+        elif (args.engine or ENGINE) == "hashlife" and args.pattern.lower().endswith(".mc"):
+            # Load the quadtree as is, huge patterns never become dense arrays
+            engine = create_engine("hashlife", args.height, args.width, args.toroid)
+            with open(args.pattern) as f:
+                engine, rule = read_macrocell(f, engine)
+            if args.rule:
+                engine.rule = args.rule
+            # Center the quadtree in the window
+            size = 1 << engine.root.k
+            engine.origin = engine.old_origin = ((args.height - size) // 2,
+                                                 (args.width - size) // 2)
+        else:
+            # Keep stdout clean for the resulting pattern
+            with redirect_stdout(sys.stderr):
+                result = parse(args.pattern)
+            if result is None:
+                return 1
+            name, pattern, rule = result
+            rule = args.rule or rule
+
+            # Center the pattern, growing the board if it does not fit
+            height = max(args.height, pattern.shape[0])
+            width = max(args.width, pattern.shape[1])
+            engine = create_engine(args.engine or ENGINE, height, width, args.toroid, rule)
+            engine.place(pattern, (height - pattern.shape[0]) // 2,
+                         (width - pattern.shape[1]) // 2)
+    except (OSError, ValueError) as error:
+        # Like a toroidal board for an engine without edges
+        print(f"WARNING: {error}", file=sys.stderr)
+        return 1
+
+    # Population and changes measured once per generation for the detector and the statistics
+    census = Census()
+    try:
+        stats = Stats(args.stats, census=census) if args.stats else None
+    except (OSError, ValueError) as error:
+        print(f"WARNING: Could not open statistics file: {error}", file=sys.stderr)
+        return 1
+
+    start = perf_counter()
+    every = args.every or args.generations
+    detector = Detector(census=census) if args.detect else None
+    end = engine.gen + args.generations
+    while engine.gen < end:
+        advance(engine, min(engine.gen + every, end), detector, stats)
+        if args.checkpoint:
+            checkpoint.save(args.checkpoint, engine)
+    elapsed = perf_counter() - start
+    if stats is not None:
+        stats.close()
+    rate = args.generations / elapsed if elapsed else float("inf")
+    print(f"{args.generations} generations in {elapsed:.3f}s ({rate:.1f} gen/s), "
+          f"population {engine.population}", file=sys.stderr)
+
+    name = f"{name} (generation {engine.gen})"
+    if args.output is None:
+        sys.stdout.write(format_plaintext(engine.board, name))
+        return 0
+    with open(args.output, "w") as f:
+        ext = args.output.rsplit(".", 1)[-1].lower()
+        if ext == "mc":
+            if engine.name != "hashlife":
+                board, gen = engine.board, engine.gen
+                engine = create_engine("hashlife", rule=engine.rule)
+                engine.board, engine.gen = board, gen
+            write_macrocell(f, engine)
+        elif ext in ("rle", "l"):
+            write_rle(f, engine.board, name, engine.rule)
+        else:
+            f.write(format_plaintext(engine.board, name))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
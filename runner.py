@@ -0,0 +1,101 @@
+"""Background thread stepping an engine independently of the GUI."""
+
+import threading
+from time import perf_counter, sleep
+
+from config import *
+
+
+class Runner(threading.Thread):
+    """
+    Step an engine at a target rate in a daemon thread.
+
+    Anything touching the engine from another thread must hold lock.
+    """
+
+    def __init__(self, engine, rate=MAX_RATE, detector=None, profiler=None, history=None,
+                 stats=None):
+        """
+        Create a paused runner, call start() once and then resume().
+
+        args:
+            engine [Life]: engine to step
+            rate [float]: target generations per second
+            detector [Detector]: cycle detector fed every generation
+            profiler [Profiler]: profiler timing every generation
+            history [History]: history storing every generation
+            stats [Stats]: statistics file every generation is appended to
+        """
+        super().__init__(daemon=True)
+        self.engine = engine
+        self.rate = rate
+        self.detector = detector
+        self.profiler = profiler
+        self.history = history
+        self.stats = stats
+        # Last cycle found, for the GUI to pick up
+        self.cycle = None
+        self.lock = threading.Lock()
+        self.running = threading.Event()
+        self.stopped = False
+        self.error = None
+
+    def resume(self):
+        """Start stepping."""
+        self.error = None
+        self.running.set()
+
+    def pause(self):
+        """Stop stepping after the current generation."""
+        self.running.clear()
+
+    def stop(self):
+        """End the thread."""
+        self.stopped = True
+        self.running.set()
+
+    def run(self):
+        """Step the engine while running, paced to the target rate."""
+        deadline = perf_counter()
+        while not self.stopped:
+            if not self.running.wait(0.1):
+                deadline = perf_counter()
+                continue
+            with self.lock:
+                if not self.running.is_set():
+                    # Paused while waiting for the lock
+                    continue
+                try:
+                    start = perf_counter()
+                    self.engine.evolve()
+                    evolved = perf_counter()
+                    cycle = self.detector.update(self.engine) if self.detector else None
+                    if self.history is not None:
+                        self.history.record(self.engine)
+                    if self.stats is not None:
+                        self.stats.record(self.engine)
+                    if self.profiler is not None and self.profiler.enabled:
+                        self.profiler.record(
+                            "generation", gen=self.engine.gen, evolve=evolved - start,
+                            detect=perf_counter() - evolved,
+                            evaluated=self.engine.evaluated, population=self.engine.population
+                        )
+                except Exception as error:
+                    # Surface engine errors to the GUI instead of dying silently
+                    self.error = error
+                    self.running.clear()
+                    continue
+                if cycle is not None:
+                    self.cycle = cycle
+                    # Moving patterns are still worth watching
+                    if AUTO_STOP and cycle.kind != "spaceship":
+                        self.running.clear()
+                        continue
+            # Sleep off the rest of the generation
+            deadline += 1 / self.rate
+            delay = deadline - perf_counter()
+            if delay > 0:
+                sleep(delay)
+            else:
+                # Running behind, don't catch up in bursts
+                deadline = perf_counter()
@@ -0,0 +1,533 @@
+"""Asyncio server running an engine for remote clients, streaming board changes."""
+
+import argparse
+import asyncio
+import json
+import sys
+from time import perf_counter
+
+import numpy as np
+
+from engine import create_engine
+from history import apply_delta, live_cells
+from library import Library
+from parser import parse
+from rules import Rule
+from sparse import encode, decode
+from config import *
+
+
+def flat_cells(keys):
+    """
+    List cell keys as coordinates for JSON.
+
+    args:
+        keys [np.array]: cell keys
+
+    returns:
+        cells [list]: y and x of every cell, one after another
+    """
+    ys, xs = decode(keys)
+    return np.stack([ys, xs], axis=1).ravel().tolist()
+
+def cell_keys(cells):
+    """
+    Read coordinates listed by flat_cells().
+
+    args:
+        cells [list]: y and x of every cell, one after another
+
+    returns:
+        keys [np.array]: cell keys
+    """
+    cells = np.array(cells, dtype=np.int64).reshape(-1, 2)
+    return encode(cells[:, 0], cells[:, 1])
+
+def dump(message):
+    """
+    Serialize a message as one line.
+
+    args:
+        message [dict]: message
+
+    returns:
+        line [bytes]: JSON line
+    """
+    return (json.dumps(message, separators=(",", ":")) + "\n").encode()
+
+
+class Client:
+    """Connection of one client and the board it was last sent."""
+
+    def __init__(self, writer):
+        """
+        Register a connection.
+
+        args:
+            writer [asyncio.StreamWriter]: connection
+        """
+        self.writer = writer
+        # Version and live cells of the last frame sent, None before the first one
+        self.version = None
+        self.keys = None
+        # Messages other than frames waiting to be sent
+        self.outbox = []
+        self.wake = asyncio.Event()
+
+    def post(self, message):
+        """
+        Queue a message for the sender.
+
+        args:
+            message [dict]: message
+        """
+        self.outbox.append(dump(message))
+        self.wake.set()
+
+
+class Server:
+    """
+    Step an engine in the background and stream its changes to clients.
+
+    Clients send one JSON command per line and receive JSON lines: "state"
+    after every command and "frame" with the cells born and died since the
+    frame they were sent last. A client still sending gets no frames; once
+    it catches up, everything it missed is merged into a single frame, so
+    slow clients never hold the simulation back.
+    """
+
+    def __init__(self, engine, rate=MAX_RATE, library=None):
+        """
+        Create a paused server.
+
+        args:
+            engine [Life]: engine to step
+            rate [float]: target generations per second
+            library [Library]: patterns placeable by name
+        """
+        self.engine = engine
+        self.rate = rate
+        self.library = library
+        self.running = False
+        self.resumed = asyncio.Event()
+        # Held while the engine is stepped or edited
+        self.lock = asyncio.Lock()
+        self.clients = set()
+        # Generation and live cells after every change, each with a new version
+        self.gen = engine.gen
+        self.keys = live_cells(engine)
+        self.version = 0
+        # Frames of the current version by the version they start from
+        self.frames = {}
+        self.error = None
+
+    def state(self):
+        """
+        Describe the simulation.
+
+        returns:
+            state [dict]: "state" message
+        """
+        return {
+            "type": "state", "gen": self.gen, "running": self.running,
+            "rate": self.rate, "rule": str(self.engine.rule), "engine": self.engine.name,
+            "height": self.engine.height, "width": self.engine.width,
+            "toroid": self.engine.toroid, "error": self.error,
+        }
+
+    def broadcast(self, message):
+        """
+        Send a message to every client.
+
+        args:
+            message [dict]: message
+        """
+        line = dump(message)
+        for client in self.clients:
+            client.outbox.append(line)
+            client.wake.set()
+
+    def advance(self, n=1):
+        """
+        Step the engine, run in a worker thread.
+
+        args:
+            n [int]: number of generations
+
+        returns:
+            gen [int]: generation reached
+            keys [np.array]: live cells afterwards
+        """
+        for _ in range(n):
+            self.engine.evolve()
+        return self.engine.gen, live_cells(self.engine)
+
+    def publish(self, gen, keys):
+        """
+        Make a new board the current one and wake every sender.
+
+        The engine may be stepping in a worker thread meanwhile, so frames
+        and states only describe the generation published with its cells.
+
+        args:
+            gen [int]: generation
+            keys [np.array]: live cells
+        """
+        self.gen, self.keys = gen, keys
+        self.version += 1
+        self.frames.clear()
+        for client in self.clients:
+            client.wake.set()
+
+    def frame(self, client):
+        """
+        Build the frame taking a client to the current board.
+
+        Clients at the same version share one frame.
+
+        args:
+            client [Client]: client to update
+
+        returns:
+            line [bytes]: "frame" message
+        """
+        line = self.frames.get(client.version)
+        if line is None:
+            if client.keys is None:
+                born, died = self.keys, self.keys[:0]
+            else:
+                born = np.setdiff1d(self.keys, client.keys, assume_unique=True)
+                died = np.setdiff1d(client.keys, self.keys, assume_unique=True)
+            line = dump({
+                "type": "frame", "gen": self.gen, "full": client.keys is None,
+                "population": len(self.keys), "born": flat_cells(born), "died": flat_cells(died),
+            })
+            self.frames[client.version] = line
+        client.version = self.version
+        client.keys = self.keys
+        return line
+
+    async def send(self, client):
+        """
+        Write messages and frames to a client as fast as it reads them.
+
+        args:
+            client [Client]: client to serve
+        """
+        writer = client.writer
+        try:
+            while True:
+                await client.wake.wait()
+                client.wake.clear()
+                for line in client.outbox:
+                    writer.write(line)
+                client.outbox.clear()
+                if client.version != self.version:
+                    writer.write(self.frame(client))
+                # Generations published while draining are merged into the next frame
+                await writer.drain()
+        except ConnectionError:
+            pass
+
+    async def handle(self, reader, writer):
+        """
+        Serve one connection until it closes.
+
+        args:
+            reader [asyncio.StreamReader]: incoming commands
+            writer [asyncio.StreamWriter]: outgoing messages
+        """
+        client = Client(writer)
+        client.post(self.state())
+        self.clients.add(client)
+        sender = asyncio.create_task(self.send(client))
+        try:
+            while line := await reader.readline():
+                try:
+                    message = json.loads(line)
+                    if not isinstance(message, dict):
+                        raise ValueError("Commands must be JSON objects")
+                    await self.command(message)
+                except (ValueError, KeyError, TypeError) as error:
+                    client.post({"type": "error", "message": str(error)})
+        except (ConnectionError, ValueError):
+            # Reset, or a line over SERVER_LINE_LIMIT
+            pass
+        finally:
+            self.clients.discard(client)
+            sender.cancel()
+            writer.close()
+
+    async def command(self, message):
+        """
+        Carry out a client command.
+
+        args:
+            message [dict]: command as {"cmd": name, ...}
+
+        raises:
+            ValueError
+            KeyError
+        """
+        cmd = message.get("cmd")
+        loop = asyncio.get_running_loop()
+        if cmd == "start":
+            self.error = None
+            self.running = True
+            self.resumed.set()
+        elif cmd == "pause":
+            self.running = False
+            self.resumed.clear()
+        elif cmd == "speed":
+            rate = float(message["rate"])
+            if not rate > 0:
+                raise ValueError(f"Invalid speed: {rate}")
+            self.rate = rate
+        elif cmd == "rule":
+            rule = Rule.from_string(str(message["rule"]))
+            async with self.lock:
+                self.engine.rule = rule
+        elif cmd == "reset":
+            async with self.lock:
+                self.engine.clear()
+                self.publish(self.engine.gen, live_cells(self.engine))
+        elif cmd == "randomize":
+            async with self.lock:
+                self.engine.randomize()
+                self.publish(self.engine.gen, live_cells(self.engine))
+        elif cmd == "step":
+            if self.running:
+                raise ValueError("Pause before stepping")
+            async with self.lock:
+                self.publish(*await loop.run_in_executor(None, self.advance,
+                                                         int(message.get("n", 1))))
+        elif cmd == "place":
+            y, x = int(message["y"]), int(message["x"])
+            rule = None
+            if "pattern" in message:
+                if self.library is None:
+                    raise ValueError("No pattern library")
+                try:
+                    arrays, rule = self.library.orientations(message["pattern"])
+                except KeyError:
+                    raise ValueError(f"Unknown pattern: {message['pattern']}")
+                array = arrays[int(message.get("orientation", 0)) % len(arrays)]
+            else:
+                array = np.array(message["cells"], dtype=np.uint8)
+                if array.ndim != 2:
+                    raise ValueError("Cells must be a list of rows")
+            async with self.lock:
+                if rule is not None:
+                    self.engine.rule = rule
+                self.engine.place(array, y, x)
+                self.publish(self.engine.gen, live_cells(self.engine))
+        elif cmd != "state":
+            raise ValueError(f"Unknown command: {cmd}")
+        self.broadcast(self.state())
+
+    async def simulate(self):
+        """Step the engine while running, paced to the target rate."""
+        loop = asyncio.get_running_loop()
+        deadline = perf_counter()
+        while True:
+            if not self.running:
+                await self.resumed.wait()
+                deadline = perf_counter()
+                continue
+            async with self.lock:
+                if not self.running:
+                    # Paused while waiting for the lock
+                    continue
+                try:
+                    gen, keys = await loop.run_in_executor(None, self.advance)
+                except Exception as error:
+                    # Report engine errors to the clients instead of dying silently
+                    self.error = str(error)
+                    self.running = False
+                    self.resumed.clear()
+                    self.broadcast(self.state())
+                    continue
+                self.publish(gen, keys)
+            # Sleep off the rest of the generation
+            deadline += 1 / self.rate
+            delay = deadline - perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            else:
+                # Running behind, don't catch up in bursts but let the clients in
+                deadline = perf_counter()
+                await asyncio.sleep(0)
+
+    async def listen(self, host=SERVER_HOST, port=SERVER_PORT, path=None):
+        """
+        Accept connections and start the simulation task.
+
+        args:
+            host [str]: address to listen on
+            port [int]: TCP port, 0 for any free one
+            path [str]: Unix socket path, used instead of TCP if given
+
+        returns:
+            listener [asyncio.Server]: listening socket
+        """
+        if path is not None:
+            listener = await asyncio.start_unix_server(self.handle, path,
+                                                       limit=SERVER_LINE_LIMIT)
+        else:
+            listener = await asyncio.start_server(self.handle, host, port,
+                                                  limit=SERVER_LINE_LIMIT)
+        self.simulation = asyncio.create_task(self.simulate())
+        return listener
+
+
+class Subscriber:
+    """Client keeping a copy of the live cells of a server."""
+
+    def __init__(self):
+        """Create a disconnected subscriber."""
+        self.reader = self.writer = None
+        self.keys = np.empty(0, dtype=np.int64)
+        self.gen = None
+        self.state = None
+        self.errors = []
+        self.frames = 0
+        self.received = 0
+
+    async def connect(self, host=SERVER_HOST, port=SERVER_PORT, path=None):
+        """
+        Connect to a server.
+
+        args:
+            host [str]: server address
+            port [int]: TCP port
+            path [str]: Unix socket path, used instead of TCP if given
+        """
+        if path is not None:
+            self.reader, self.writer = await asyncio.open_unix_connection(
+                path, limit=SERVER_LINE_LIMIT)
+        else:
+            self.reader, self.writer = await asyncio.open_connection(
+                host, port, limit=SERVER_LINE_LIMIT)
+
+    async def send(self, cmd, **args):
+        """
+        Send a command.
+
+        args:
+            cmd [str]: command name
+            **args: command arguments
+        """
+        self.writer.write(dump({"cmd": cmd, **args}))
+        await self.writer.drain()
+
+    def receive(self, message):
+        """
+        Apply a message from the server.
+
+        args:
+            message [dict]: message
+        """
+        if message["type"] == "frame":
+            if message["full"]:
+                self.keys = cell_keys(message["born"])
+            else:
+                self.keys = apply_delta(self.keys, cell_keys(message["born"]),
+                                        cell_keys(message["died"]))
+            self.gen = message["gen"]
+            self.frames += 1
+        elif message["type"] == "state":
+            self.state = message
+        elif message["type"] == "error":
+            self.errors.append(message["message"])
+
+    async def listen(self, delay=0):
+        """
+        Read messages until the connection closes.
+
+        args:
+            delay [float]: seconds to wait after every message, simulating a slow client
+        """
+        while line := await self.reader.readline():
+            self.received += len(line)
+            self.receive(json.loads(line))
+            if delay:
+                await asyncio.sleep(delay)
+
+    async def close(self):
+        """Close the connection."""
+        self.writer.close()
+        try:
+            await self.writer.wait_closed()
+        except ConnectionError:
+            pass
+
+
+async def serve(server, host=SERVER_HOST, port=SERVER_PORT, path=None):
+    """
+    Run a server until interrupted.
+
+    args:
+        server [Server]: server to run
+        host [str]: address to listen on
+        port [int]: TCP port
+        path [str]: Unix socket path, used instead of TCP if given
+    """
+    listener = await server.listen(host, port, path)
+    where = path or ", ".join(f"{sock.getsockname()[0]}:{sock.getsockname()[1]}"
+                              for sock in listener.sockets)
+    print(f"Serving on {where}", file=sys.stderr)
+    async with listener:
+        await listener.serve_forever()
+
+def main(argv=None):
+    """
+    Serve a simulation from the command line.
+
+    args:
+        argv [list]: arguments, defaults to sys.argv
+
+    returns:
+        status [int]: exit status
+    """
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("pattern", nargs="?", help="pattern file to start from")
+    parser.add_argument("--host", default=SERVER_HOST, help="address to listen on")
+    parser.add_argument("--port", type=int, default=SERVER_PORT, help="TCP port")
+    parser.add_argument("--unix", help="listen on this Unix socket instead of TCP")
+    parser.add_argument("--height", type=int, default=HEIGHT, help="board height")
+    parser.add_argument("--width", type=int, default=WIDTH, help="board width")
+    parser.add_argument("--toroid", action="store_true", help="wrap the board edges")
+    parser.add_argument("--engine", choices=ENGINES, default=ENGINE, help="stepping engine")
+    parser.add_argument("--rule", type=Rule.from_string,
+                        help="rule like B3/S23, defaults to the pattern's rule or config.py")
+    parser.add_argument("--rate", type=float, default=MAX_RATE,
+                        help="target generations per second")
+    args = parser.parse_args(argv)
+
+    try:
+        engine = create_engine(args.engine, args.height, args.width, args.toroid, args.rule)
+    except ValueError as error:
+        print(f"WARNING: {error}", file=sys.stderr)
+        return 1
+    if args.pattern:
+        result = parse(args.pattern)
+        if result is None:
+            return 1
+        _, pattern, rule = result
+        if rule is not None and args.rule is None:
+            engine.rule = rule
+        engine.place(pattern, (args.height - pattern.shape[0]) // 2,
+                     (args.width - pattern.shape[1]) // 2)
+
+    async def run():
+        await serve(Server(engine, args.rate, Library()), args.host, args.port, args.unix)
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
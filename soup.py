@@ -0,0 +1,302 @@
+"""Batch search of what random soups settle into."""
+
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+import json
+import os
+import sys
+
+import numpy as np
+
+from rules import Rule, add_neighbors, neighborhood_index
+from config import *
+
+
+# Random weights of the board hash, the same in every process
+WEIGHTS_SEED = 0
+
+def random_soup(seed, height, width, density=0.5):
+    """
+    Generate a seeded random board.
+
+    args:
+        seed [int]: random seed
+        height [int]: board height
+        width [int]: board width
+        density [float]: chance of a cell being alive
+
+    returns:
+        board [np.array]: random board
+    """
+    return (np.random.default_rng(seed).random((height, width)) < density).astype(np.uint8)
+
+
+class Soups:
+    """
+    Random boards of the same size stepped together as one 3D array.
+
+    Every board is hashed each generation and the hashes of the last
+    generations are kept per board, a board settles as soon as its hash
+    repeats. Settled boards are retired from the batch.
+    """
+
+    def __init__(self, seeds, height=SOUP_SIZE, width=SOUP_SIZE, density=0.5, toroid=False,
+                 rule=None, history=SOUP_HISTORY):
+        """
+        Generate the boards.
+
+        args:
+            seeds [list]: random seed of every board
+            height [int]: board height
+            width [int]: board width
+            density [float]: chance of a cell being alive
+            toroid [bool]: wrap the board edges
+            rule [Rule]: rule to run, defaults to SURVIVE and REPRODUCE
+            history [int]: generations remembered per board
+        """
+        self.seeds = np.array(seeds, dtype=np.int64)
+        self.boards = np.stack([random_soup(int(seed), height, width, density)
+                                for seed in self.seeds]) if len(self.seeds) \
+            else np.zeros((0, height, width), dtype=np.uint8)
+        self.toroid = toroid
+        self.rule = rule if rule is not None else Rule()
+        self.gen = 0
+        self.weights = np.random.default_rng(WEIGHTS_SEED).integers(
+            0, np.iinfo(np.int64).max, size=height * width, dtype=np.uint64) | np.uint64(1)
+        self.history = np.zeros((len(self.seeds), history), dtype=np.uint64)
+        self.remember(self.hashes())
+
+    def __len__(self):
+        return len(self.seeds)
+
+    def evolve(self):
+        """Calculate the next generation of every board at once."""
+        boards = self.boards
+        if not self.rule.totalistic:
+            cells = boards.astype(np.intp)
+            index = np.empty(boards.shape, dtype=np.intp)
+            neighborhood_index(cells, self.toroid, out=index)
+            self.boards = self.rule.neighborhood[index]
+        else:
+            # Same block sums as the dense engine, over the last two axes
+            rows = boards.copy()
+            add_neighbors(rows, boards, -1, 0, self.toroid)
+            add_neighbors(rows, boards, 1, 0, self.toroid)
+            sums = rows.copy()
+            add_neighbors(sums, rows, 0, -1, self.toroid)
+            add_neighbors(sums, rows, 0, 1, self.toroid)
+            sums <<= 1
+            sums += boards
+            self.boards = self.rule.blocks[sums]
+        self.gen += 1
+
+    def hashes(self):
+        """
+        Hash every board.
+
+        returns:
+            hashes [np.array]: 64-bit hash of every board
+        """
+        return self.boards.reshape(len(self.boards), -1).astype(np.uint64) @ self.weights
+
+    def remember(self, hashes):
+        """
+        Store the hashes of the current generation.
+
+        args:
+            hashes [np.array]: hash of every board
+        """
+        self.history[:, self.gen % self.history.shape[1]] = hashes
+
+    def settled(self):
+        """
+        Look the current generation up in the history of every board.
+
+        returns:
+            periods [np.array]: shortest period of every board, 0 if it is still changing
+        """
+        hashes = self.hashes()
+        size = self.history.shape[1]
+        known = min(self.gen, size)
+        slots = np.arange(known)
+        # Generations since every slot was written
+        ages = (self.gen - slots) % size
+        ages[ages == 0] = size
+        matches = self.history[:, :known] == hashes[:, None]
+        periods = np.where(matches, ages, size + 1).min(axis=1, initial=size + 1)
+        periods[periods > size] = 0
+        self.remember(hashes)
+        return periods
+
+    def retire(self, keep):
+        """
+        Drop boards from the batch.
+
+        args:
+            keep [np.array]: mask of the boards to keep
+        """
+        self.seeds = self.seeds[keep]
+        self.boards = self.boards[keep]
+        self.history = self.history[keep]
+
+
+def search(seeds, height=SOUP_SIZE, width=SOUP_SIZE, density=0.5, toroid=False, rule=None,
+           generations=SOUP_GENERATIONS, history=SOUP_HISTORY):
+    """
+    Run soups until they settle.
+
+    args:
+        seeds [list]: random seed of every soup
+        height [int]: board height
+        width [int]: board width
+        density [float]: chance of a cell being alive
+        toroid [bool]: wrap the board edges
+        rule [Rule]: rule to run, defaults to SURVIVE and REPRODUCE
+        generations [int]: soups still changing by then count as unsettled
+        history [int]: generations remembered per soup, the longest period found
+
+    returns:
+        results [list]: lifespan, period and final population of every seed,
+            lifespan and period are None for unsettled soups
+    """
+    soups = Soups(seeds, height, width, density, toroid, rule, history)
+    results = []
+    while len(soups) and soups.gen < generations:
+        soups.evolve()
+        periods = soups.settled()
+        done = periods > 0
+        if done.any():
+            populations = np.count_nonzero(soups.boards[done], axis=(1, 2))
+            for seed, period, population in zip(soups.seeds[done].tolist(),
+                                                periods[done].tolist(), populations.tolist()):
+                # The repeated generation is where the cycle started
+                results.append({"seed": seed, "lifespan": soups.gen - period,
+                                "period": period, "population": population})
+            soups.retire(~done)
+    populations = np.count_nonzero(soups.boards, axis=(1, 2))
+    for seed, population in zip(soups.seeds.tolist(), populations.tolist()):
+        results.append({"seed": seed, "lifespan": None, "period": None,
+                        "population": population})
+    return results
+
+def survey(seeds, workers=WORKERS, batch=SOUP_BATCH, **kwargs):
+    """
+    Search soups in batches spread across processes.
+
+    args:
+        seeds [list]: random seed of every soup
+        workers [int]: worker processes, 0 for one per CPU
+        batch [int]: soups stepped together
+        **kwargs: search() arguments
+
+    returns:
+        results [list]: search() results ordered by seed
+    """
+    seeds = list(seeds)
+    batches = [seeds[i:i + batch] for i in range(0, len(seeds), batch)]
+    workers = min(workers or os.cpu_count(), len(batches))
+    results = []
+    if workers <= 1:
+        for seeds in batches:
+            results.extend(search(seeds, **kwargs))
+    else:
+        with ProcessPoolExecutor(workers) as pool:
+            futures = [pool.submit(search, seeds, **kwargs) for seeds in batches]
+            for future in futures:
+                results.extend(future.result())
+    return sorted(results, key=lambda result: result["seed"])
+
+def statistics(values):
+    """
+    Describe a set of numbers.
+
+    args:
+        values [np.array]: numbers
+
+    returns:
+        statistics [dict]: mean, median, min and max, None if there are no numbers
+    """
+    if not len(values):
+        return None
+    return {"mean": round(float(values.mean()), 2), "median": float(np.median(values)),
+            "min": int(values.min()), "max": int(values.max())}
+
+def summarize(results):
+    """
+    Aggregate the results of a survey.
+
+    args:
+        results [list]: survey() results
+
+    returns:
+        summary [dict]: soup counts, lifespan and final population statistics and
+            soups per period
+    """
+    settled = [result for result in results if result["lifespan"] is not None]
+    lifespans = np.array([result["lifespan"] for result in settled])
+    populations = np.array([result["population"] for result in settled])
+    periods = {}
+    for result in settled:
+        periods[result["period"]] = periods.get(result["period"], 0) + 1
+
+    return {
+        "soups": len(results),
+        "settled": len(settled),
+        "extinct": sum(1 for result in settled if result["population"] == 0),
+        "lifespan": statistics(lifespans),
+        "population": statistics(populations),
+        "periods": dict(sorted(periods.items())),
+    }
+
+def main(argv=None):
+    """
+    Survey random soups from the command line.
+
+    args:
+        argv [list]: arguments, defaults to sys.argv
+
+    returns:
+        status [int]: exit status
+    """
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("-n", "--soups", type=int, default=1000, help="number of soups")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the first soup")
+    parser.add_argument("--height", type=int, default=SOUP_SIZE, help="board height")
+    parser.add_argument("--width", type=int, default=SOUP_SIZE, help="board width")
+    parser.add_argument("--density", type=float, default=0.5, help="initial live cell ratio")
+    parser.add_argument("--toroid", action="store_true", help="wrap the board edges")
+    parser.add_argument("--rule", type=Rule.from_string, help="rule like B3/S23")
+    parser.add_argument("--generations", type=int, default=SOUP_GENERATIONS,
+                        help="soups still changing by then count as unsettled")
+    parser.add_argument("--history", type=int, default=SOUP_HISTORY,
+                        help="generations remembered per soup, the longest period found")
+    parser.add_argument("--batch", type=int, default=SOUP_BATCH, help="soups stepped together")
+    parser.add_argument("--workers", type=int, default=WORKERS,
+                        help="worker processes, 0 for one per CPU")
+    parser.add_argument("-o", "--output", help="write the JSON results to this file")
+    args = parser.parse_args(argv)
+
+    results = survey(range(args.seed, args.seed + args.soups), args.workers, args.batch,
+                     height=args.height, width=args.width, density=args.density,
+                     toroid=args.toroid, rule=args.rule, generations=args.generations,
+                     history=args.history)
+    summary = summarize(results)
+    lifespan = summary["lifespan"]
+    print(f"{summary['settled']}/{summary['soups']} soups settled, "
+          f"{summary['extinct']} died out", file=sys.stderr)
+    if lifespan:
+        print(f"Lifespan: mean {lifespan['mean']}, median {lifespan['median']}, "
+              f"max {lifespan['max']}", file=sys.stderr)
+
+    report = {"summary": summary, "results": results}
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=1)
+    else:
+        json.dump(report, sys.stdout, indent=1)
+        print()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
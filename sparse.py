@@ -0,0 +1,278 @@
+"""Sparse Game of Life engine for unbounded universes."""
+
+import numpy as np
+
+from engine import Life
+
+
+# Coordinates are packed into one sorted int64 key per live cell
+SHIFT = 32
+BIAS = 1 << (SHIFT - 2)  # keeps keys positive for |y|, |x| < 2^30
+LOW = (1 << SHIFT) - 1
+OFFSETS = [(h, w) for h in range(-1, 2) for w in range(-1, 2) if h != 0 or w != 0]
+
+def encode(ys, xs):
+    """
+    Pack coordinates into cell keys.
+
+    args:
+        ys [np.array]: y positions
+        xs [np.array]: x positions
+
+    returns:
+        keys [np.array]: cell keys
+    """
+    return ((np.asarray(ys, dtype=np.int64) + BIAS) << SHIFT) \
+        | (np.asarray(xs, dtype=np.int64) + BIAS)
+
+def decode(keys):
+    """
+    Unpack cell keys into coordinates.
+
+    args:
+        keys [np.array]: cell keys
+
+    returns:
+        ys [np.array]: y positions
+        xs [np.array]: x positions
+    """
+    return (keys >> SHIFT) - BIAS, (keys & LOW) - BIAS
+
+
+class SparseLife(Life):
+    """
+    Life engine storing only the live cells.
+
+    Without toroid the universe is unbounded - height and width only define
+    the window returned by board. With toroid the cells wrap around it.
+    """
+
+    # Name used by create_engine
+    name = "sparse"
+
+    def __init__(self, *args, **kwargs):
+        """Create an empty universe, see Life for arguments."""
+        self.cells = self.old_cells = np.empty(0, dtype=np.int64)
+        self.computed = 0
+        super().__init__(*args, **kwargs)
+
+    def check_rule(self, rule):
+        """
+        Check that the engine can run a rule.
+
+        args:
+            rule [Rule]: rule to check
+
+        raises:
+            ValueError
+        """
+        if not rule.totalistic:
+            raise ValueError("The sparse engine only supports totalistic rules")
+        if 0 in rule.reproduce:
+            raise ValueError("Rules with birth on 0 neighbors are not supported by the sparse engine")
+
+    def window(self, top, left, bottom, right, old=False):
+        """
+        Render the live cells of an area, see Life.window().
+
+        Keys sort by row first, so only the keys of the rows in the area are read.
+
+        args:
+            top, left, bottom, right [int]: area edges, bottom and right exclusive
+            old [bool]: read the previous generation instead
+
+        returns:
+            board [np.array]: cells of the area
+        """
+        board = np.zeros((max(bottom - top, 0), max(right - left, 0)), dtype=np.uint8)
+        if board.size == 0:
+            return board
+        keys = self.old_cells if old else self.cells
+        keys = keys[np.searchsorted(keys, encode(top, left)):
+                    np.searchsorted(keys, encode(bottom - 1, right))]
+        ys, xs = decode(keys)
+        inside = (xs >= left) & (xs < right)
+        board[ys[inside] - top, xs[inside] - left] = 1
+        return board
+
+    @property
+    def board(self):
+        """Current generation inside the window."""
+        return self.window(0, 0, self.height, self.width)
+
+    @board.setter
+    def board(self, board):
+        self.cells = encode(*np.nonzero(board == 1))
+
+    @property
+    def old_board(self):
+        """Previous generation inside the window."""
+        return self.window(0, 0, self.height, self.width, old=True)
+
+    @old_board.setter
+    def old_board(self, board):
+        self.old_cells = encode(*np.nonzero(board == 1))
+
+    @property
+    def population(self):
+        """Number of live cells."""
+        return len(self.cells)
+
+    @property
+    def evaluated(self):
+        """Number of cells computed in the last generation."""
+        return self.computed
+
+    def bounds(self):
+        """
+        Calculate the bounding box of the live cells.
+
+        returns:
+            bounds [tuple]: top, left, bottom and right edge (exclusive), None if empty
+        """
+        if len(self.cells) == 0:
+            return None
+        return self.box()
+
+    def to_array(self):
+        """
+        Render every live cell.
+
+        returns:
+            board [np.array]: bounding box contents
+            origin [tuple]: y and x position of the top-left corner
+        """
+        bounds = self.bounds()
+        if bounds is None:
+            return np.zeros((0, 0), dtype=np.uint8), (0, 0)
+        top, left, bottom, right = bounds
+        board = np.zeros((bottom - top, right - left), dtype=np.uint8)
+        ys, xs = decode(self.cells)
+        board[ys - top, xs - left] = 1
+        return board, (top, left)
+
+    def wrap(self, ys, xs):
+        """
+        Wrap coordinates around the board if it is toroidal.
+
+        args:
+            ys [np.array]: y positions
+            xs [np.array]: x positions
+
+        returns:
+            keys [np.array]: cell keys
+        """
+        if self.toroid:
+            return encode(ys % self.height, xs % self.width)
+        return encode(ys, xs)
+
+    def set_cell(self, state, y, x):
+        """
+        Set cell state - alive or dead.
+
+        args:
+            state [int]: cell state
+            y [int]: y position
+            x [int]: x position
+
+        returns:
+            changed [bool]: always True, every position is on the board
+        """
+        key = self.wrap(np.array([y]), np.array([x]))
+        if state == 1:
+            self.cells = np.union1d(self.cells, key)
+        else:
+            self.cells = np.setdiff1d(self.cells, key, assume_unique=True)
+        return True
+
+    def place(self, array, y, x):
+        """
+        Place pattern in the universe, replacing the cells below it.
+
+        args:
+            array [np.array]: pattern array
+            y [int]: y position of the top-left corner
+            x [int]: x position of the top-left corner
+        """
+        # Clear the area covered by the pattern
+        area = np.indices(array.shape).reshape(2, -1)
+        covered = self.wrap(area[0] + y, area[1] + x)
+        kept = np.setdiff1d(self.cells, covered, assume_unique=True)
+        ys, xs = np.nonzero(array == 1)
+        self.cells = np.union1d(kept, self.wrap(ys + y, xs + x))
+
+    def count_changes(self):
+        """
+        Count the cells that differ between the live cells and the previous ones.
+
+        returns:
+            changed [int]: cells born or died
+        """
+        return len(np.setxor1d(self.cells, self.old_cells, assume_unique=True))
+
+    def changes(self):
+        """
+        Find the cells that differ between the live cells and the previous ones.
+
+        returns:
+            born [tuple]: y and x positions of the cells born
+            died [tuple]: y and x positions of the cells died
+        """
+        return (decode(np.setdiff1d(self.cells, self.old_cells, assume_unique=True)),
+                decode(np.setdiff1d(self.old_cells, self.cells, assume_unique=True)))
+
+    def count(self):
+        """
+        Measure the generation just stepped to, see Life.count().
+
+        returns:
+            counts [tuple]: generation, population, births, deaths and bounding box
+        """
+        cells, old_cells = self.cells, self.old_cells
+        births = len(cells) - len(np.intersect1d(cells, old_cells, assume_unique=True))
+        return self.gen, len(cells), births, len(old_cells) - len(cells) + births, self.box()
+
+    def box(self):
+        """
+        Find the edges of the live cells.
+
+        returns:
+            box [tuple]: top, left, bottom and right edge, bottom and right exclusive, all 0 if empty
+        """
+        if len(self.cells) == 0:
+            return 0, 0, 0, 0
+        ys, xs = decode(self.cells)
+        # Keys sort by row first
+        return int(ys[0]), int(xs.min()), int(ys[-1]) + 1, int(xs.max()) + 1
+
+    def evolve(self):
+        """Calculate the next generation."""
+        self.old_cells = cells = self.cells
+        self.gen += 1
+        self.computed = 0
+        if len(cells) == 0:
+            if self.counting:
+                self.counts = (self.gen, 0, 0, 0, (0, 0, 0, 0))
+            return
+
+        # Count live neighbors of every cell next to a live cell
+        ys, xs = decode(cells)
+        offsets = np.array(OFFSETS)
+        neighbors = self.wrap(ys[:, None] + offsets[:, 0], xs[:, None] + offsets[:, 1])
+        candidates, counts = np.unique(neighbors, return_counts=True)
+        self.computed = len(candidates)
+
+        # Apply the rules to the candidates
+        index = np.minimum(np.searchsorted(cells, candidates), len(cells) - 1)
+        alive = cells[index] == candidates
+        survived = alive & np.isin(counts, self.survive)
+        born = ~alive & np.isin(counts, self.reproduce)
+        new = candidates[survived | born]
+        if 0 in self.survive:
+            # Lonely cells never show up as candidates
+            new = np.union1d(new, np.setdiff1d(cells, candidates, assume_unique=True))
+        self.cells = new
+        if self.counting:
+            # Births are known from the rule lookup, every other change is a death
+            births = int(np.count_nonzero(born))
+            self.counts = (self.gen, len(new), births, len(cells) - len(new) + births, self.box())
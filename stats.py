@@ -0,0 +1,190 @@
+"""Per-generation statistics written to a memory-mapped time series."""
+
+import argparse
+import os
+import sys
+from time import sleep
+
+import numpy as np
+
+from cycles import Census
+from config import *
+
+
+MAGIC = b"LIFESTAT"
+VERSION = 1
+HEADER = np.dtype([("magic", "S8"), ("version", "<i8"), ("capacity", "<i8"), ("count", "<i8")])
+# Records start on their own cache line
+HEADER_SIZE = 64
+# Bounding box edges are exclusive and all 0 on an empty board
+RECORD = np.dtype([
+    ("gen", "<i8"), ("population", "<i8"), ("births", "<i8"), ("deaths", "<i8"),
+    ("changed", "<i8"), ("top", "<i8"), ("left", "<i8"), ("bottom", "<i8"), ("right", "<i8"),
+])
+
+
+class Stats:
+    """
+    Statistics of every generation appended to a file.
+
+    The file holds a header with the number of records written, updated
+    after every record, followed by room for capacity records. Other
+    processes can map it and read the records while they are written,
+    see read(). The room doubles when it runs out.
+    """
+
+    def __init__(self, path, capacity=STATS_CAPACITY, census=None):
+        """
+        Open a statistics file, continuing it if it exists.
+
+        args:
+            path [str]: file path
+            capacity [int]: records preallocated in a new file
+            census [Census]: census to share with a Detector, a new one if not given
+
+        raises:
+            ValueError
+        """
+        self.path = path
+        self.census = census if census is not None else Census()
+        if os.path.exists(path) and os.path.getsize(path) >= HEADER_SIZE:
+            header = np.fromfile(path, dtype=HEADER, count=1)[0]
+            if header["magic"] != MAGIC or header["version"] != VERSION:
+                raise ValueError(f"Not a statistics file: {path}")
+            capacity = int(header["capacity"])
+        else:
+            with open(path, "wb") as f:
+                f.truncate(HEADER_SIZE + capacity * RECORD.itemsize)
+            header = np.zeros((), dtype=HEADER)
+            header["magic"], header["version"], header["capacity"] = MAGIC, VERSION, capacity
+            with open(path, "r+b") as f:
+                f.write(header.tobytes())
+        self.map(capacity)
+        self.count = int(self.header["count"])
+
+    def map(self, capacity):
+        """
+        Map the header and the records.
+
+        args:
+            capacity [int]: records the file has room for
+        """
+        # Plain array views of the maps, indexing np.memmap itself is several times slower
+        self.maps = (np.memmap(self.path, dtype=HEADER, mode="r+", shape=()),
+                     np.memmap(self.path, dtype=RECORD, mode="r+", offset=HEADER_SIZE,
+                               shape=(capacity,)))
+        self.header, self.records = (array.view(np.ndarray) for array in self.maps)
+
+    def grow(self):
+        """Double the room for records."""
+        capacity = 2 * len(self.records)
+        self.close()
+        del self.maps, self.header, self.records
+        with open(self.path, "r+b") as f:
+            f.truncate(HEADER_SIZE + capacity * RECORD.itemsize)
+        self.map(capacity)
+        self.header["capacity"] = capacity
+
+    def measure(self, engine):
+        """
+        Calculate the statistics of the current generation from the census.
+
+        args:
+            engine [Life]: engine
+
+        returns:
+            record [tuple]: values in RECORD order
+        """
+        census = self.census
+        census.update(engine)
+        return (engine.gen, census.population, census.births, census.deaths,
+                census.births + census.deaths) + census.box
+
+    def record(self, engine):
+        """
+        Append the statistics of the current generation, call after every step.
+
+        args:
+            engine [Life]: engine
+        """
+        self.append(self.measure(engine))
+
+    def append(self, record):
+        """
+        Append a record.
+
+        args:
+            record [tuple]: values in RECORD order
+        """
+        if self.count == len(self.records):
+            self.grow()
+        self.records[self.count] = record
+        self.count += 1
+        # Readers trust the count, so it only moves once the record is in place
+        self.header["count"] = self.count
+
+    def close(self):
+        """Write everything to the file."""
+        for array in self.maps:
+            array.flush()
+
+
+def read(path):
+    """
+    Read the records written so far, also while a run is still writing them.
+
+    args:
+        path [str]: file path
+
+    returns:
+        records [np.array]: RECORD array mapped from the file
+
+    raises:
+        ValueError
+    """
+    header = np.fromfile(path, dtype=HEADER, count=1)
+    if not len(header) or header[0]["magic"] != MAGIC or header[0]["version"] != VERSION:
+        raise ValueError(f"Not a statistics file: {path}")
+    count = int(header[0]["count"])
+    if not count:
+        return np.empty(0, dtype=RECORD)
+    return np.memmap(path, dtype=RECORD, mode="r", offset=HEADER_SIZE, shape=(count,))
+
+def main(argv=None):
+    """
+    Print the records of a statistics file as CSV.
+
+    args:
+        argv [list]: arguments, defaults to sys.argv
+
+    returns:
+        status [int]: exit status
+    """
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("path", help="statistics file")
+    parser.add_argument("-n", "--tail", type=int, default=10,
+                        help="number of last records to print, 0 for all")
+    parser.add_argument("-f", "--follow", action="store_true",
+                        help="keep printing records as they are written")
+    args = parser.parse_args(argv)
+
+    try:
+        records = read(args.path)
+    except (OSError, ValueError) as error:
+        print(f"WARNING: {error}", file=sys.stderr)
+        return 1
+    print(",".join(RECORD.names))
+    shown = max(len(records) - args.tail, 0) if args.tail else 0
+    while True:
+        for record in records[shown:]:
+            print(",".join(str(value) for value in record.tolist()))
+        shown = len(records)
+        if not args.follow:
+            return 0
+        sys.stdout.flush()
+        sleep(1 / FPS)
+        records = read(args.path)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,71 @@
+"""Tests of the census and cycle detection."""
+
+import numpy as np
+import pytest
+
+from cycles import Census, Detector
+from engine import bounding_box, create_engine
+
+
+def soup(height, width, seed=1):
+    """Random pattern."""
+    return (np.random.default_rng(seed).random((height, width)) < 0.35).astype(np.uint8)
+
+
+GLIDER = np.array([[0, 1, 0], [0, 0, 1], [1, 1, 1]], dtype=np.uint8)
+
+
+@pytest.mark.parametrize("name", ["dense", "bitpacked", "tiled", "sparse", "parallel"])
+@pytest.mark.parametrize("toroid", [False, True])
+@pytest.mark.parametrize("pattern", ["soup", "glider"])
+def test_census_follows_board(name, toroid, pattern):
+    if name == "sparse" and not toroid:
+        pytest.skip("unbounded")
+    # Sizes that are not multiples of the tile or word size
+    engine = create_engine(name, 70, 130, toroid)
+    # The glider crosses the corner of toroids and dies at the corner otherwise
+    engine.place(soup(70, 130) if pattern == "soup" else GLIDER, 50, 110)
+    census = Census()
+    for gen in range(100):
+        engine.step(1)
+        if gen == 30:
+            engine.set_cell(1, 5, 5)
+            census.clear()
+        census.update(engine)
+        board, old_board = engine.board, engine.old_board
+        assert sorted(zip(*census.born)) == sorted(zip(*np.nonzero(board > old_board)))
+        assert sorted(zip(*census.died)) == sorted(zip(*np.nonzero(board < old_board)))
+        assert census.births == len(census.born[0])
+        assert census.deaths == len(census.died[0])
+        assert census.population == np.count_nonzero(board)
+        assert census.box == bounding_box(board)
+    if name == "parallel":
+        engine.close()
+
+
+def test_census_follows_hashlife():
+    engine = create_engine("hashlife", 40, 40)
+    engine.place(soup(40, 40), 0, 0)
+    census = Census()
+    previous = set(zip(*engine.cells()))
+    for _ in range(60):
+        engine.step(1)
+        census.update(engine)
+        ys, xs = engine.cells()
+        cells = set(zip(ys, xs))
+        assert census.population == len(cells)
+        assert (census.births, census.deaths) == (len(cells - previous), len(previous - cells))
+        assert census.box == (ys.min(), xs.min(), ys.max() + 1, xs.max() + 1)
+        previous = cells
+
+
+@pytest.mark.parametrize("name", ["dense", "tiled", "sparse", "hashlife"])
+def test_glider_is_a_spaceship(name):
+    engine = create_engine(name, 32, 32)
+    engine.place(GLIDER, 4, 4)
+    detector = Detector()
+    cycle = None
+    while cycle is None and engine.gen < 10:
+        engine.step(1)
+        cycle = detector.update(engine)
+    assert (cycle.kind, cycle.period, cycle.offset) == ("spaceship", 4, (1, 1))
@@ -0,0 +1,71 @@
+"""Tests of the engines."""
+
+import tracemalloc
+
+import numpy as np
+import pytest
+
+from config import ENGINES
+from engine import Life, create_engine
+from rules import Rule
+
+SIZE = 640
+# Below one board of uint8 cells, but above the fixed-size buffers numpy uses
+# for ufuncs on strided views (8192 elements per operand)
+PEAK_LIMIT = 256 << 10
+GROWTH_LIMIT = 16 << 10
+
+
+@pytest.mark.parametrize("rule", [
+    Rule.from_string("B3/S23"),
+    # Non-totalistic: a cell copies the one above it, toggled if alive itself
+    Rule.from_function(lambda cells: cells[1, 1] ^ cells[0, 1]),
+], ids=["totalistic", "non-totalistic"])
+@pytest.mark.parametrize("toroid", [False, True])
+def test_steps_do_not_allocate(rule, toroid):
+    engine = Life(SIZE, SIZE, toroid, rule)
+    engine.board = (np.random.default_rng(1).random((SIZE, SIZE)) < 0.3).astype(np.uint8)
+    # The first steps allocate the scratch arrays
+    engine.step(2)
+    tracemalloc.start()
+    try:
+        start = tracemalloc.get_traced_memory()[0]
+        engine.step(1000)
+        current, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    assert current - start < GROWTH_LIMIT
+    assert peak - start < PEAK_LIMIT
+
+
+@pytest.mark.parametrize("name", ENGINES)
+def test_window_matches_board(name):
+    engine = create_engine(name, 70, 150, False)
+    engine.place((np.random.default_rng(2).random((70, 150)) < 0.3).astype(np.uint8), 0, 0)
+    engine.step(3)
+    board, old_board = engine.board, engine.old_board
+    # Whole board, word and tile edges, single cells and empty areas
+    for top, left, bottom, right in [(0, 0, 70, 150), (5, 3, 40, 129), (10, 64, 11, 128),
+                                     (69, 0, 70, 1), (3, 70, 20, 70)]:
+        area = np.s_[top:bottom, left:right]
+        assert np.array_equal(engine.window(top, left, bottom, right), board[area])
+        assert np.array_equal(engine.window(top, left, bottom, right, old=True), old_board[area])
+    if hasattr(engine, "close"):
+        engine.close()
+
+
+@pytest.mark.parametrize("rule", ["B3/S23", "B36/S23", "B3/S012345678"])
+@pytest.mark.parametrize("toroid", [False, True])
+def test_vectorized_matches_loop(rule, toroid):
+    board = (np.random.default_rng(3).random((21, 33)) < 0.35).astype(np.uint8)
+    vectorized = Life(21, 33, toroid, Rule.from_string(rule))
+    loop = Life(21, 33, toroid, Rule.from_string(rule))
+    vectorized.vectorize = True
+    loop.vectorize = loop.optimize = loop.use_queue = False
+    for engine in (vectorized, loop):
+        engine.board = board.copy()
+    for _ in range(30):
+        vectorized.evolve()
+        loop.evolve()
+        assert np.array_equal(vectorized.board, loop.board)
+        assert np.array_equal(vectorized.old_board, loop.old_board)
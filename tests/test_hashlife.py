@@ -0,0 +1,55 @@
+"""Tests of the HashLife engine."""
+
+import numpy as np
+import pytest
+
+from cycles import Census
+from hashlife import HashLife
+
+
+def soup(size, seed=1):
+    """Random square pattern."""
+    return (np.random.default_rng(seed).random((size, size)) < 0.3).astype(np.uint8)
+
+
+def test_cache_stays_near_cap_during_step():
+    capped = HashLife(32, 32, False, max_nodes=2000)
+    reference = HashLife(32, 32, False)
+    for engine in (capped, reference):
+        engine.place(soup(32), 0, 0)
+        engine.step(256)
+    # Uncapped, a single step caches many times more nodes
+    assert reference.peak_nodes > 10 * capped.max_nodes
+    assert capped.collections > 1
+    assert capped.peak_nodes <= 1.1 * capped.max_nodes
+    board, origin = capped.to_array()
+    expected, expected_origin = reference.to_array()
+    assert origin == expected_origin
+    assert np.array_equal(board, expected)
+
+
+def test_toroid_rejected_on_creation():
+    with pytest.raises(ValueError):
+        HashLife(16, 16, True)
+    engine = HashLife(16, 16)
+    with pytest.raises(ValueError):
+        engine.toroid = True
+    assert not engine.toroid
+
+
+def test_jumps_count_no_births_or_deaths():
+    engine = HashLife(32, 32, False)
+    engine.place(soup(16), 8, 8)
+    census = Census()
+    engine.step(5)
+    census.update(engine)
+    # The previous generation is the one before the jump
+    assert np.array_equal(engine.old_board[8:24, 8:24], soup(16))
+    assert (census.births, census.deaths) == (0, 0)
+    assert census.population == engine.population
+    old_board = engine.board
+    engine.step(1)
+    census.update(engine)
+    board = engine.board
+    assert census.births == np.count_nonzero(board & ~old_board)
+    assert census.deaths == np.count_nonzero(old_board & ~board)
@@ -0,0 +1,63 @@
+"""Tests of the Macrocell reader and writer."""
+
+import io
+import os
+
+import numpy as np
+import pytest
+
+from hashlife import HashLife
+from macrocell import read_macrocell, write_macrocell
+from parser import exts, parse
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PATTERNS = sorted(name for name in os.listdir(os.path.join(ROOT, "patterns"))
+                  if name.rsplit(".", 1)[-1].lower() in exts)
+
+
+def round_trip(engine):
+    """Write an engine as Macrocell and read it back into a new one."""
+    f = io.StringIO()
+    write_macrocell(f, engine)
+    f.seek(0)
+    return read_macrocell(f)
+
+
+@pytest.mark.parametrize("name", PATTERNS)
+def test_round_trip(name):
+    _, pattern, rule = parse(os.path.join(ROOT, "patterns", name))
+    engine = HashLife(rule=rule)
+    engine.place(pattern, 0, 0)
+    copy, copy_rule = round_trip(engine)
+    assert copy_rule == engine.rule
+    assert copy.population == np.count_nonzero(pattern) > 0
+    # The file keeps positions relative to its root, which is read back centered on the origin
+    board, origin = engine.to_array()
+    copy_board, copy_origin = copy.to_array()
+    assert np.array_equal(copy_board, board)
+    shift = np.subtract(copy_origin, origin)
+    engine.step(1000)
+    copy.step(1000)
+    board, origin = engine.to_array()
+    copy_board, copy_origin = copy.to_array()
+    assert np.array_equal(copy_board, board)
+    assert np.array_equal(np.subtract(copy_origin, origin), shift)
+    # Written again after running, the generation comes along
+    again, _ = round_trip(engine)
+    assert again.gen == engine.gen == 1000
+    assert np.array_equal(again.to_array()[0], board)
+
+
+def test_golly_sample():
+    with open(os.path.join(ROOT, "tests", "data", "golly.mc")) as f:
+        engine, rule = read_macrocell(f)
+    assert str(rule) == "B3/S23"
+    assert engine.gen == 100
+    glider = [(0, 1), (1, 2), (2, 0), (2, 1), (2, 2)]
+    block = [(6, 0), (6, 1), (7, 0), (7, 1)]
+    # Leaves placed by the level 4 and 5 nodes, the level 5 root centered on the origin
+    expected = ([(y, x) for y, x in glider] + [(y + 8, x + 8) for y, x in block]
+                + [(y + 16, x + 8) for y, x in glider]
+                + [(y + 16, x + 16) for y, x in glider] + [(y + 24, x + 24) for y, x in block])
+    ys, xs = engine.cells()
+    assert sorted(zip(ys.tolist(), xs.tolist())) == sorted((y - 16, x - 16) for y, x in expected)
@@ -0,0 +1,66 @@
+"""Tests of the simulation server."""
+
+import asyncio
+import json
+from time import sleep
+
+import numpy as np
+
+from engine import Life, create_engine
+from history import live_cells
+from server import Server, Subscriber
+
+
+def soup(size, seed=1):
+    """Random square pattern."""
+    return (np.random.default_rng(seed).random((size, size)) < 0.35).astype(np.uint8)
+
+
+class SlowLife(Life):
+    """Dense engine taking a while per generation, so clients arrive in the middle of steps."""
+
+    def evolve(self):
+        super().evolve()
+        sleep(0.01)
+
+
+async def first_frame(port):
+    """Connect a subscriber and read until its first frame."""
+    subscriber = Subscriber()
+    await subscriber.connect(port=port)
+    while subscriber.frames == 0:
+        subscriber.receive(json.loads(await subscriber.reader.readline()))
+    await subscriber.close()
+    return subscriber.gen, subscriber.keys
+
+
+async def watch(size, count):
+    """Run a soup on a server, connecting subscribers one after another while it runs."""
+    engine = SlowLife(size, size, True)
+    engine.place(soup(size), 0, 0)
+    server = Server(engine, rate=float("inf"))
+    listener = await server.listen(port=0)
+    port = listener.sockets[0].getsockname()[1]
+    control = Subscriber()
+    await control.connect(port=port)
+    await control.send("start")
+    frames = []
+    for _ in range(count):
+        frames.append(await first_frame(port))
+        await asyncio.sleep(0.013)
+    await control.send("pause")
+    await control.close()
+    server.simulation.cancel()
+    listener.close()
+    await listener.wait_closed()
+    return frames
+
+
+def test_frames_match_their_generation():
+    frames = asyncio.run(watch(32, 8))
+    # Replay the soup to every generation a frame was labeled with
+    engine = create_engine("dense", 32, 32, True)
+    engine.place(soup(32), 0, 0)
+    for gen, keys in sorted(frames, key=lambda frame: frame[0]):
+        engine.step(gen - engine.gen)
+        assert np.array_equal(keys, live_cells(engine)), f"frame of generation {gen}"
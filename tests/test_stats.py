@@ -0,0 +1,35 @@
+"""Tests of the statistics file."""
+
+import numpy as np
+
+from engine import bounding_box, create_engine
+from stats import RECORD, Stats, read
+
+
+def test_records_match_board(tmp_path):
+    path = str(tmp_path / "run.stats")
+    engine = create_engine("dense", 64, 80)
+    engine.board = (np.random.default_rng(1).random((64, 80)) < 0.35).astype(np.uint8)
+    # Small enough to grow the file twice
+    stats = Stats(path, capacity=16)
+    expected = []
+    for _ in range(50):
+        engine.step(1)
+        stats.record(engine)
+        board, old_board = engine.board, engine.old_board
+        births = int(np.count_nonzero(board > old_board))
+        deaths = int(np.count_nonzero(board < old_board))
+        expected.append((engine.gen, int(np.count_nonzero(board)), births, deaths,
+                         births + deaths) + bounding_box(board))
+    # Readable while still open
+    assert read(path).tolist() == expected
+    stats.close()
+
+    # Reopening continues the series
+    stats = Stats(path)
+    engine.step(1)
+    stats.record(engine)
+    stats.close()
+    records = read(path)
+    assert records.dtype == RECORD
+    assert len(records) == 51 and records["gen"][-1] == engine.gen
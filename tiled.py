@@ -0,0 +1,269 @@
+"""Tiled Game of Life engine recomputing only the active parts of the board."""
+
+import numpy as np
+
+from engine import Life, placements, track
+from config import *
+
+
+class TiledLife(Life):
+    """
+    Life engine splitting the board into tiles.
+
+    A tile is recomputed only if it or one of its neighbors changed in the
+    previous generation, so settled areas cost nothing. Two buffers are
+    swapped each generation; tiles that were not recomputed hold the same
+    cells in both of them.
+    """
+
+    # Name used by create_engine
+    name = "tiled"
+
+    def __init__(self, *args, tile=TILE, **kwargs):
+        """
+        Create an empty board, see Life for other arguments.
+
+        args:
+            tile [int]: tile size in cells
+        """
+        self.tile = tile
+        self.current = self.previous = None
+        self.active = None
+        self.maps = None
+        self.computed = 0
+        # Tiles computed by the last step with their cell changes, None after an edit
+        self.stepped = None
+        super().__init__(*args, **kwargs)
+
+    def check_rule(self, rule):
+        """
+        Check that the engine can run a rule.
+
+        args:
+            rule [Rule]: rule to check
+
+        raises:
+            ValueError
+        """
+        if not rule.totalistic:
+            raise ValueError("The tiled engine only supports totalistic rules")
+
+    @Life.rule.setter
+    def rule(self, rule):
+        Life.rule.fset(self, rule)
+        # Settled tiles may change under the new rule
+        if self.active is not None:
+            self.active[:] = True
+
+    def allocate(self):
+        """Allocate both buffers with an extra dead row and column at the end."""
+        if self.current is None:
+            self.current = np.zeros((self.height + 1, self.width + 1), dtype=np.uint8)
+            self.previous = self.current.copy()
+            self.active = np.ones((-(-self.height // self.tile), -(-self.width // self.tile)),
+                                  dtype=bool)
+
+    @property
+    def board(self):
+        """Current generation."""
+        return self.current[:self.height, :self.width]
+
+    @board.setter
+    def board(self, board):
+        self.allocate()
+        self.current[:self.height, :self.width] = board == 1
+        self.active[:] = True
+        self.stepped = None
+
+    @property
+    def old_board(self):
+        """Previous generation."""
+        return self.previous[:self.height, :self.width]
+
+    @old_board.setter
+    def old_board(self, board):
+        self.allocate()
+        self.previous[:self.height, :self.width] = board == 1
+        self.active[:] = True
+        self.stepped = None
+
+    @property
+    def active_tiles(self):
+        """Number of tiles recomputed in the next generation."""
+        return int(np.count_nonzero(self.active))
+
+    @property
+    def evaluated(self):
+        """Number of cells computed in the last generation."""
+        return self.computed
+
+    def touch(self, top, left, bottom, right):
+        """
+        Mark the tiles covering an area and their neighbors as active.
+
+        args:
+            top, left, bottom, right [int]: area edges, bottom and right exclusive
+        """
+        rows = np.arange(top // self.tile - 1, (bottom - 1) // self.tile + 2)
+        cols = np.arange(left // self.tile - 1, (right - 1) // self.tile + 2)
+        self.active[np.ix_(rows % self.active.shape[0], cols % self.active.shape[1])] = True
+        self.stepped = None
+
+    def set_cell(self, state, y, x):
+        """
+        Set cell state - alive or dead.
+
+        args:
+            state [int]: cell state
+            y [int]: y position
+            x [int]: x position
+
+        returns:
+            changed [bool]: whether the position is on the board
+        """
+        if super().set_cell(state, y, x):
+            self.touch(y, x, y + 1, x + 1)
+            return True
+        return False
+
+    def place(self, array, y, x):
+        """
+        Place pattern on the board, clipping it at the edges or wrapping it on a toroid.
+
+        args:
+            array [np.array]: pattern array
+            y [int]: y position of the top-left corner
+            x [int]: x position of the top-left corner
+        """
+        for board, pattern in placements(array.shape, y, x, self.height, self.width, self.toroid):
+            self.board[board] = array[pattern] == 1
+            rows, cols = board
+            self.touch(rows.start, cols.start, rows.stop, cols.stop)
+
+    def index_maps(self):
+        """
+        Build buffer indices of every tile, recomputed when the topology changes.
+
+        returns:
+            maps [tuple]: gather and scatter row and column indices per tile row/column,
+                positions off the board point at the extra dead row and column
+        """
+        if self.maps is None or self.maps[0] != self.toroid:
+            maps = [self.toroid]
+            for size, count in ((self.height, self.active.shape[0]),
+                                (self.width, self.active.shape[1])):
+                # Tile cells with a one-cell halo on both sides
+                index = np.arange(count)[:, None] * self.tile + np.arange(-1, self.tile + 1)
+                if self.toroid:
+                    gather = index % size
+                else:
+                    gather = np.where((index < 0) | (index >= size), size, index)
+                scatter = np.minimum(index[:, 1:-1], size)
+                maps.extend((gather, scatter))
+            self.maps = maps
+            self.active[:] = True
+        return self.maps
+
+    def evolve(self):
+        """Calculate the next generation of the active tiles."""
+        _, gather_y, scatter_y, gather_x, scatter_x = self.index_maps()
+        source, target = self.current, self.previous
+        self.gen += 1
+
+        tile_y, tile_x = np.nonzero(self.active)
+        self.computed = len(tile_y) * self.tile ** 2
+        if len(tile_y):
+            # Gather every active tile with its halo into one stack
+            blocks = source[gather_y[tile_y][:, :, None], gather_x[tile_x][:, None, :]]
+            rows = blocks[:, :-2] + blocks[:, 1:-1] + blocks[:, 2:]
+            neighbors = rows[:, :, :-2] + rows[:, :, 1:-1] + rows[:, :, 2:]
+            cells = blocks[:, 1:-1, 1:-1]
+            neighbors -= cells
+
+            # Look up the next state of every cell of the active tiles
+            new = self.rule.apply(cells, neighbors)
+            rows = scatter_y[tile_y][:, :, None]
+            cols = scatter_x[tile_x][:, None, :]
+            inside = (rows < self.height) & (cols < self.width)
+            new &= inside
+            target[rows, cols] = new
+            # On a toroid, cells past the edge of a partial tile are wrapped copies
+            diff = (new != cells) & inside
+            changed = diff.any(axis=(1, 2))
+        else:
+            new = diff = np.zeros((0, self.tile, self.tile), dtype=bool)
+            changed = np.zeros(0, dtype=bool)
+        self.stepped = (tile_y, tile_x, diff, new)
+
+        # Activate the changed tiles and their neighbors
+        grid = np.zeros_like(self.active)
+        grid[tile_y[changed], tile_x[changed]] = True
+        self.active = grid.copy()
+        for h, w in ((h, w) for h in range(-1, 2) for w in range(-1, 2) if h != 0 or w != 0):
+            if self.toroid:
+                self.active |= np.roll(grid, (h, w), axis=(0, 1))
+            else:
+                shifted = np.pad(grid, 1)[1-h:grid.shape[0]+1-h, 1-w:grid.shape[1]+1-w]
+                self.active |= shifted
+
+        self.current, self.previous = target, source
+        if self.counting:
+            self.counts = self.count()
+
+    def count_changes(self):
+        """
+        Count the cells that differ between the board and the previous one.
+
+        After a step, only the changes it found in the computed tiles are counted.
+
+        returns:
+            changed [int]: cells born or died
+        """
+        if self.stepped is None:
+            return super().count_changes()
+        return int(np.count_nonzero(self.stepped[2]))
+
+    def changes(self):
+        """
+        Find the cells that differ between the board and the previous one.
+
+        After a step, only the cells it found changed in the computed tiles are read.
+
+        returns:
+            born [tuple]: y and x positions of the cells born
+            died [tuple]: y and x positions of the cells died
+        """
+        if self.stepped is None:
+            return super().changes()
+        _, _, scatter_y, _, scatter_x = self.index_maps()
+        tile_y, tile_x, diff, new = self.stepped
+        changed = np.flatnonzero(diff)
+        n, cell = np.divmod(changed, self.tile ** 2)
+        y, x = np.divmod(cell, self.tile)
+        ys, xs = scatter_y[tile_y[n], y], scatter_x[tile_x[n], x]
+        alive = new.ravel()[changed] == 1
+        return (ys[alive], xs[alive]), (ys[~alive], xs[~alive])
+
+    def count(self):
+        """
+        Measure the generation just stepped to, see Life.count().
+
+        After a counted step, the population follows from the changes the
+        step found in the computed tiles.
+
+        returns:
+            counts [tuple]: generation, population, births, deaths and bounding box
+        """
+        last = self.previous_counts()
+        if self.stepped is None or last is None or self.rule.spontaneous:
+            return super().count()
+        _, previous, _, _, box = last
+        _, _, diff, new = self.stepped
+        changed = int(np.count_nonzero(diff))
+        births = int(np.count_nonzero(new[diff]))
+        population = previous + 2 * births - changed
+        if not population:
+            box = (0, 0, 0, 0)
+        elif changed:
+            box = track(self.board, box, self.toroid)
+        return self.gen, population, births, changed - births, box